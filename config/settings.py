@@ -27,6 +27,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.humanize',
+    'django.contrib.postgres',  # operator classes on PostgreSQL indexes (inventory_app.indexes)
     'inventory_app',
     'sales',
 ]
@@ -39,6 +40,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'inventory_app.audit.AuditMiddleware',  # attributes audit events to the signed-in user
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -69,6 +71,12 @@ DATABASES = {
         conn_max_age=600,
     )
 }
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Writers take the lock when their transaction starts and wait their turn for
+    # it, as they queue on row locks in PostgreSQL. The test database is a file,
+    # as an in-memory one fails lock waits at once instead of retrying.
+    DATABASES['default']['OPTIONS'] = {'transaction_mode': 'IMMEDIATE', 'timeout': 20}
+    DATABASES['default']['TEST'] = {'NAME': BASE_DIR / 'test_db.sqlite3'}
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -97,9 +105,30 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Rendered sales document PDFs, keyed by content hash
+PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR', os.path.join(MEDIA_ROOT, 'pdf_cache'))
+
+# Where dispatch_audit_events delivers the audit log. Each sink has a BACKEND
+# from inventory_app.audit and its OPTIONS; QueueSink takes an "enqueue" dotted path
+AUDIT_SINKS = {
+    'file': {
+        'BACKEND': 'inventory_app.audit.FileSink',
+        'OPTIONS': {'path': os.environ.get('AUDIT_LOG_PATH', os.path.join(BASE_DIR, 'logs', 'audit.jsonl'))},
+    },
+}
+if os.environ.get('AUDIT_WEBHOOK_URL'):
+    AUDIT_SINKS['webhook'] = {
+        'BACKEND': 'inventory_app.audit.WebhookSink',
+        'OPTIONS': {'url': os.environ['AUDIT_WEBHOOK_URL']},
+    }
+
 # Default primary key
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Document forms post eight fields per line item (item_id, barcode, designation, description,
+# brand, quantity, unit_price, amount) plus a few header fields: room for 2,000-line tender quotations
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 2000 * 8 + 100
+
 # Authentication URLs
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
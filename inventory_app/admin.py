@@ -1,6 +1,114 @@
 from django.contrib import admin
-from .models import Category, Product, StockMovement
+from django.db import transaction
+from .models import AuditCursor, AuditEvent, Category, Product, StockMovement, Location, StockLevel
 
-admin.site.register(Category)
-admin.site.register(Product)
-admin.site.register(StockMovement)
\ No newline at end of file
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ("category", "product_count", "units_on_hand", "stock_value")
+    search_fields = ("name",)
+    autocomplete_fields = ("parent",)
+    readonly_fields = ("product_count", "units_on_hand", "stock_value")
+    list_per_page = 100
+
+    @admin.display(description="Category", ordering="path")
+    def category(self, obj):
+        return obj.tree_label
+
+    def delete_queryset(self, request, queryset):
+        # A bulk delete skips Category.delete, so each subtree is taken out of its ancestors' rollups here.
+        # Parents come first; a selected subcategory has already gone with its parent.
+        with transaction.atomic():
+            deleted = []
+            for category in queryset.order_by('path'):
+                if not any(category.path.startswith(path) for path in deleted):
+                    category.delete()
+                    deleted.append(category.path)
+
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ("name", "designation", "brand", "barcode", "category", "quantity", "price")
+    list_select_related = ("category",)
+    list_filter = ("category",)
+    search_fields = ("name", "designation", "brand", "=barcode")
+    autocomplete_fields = ("category",)
+    # Stock changes go through inventory_app.stock so levels and movements stay in step
+    readonly_fields = ("quantity",)
+    ordering = ("name",)
+    list_per_page = 50
+
+    def delete_queryset(self, request, queryset):
+        # A bulk delete skips Product.delete, so the category rollups would keep the stock
+        with transaction.atomic():
+            for product in queryset:
+                product.delete()
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ("date", "product", "location", "movement_type", "quantity", "reason", "performed_by")
+    list_select_related = ("product", "location", "performed_by")
+    list_filter = ("movement_type", "reason", "location")
+    search_fields = ("product__name", "=product__barcode")
+    date_hierarchy = "date"
+    ordering = ("-date",)
+    list_per_page = 50
+    # Counting the whole ledger on every page is the slow part of this changelist
+    show_full_result_count = False
+
+    # The movement ledger is append-only; it is written by inventory_app.stock
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ("name", "kind", "is_default", "is_active")
+    list_filter = ("kind", "is_active")
+    search_fields = ("name",)
+
+
+@admin.register(StockLevel)
+class StockLevelAdmin(admin.ModelAdmin):
+    list_display = ("product", "location", "quantity")
+    list_select_related = ("product", "location")
+    list_filter = ("location",)
+    search_fields = ("product__name", "=product__barcode")
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(admin.ModelAdmin):
+    list_display = ("occurred_at", "action", "model", "object_id", "user")
+    list_select_related = ("user",)
+    list_filter = ("action", "model")
+    search_fields = ("=object_id",)
+    date_hierarchy = "occurred_at"
+    ordering = ("-id",)
+    list_per_page = 50
+    show_full_result_count = False
+
+    # The audit log is append-only; it is written by inventory_app.audit
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AuditCursor)
+class AuditCursorAdmin(admin.ModelAdmin):
+    list_display = ("sink", "last_event_id", "delivered_at")
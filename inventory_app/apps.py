@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class InventoryAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory_app'
+
+    def ready(self):
+        # Audit events for product and stock movement changes
+        from . import audit
+        from .models import Product, StockMovement
+        audit.track(Product)
+        audit.track(StockMovement)
@@ -0,0 +1,265 @@
+import json
+import threading
+import urllib.request
+from pathlib import Path
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models, transaction
+from django.db.models import Q, Value
+from django.db.models.functions import JSONObject
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import AuditCursor, AuditEvent
+
+BATCH_SIZE = 500
+# How long dispatch keeps looking for an id it skipped. Most are from
+# transactions still in flight; the rest were used up by a rollback and never appear.
+MISSING_SECONDS = getattr(settings, 'AUDIT_MISSING_SECONDS', 3600)
+
+_state = threading.local()
+
+
+class AuditMiddleware:
+    """Makes the request's user available to the audit signal handlers."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.request = request
+        try:
+            return self.get_response(request)
+        finally:
+            _state.request = None
+
+
+def _user_id():
+    user = getattr(getattr(_state, 'request', None), 'user', None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def snapshot(instance, fields=None):
+    """The instance's columns as a JSON-ready dict, or only those named in ``fields``."""
+    data = {}
+    for field in instance._meta.concrete_fields:
+        if fields is not None and field.name not in fields and field.attname not in fields:
+            continue
+        value = getattr(instance, field.attname)
+        data[field.attname] = value.name if isinstance(value, FieldFile) else value
+    return data
+
+
+def _event(action, instance, data, fields=None):
+    return AuditEvent(
+        action=action,
+        model=instance._meta.label,
+        object_id=instance.pk,
+        # Outside a request, fall back to the user a stock movement names
+        user_id=_user_id() or getattr(instance, 'performed_by_id', None),
+        data=snapshot(instance, fields) if data is None else data,
+    )
+
+
+def record(action, instance, data=None):
+    """Write an audit event for ``instance``; ``data`` defaults to all its columns."""
+    _event(action, instance, data).save()
+
+
+def record_many(action, instances, fields=None):
+    """
+    Write an audit event per instance in one INSERT, for rows written with
+    bulk_create or bulk_update; ``fields`` limits the columns recorded.
+    """
+    AuditEvent.objects.bulk_create([_event(action, instance, None, fields) for instance in instances if instance.pk])
+
+
+def record_update(queryset, fields):
+    """
+    Write an update event carrying ``fields`` for each row in ``queryset``, for
+    rows changed with QuerySet.update(), which sends no post_save.
+
+    One INSERT ... SELECT copies the new values across inside the database, so
+    the rows are not read back. The values are as the database puts them in
+    JSON: decimals come out as numbers and timestamps in its own format.
+    """
+    model = queryset.model
+    source = queryset.order_by().values_list(
+        Value(timezone.now(), output_field=models.DateTimeField()),
+        Value(AuditEvent.UPDATE),
+        Value(model._meta.label),
+        'pk',
+        Value(_user_id(), output_field=models.IntegerField()),
+        JSONObject(**{model._meta.get_field(name).attname: name for name in fields}),
+    )
+    sql, params = source.query.sql_with_params()
+    connection = connections[queryset.db]
+    columns = ', '.join(
+        connection.ops.quote_name(AuditEvent._meta.get_field(name).column)
+        for name in ('occurred_at', 'action', 'model', 'object_id', 'user', 'data')
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {connection.ops.quote_name(AuditEvent._meta.db_table)} ({columns}) {sql}', params,
+        )
+
+
+def _saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        # A save limited by update_fields records only those columns; the rest may be stale in memory
+        data = None if update_fields is None else snapshot(instance, update_fields)
+        record(AuditEvent.CREATE if created else AuditEvent.UPDATE, instance, data)
+
+
+def _deleted(sender, instance, **kwargs):
+    record(AuditEvent.DELETE, instance)
+
+
+def track(model):
+    """Record an audit event whenever a ``model`` row is saved or deleted."""
+    label = model._meta.label
+    post_save.connect(_saved, sender=model, dispatch_uid=f'audit.saved.{label}')
+    post_delete.connect(_deleted, sender=model, dispatch_uid=f'audit.deleted.{label}')
+
+
+# -------------------- Sinks --------------------
+class Sink:
+    """Somewhere audit events are delivered. ``deliver`` gets a list of event dicts, oldest first."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def deliver(self, events):
+        raise NotImplementedError
+
+
+class FileSink(Sink):
+    """Appends events to a local file, one JSON object per line."""
+
+    def __init__(self, name, path):
+        super().__init__(name)
+        self.path = Path(path)
+
+    def deliver(self, events):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as destination:
+            for event in events:
+                destination.write(json.dumps(event, cls=DjangoJSONEncoder) + '\n')
+
+
+class WebhookSink(Sink):
+    """POSTs each batch as ``{"events": [...]}``; any non-2xx response fails the batch."""
+
+    def __init__(self, name, url, timeout=10, headers=None):
+        super().__init__(name)
+        self.url = url
+        self.timeout = timeout
+        self.headers = headers or {}
+
+    def deliver(self, events):
+        body = json.dumps({'events': events}, cls=DjangoJSONEncoder).encode()
+        request = urllib.request.Request(
+            self.url, data=body, method='POST', headers={'Content-Type': 'application/json', **self.headers},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class QueueSink(Sink):
+    """Hands each batch to a job queue's enqueue function, given by dotted path."""
+
+    def __init__(self, name, enqueue):
+        super().__init__(name)
+        self.enqueue = import_string(enqueue)
+
+    def deliver(self, events):
+        self.enqueue(json.loads(json.dumps(events, cls=DjangoJSONEncoder)))
+
+
+def get_sinks(names=None):
+    """The sinks configured in settings.AUDIT_SINKS, optionally only those in ``names``."""
+    configured = getattr(settings, 'AUDIT_SINKS', {})
+    unknown = set(names or ()) - set(configured)
+    if unknown:
+        raise KeyError(f"Unknown audit sinks: {', '.join(sorted(unknown))}")
+    return [
+        import_string(config['BACKEND'])(name, **config.get('OPTIONS', {}))
+        for name, config in configured.items()
+        if not names or name in names
+    ]
+
+
+def _fold(events):
+    """
+    Combine each run of consecutive events for the same row by the same user into one.
+
+    Saving a document and then its totals is one change to whoever reads the
+    sink. The combined event keeps the first action unless a later one is a
+    delete, the newest value of each column, and the id and time of the last event.
+    """
+    folded = []
+    for event in events:
+        previous = folded[-1] if folded else None
+        if (
+            previous
+            and previous['action'] != AuditEvent.DELETE
+            and all(previous[key] == event[key] for key in ('model', 'object_id', 'user_id'))
+        ):
+            action = previous['action'] if event['action'] == AuditEvent.UPDATE else event['action']
+            folded[-1] = {**event, 'action': action, 'data': {**previous['data'], **event['data']}}
+        else:
+            folded.append(event)
+    return folded
+
+
+def dispatch(sink, batch_size=BATCH_SIZE):
+    """
+    Deliver the events ``sink`` has not had yet, ``batch_size`` at a time.
+
+    Ids are handed out before commit, so a transaction still in flight can
+    commit an event below the highest id already delivered. The ids skipped
+    over are kept on the cursor and looked for again on each run until
+    MISSING_SECONDS after the event above them, and delivered if they turn up.
+
+    The sink's cursor row stays locked while a batch is delivered, so two
+    dispatchers never send the same batch; if delivery fails the cursor is
+    not moved and the batch is retried on the next run. Returns the number
+    of events delivered.
+    """
+    AuditCursor.objects.get_or_create(sink=sink.name)
+    delivered = 0
+    while True:
+        with transaction.atomic():
+            cursor = AuditCursor.objects.select_for_update().get(sink=sink.name)
+            now = timezone.now().timestamp()
+            missing = {
+                int(pk): missed_at for pk, missed_at in cursor.missing_ids.items()
+                if now - missed_at < MISSING_SECONDS
+            }
+            events = list(
+                AuditEvent.objects
+                .filter(Q(id__gt=cursor.last_event_id) | Q(id__in=missing))
+                .order_by('id')
+                .values('id', 'occurred_at', 'action', 'model', 'object_id', 'user_id', 'data')[:batch_size]
+            )
+            for event in events:
+                if event['id'] > cursor.last_event_id:
+                    # An id skipped below an older event belongs to a transaction long since over
+                    missed_at = event['occurred_at'].timestamp()
+                    if now - missed_at < MISSING_SECONDS:
+                        missing.update(dict.fromkeys(range(cursor.last_event_id + 1, event['id']), missed_at))
+                    cursor.last_event_id = event['id']
+                else:
+                    del missing[event['id']]
+            missing_ids = {str(pk): missed_at for pk, missed_at in missing.items()}
+            if not events and missing_ids == cursor.missing_ids:
+                return delivered
+            if events:
+                sink.deliver(_fold(events))
+                cursor.delivered_at = timezone.now()
+            cursor.missing_ids = missing_ids
+            cursor.save(update_fields=['last_event_id', 'missing_ids', 'delivered_at'])
+        delivered += len(events)
+        if len(events) < batch_size:
+            return delivered
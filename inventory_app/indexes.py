@@ -0,0 +1,20 @@
+from django.contrib.postgres.indexes import OpClass
+from django.db import models
+
+
+class PrefixIndex(models.Index):
+    """
+    An expression index that serves ``LIKE 'prefix%'`` lookups.
+
+    On PostgreSQL a plain btree index only serves LIKE under the C collation,
+    and expression indexes get no ``_like`` twin the way text columns do, so
+    the expressions are indexed with text_pattern_ops there. Other databases
+    get a plain index.
+    """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor == 'postgresql':
+            index = self.clone()
+            index.expressions = tuple(OpClass(expression, name='text_pattern_ops') for expression in self.expressions)
+            return super(PrefixIndex, index).create_sql(model, schema_editor, using=using, **kwargs)
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from inventory_app import audit
+
+
+class Command(BaseCommand):
+    help = "Deliver new audit events to the sinks in settings.AUDIT_SINKS. Run from cron, or with --interval as a worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sink', action='append', dest='sinks', help="Only this sink (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=audit.BATCH_SIZE)
+        parser.add_argument('--interval', type=float, help="Keep running, polling every this many seconds.")
+
+    def handle(self, *args, **options):
+        try:
+            sinks = audit.get_sinks(options['sinks'])
+        except KeyError as exc:
+            raise CommandError(exc.args[0])
+        if not sinks:
+            raise CommandError("No audit sinks are configured in settings.AUDIT_SINKS.")
+
+        while True:
+            for sink in sinks:
+                try:
+                    count = audit.dispatch(sink, batch_size=options['batch_size'])
+                except Exception as exc:
+                    # The batch stays undelivered and is retried on the next pass
+                    self.stderr.write(f"{sink.name}: delivery failed: {exc}")
+                    continue
+                if count or options['interval'] is None:
+                    self.stdout.write(self.style.SUCCESS(f"{sink.name}: delivered {count} events."))
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from inventory_app.models import Category
+
+
+class Command(BaseCommand):
+    help = "Recompute product count, units on hand and stock value for every category subtree."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = Category.rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups for {count} categories."))
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_main_store(apps, schema_editor):
+    Location = apps.get_model('inventory_app', 'Location')
+    Product = apps.get_model('inventory_app', 'Product')
+    StockLevel = apps.get_model('inventory_app', 'StockLevel')
+
+    main_store = Location.objects.create(name='Main Store', kind='Store', is_default=True)
+    StockLevel.objects.bulk_create(
+        [
+            StockLevel(product_id=product_id, location=main_store, quantity=quantity)
+            for product_id, quantity in Product.objects.filter(quantity__gt=0).values_list('id', 'quantity').iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='reason',
+            field=models.CharField(blank=True, choices=[('Sold', 'Sold'), ('Damaged', 'Damaged'), ('Used on Site', 'Used on Site'), ('Modified', 'Modified'), ('Transfer', 'Transfer')], max_length=20, null=True),
+        ),
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('kind', models.CharField(choices=[('Store', 'Main Store'), ('Branch', 'Branch Store'), ('Truck', 'Truck')], default='Store', max_length=10)),
+                ('is_default', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['name'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_default', True)), fields=('is_default',), name='unique_default_location')],
+            },
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='stock_movements', to='inventory_app.location'),
+        ),
+        migrations.CreateModel(
+            name='StockLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_levels', to='inventory_app.location')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_levels', to='inventory_app.product')),
+            ],
+            options={
+                'ordering': ['location__name'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'location'), name='unique_stock_level')],
+            },
+        ),
+        migrations.RunPython(create_main_store, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:43
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def populate_paths_and_rollups(apps, schema_editor):
+    Category = apps.get_model('inventory_app', 'Category')
+    Product = apps.get_model('inventory_app', 'Product')
+
+    # Existing categories are all top level
+    totals = {
+        row['category_id']: row
+        for row in Product.objects.values('category_id').annotate(
+            count=models.Count('id'),
+            units=models.Sum('quantity'),
+            value=models.Sum(models.F('quantity') * models.F('price')),
+        )
+    }
+    categories = list(Category.objects.all())
+    for category in categories:
+        row = totals.get(category.pk, {})
+        category.path = str(category.pk).zfill(8)
+        category.product_count = row.get('count') or 0
+        category.units_on_hand = row.get('units') or 0
+        category.stock_value = row.get('value') or 0
+    Category.objects.bulk_update(categories, ['path', 'product_count', 'units_on_hand', 'stock_value'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0003_stockmovement_client_uuid'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='category',
+            options={'ordering': ['path'], 'verbose_name_plural': 'categories'},
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='inventory_app.category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(editable=False, max_length=255, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='stock_value',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=16),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='units_on_hand',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_paths_and_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0006_product_name_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='reason',
+            field=models.CharField(blank=True, choices=[('Sold', 'Sold'), ('Damaged', 'Damaged'), ('Used on Site', 'Used on Site'), ('Modified', 'Modified'), ('Transfer', 'Transfer'), ('Returned', 'Returned')], max_length=20, null=True),
+        ),
+    ]
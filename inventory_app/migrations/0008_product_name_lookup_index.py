@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:08
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0007_returned_reason'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.text.Upper('name'), name='product_name_upper_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:44
+
+import django.db.models.functions.text
+import inventory_app.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0010_audit_log'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_name_upper_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=inventory_app.indexes.PrefixIndex(django.db.models.functions.text.Upper('name'), name='product_name_upper_idx'),
+        ),
+    ]
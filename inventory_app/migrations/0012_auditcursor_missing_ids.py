@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0011_product_name_prefix_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditcursor',
+            name='missing_ids',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -1,12 +1,169 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr, Upper
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from decimal import Decimal
+from .indexes import PrefixIndex
+
+
+def _fields_except(instance, update_fields, excluded):
+    """``update_fields`` for a save of ``instance`` that leaves the ``excluded`` columns as they are in the database."""
+    if update_fields is None:
+        update_fields = [field.name for field in instance._meta.concrete_fields if not field.primary_key]
+    return [name for name in update_fields if name not in excluded]
+
 
 class Category(models.Model):
+    # Materialised path: one fixed-width segment per ancestor (root first), so a
+    # subtree is a single range scan on the path index under any collation.
+    PATH_STEP = 8
+
     name = models.CharField(max_length=100, unique=True)
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    path = models.CharField(max_length=255, unique=True, null=True, editable=False)
+
+    # Subtree rollups, maintained incrementally (see adjust_rollups); save() never writes them
+    ROLLUP_FIELDS = ('product_count', 'units_on_hand', 'stock_value')
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+    units_on_hand = models.BigIntegerField(default=0, editable=False)
+    stock_value = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'), editable=False)
+
+    class Meta:
+        ordering = ['path']
+        verbose_name_plural = 'categories'
     
     def __str__(self):
         return self.name
 
+    @property
+    def depth(self):
+        return len(self.path or '') // self.PATH_STEP - 1
+
+    @property
+    def tree_label(self):
+        return f"{'— ' * self.depth}{self.name}"
+
+    @classmethod
+    def ids_from_path(cls, path):
+        return [int(path[i:i + cls.PATH_STEP]) for i in range(0, len(path or ''), cls.PATH_STEP)]
+
+    @classmethod
+    def subtree_filter(cls, path, prefix=''):
+        # Every descendant path sorts between ``path`` and ``path`` with its last segment + 1
+        upper = str(int(path) + 1).zfill(len(path))
+        return models.Q(**{f'{prefix}path__gte': path, f'{prefix}path__lt': upper})
+
+    def subtree(self):
+        return Category.objects.filter(self.subtree_filter(self.path))
+
+    def ancestors(self):
+        return Category.objects.filter(pk__in=self.ids_from_path(self.path)).exclude(pk=self.pk)
+
+    @classmethod
+    def adjust_rollups(cls, category_id, products=0, units=0, value=Decimal('0.00'), include_self=True):
+        """Add the given deltas to a category and all of its ancestors in one UPDATE."""
+        if not (products or units or value):
+            return
+        path = cls.objects.filter(pk=category_id).values_list('path', flat=True).first()
+        ids = cls.ids_from_path(path)
+        if not include_self:
+            ids = ids[:-1]
+        cls.objects.filter(pk__in=ids).update(
+            product_count=F('product_count') + products,
+            units_on_hand=F('units_on_hand') + units,
+            stock_value=F('stock_value') + value,
+        )
+
+    @classmethod
+    def rebuild_rollups(cls):
+        """Recompute every subtree rollup from the product table (repairs any drift)."""
+        direct = {
+            row['category_id']: row
+            for row in Product.objects.values('category_id').annotate(
+                count=models.Count('id'),
+                units=models.Sum('quantity'),
+                value=models.Sum(F('quantity') * F('price')),
+            )
+        }
+        categories = list(cls.objects.only('id', 'path'))
+        by_id = {category.pk: category for category in categories}
+        for category in categories:
+            category.product_count, category.units_on_hand, category.stock_value = 0, 0, Decimal('0.00')
+        for category in categories:
+            row = direct.get(category.pk)
+            if not row:
+                continue
+            for ancestor_id in cls.ids_from_path(category.path):
+                ancestor = by_id[ancestor_id]
+                ancestor.product_count += row['count']
+                ancestor.units_on_hand += row['units'] or 0
+                ancestor.stock_value += row['value'] or 0
+        cls.objects.bulk_update(categories, ['product_count', 'units_on_hand', 'stock_value'], batch_size=500)
+        return len(categories)
+
+    def _build_path(self):
+        parent_path = ''
+        if self.parent_id:
+            parent_path = Category.objects.values_list('path', flat=True).get(pk=self.parent_id)
+        return parent_path + str(self.pk).zfill(self.PATH_STEP)
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            old = None
+            if self.pk:
+                old = Category.objects.filter(pk=self.pk).values('parent_id', 'path').first()
+            if old and old['parent_id'] != self.parent_id and self.parent_id:
+                parent_path = Category.objects.values_list('path', flat=True).get(pk=self.parent_id)
+                if parent_path.startswith(old['path']):
+                    raise ValueError("A category cannot be moved under itself or one of its subcategories")
+            if old:
+                # The path and rollups in memory may be stale; they change only through _move and adjust_rollups
+                kwargs['update_fields'] = _fields_except(self, kwargs.get('update_fields'), ('path', *self.ROLLUP_FIELDS))
+
+            super().save(*args, **kwargs)
+
+            if old is None:
+                self.path = self._build_path()
+                Category.objects.filter(pk=self.pk).update(path=self.path)
+            elif old['parent_id'] != self.parent_id:
+                self._move(old['path'])
+
+    def _move(self, old_path):
+        rollup = Category.objects.values('product_count', 'units_on_hand', 'stock_value').get(pk=self.pk)
+        Category.adjust_rollups(
+            self.pk,
+            products=-rollup['product_count'],
+            units=-rollup['units_on_hand'],
+            value=-rollup['stock_value'],
+            include_self=False,
+        )
+        self.path = self._build_path()
+        Category.objects.filter(self.subtree_filter(old_path)).update(
+            path=Concat(Value(self.path), Substr('path', len(old_path) + 1))
+        )
+        Category.adjust_rollups(
+            self.pk,
+            products=rollup['product_count'],
+            units=rollup['units_on_hand'],
+            value=rollup['stock_value'],
+            include_self=False,
+        )
+
+    def delete(self, *args, **kwargs):
+        # Products and subcategories cascade, so the whole subtree leaves the ancestors' totals
+        with transaction.atomic():
+            rollup = Category.objects.values('product_count', 'units_on_hand', 'stock_value').get(pk=self.pk)
+            Category.adjust_rollups(
+                self.pk,
+                products=-rollup['product_count'],
+                units=-rollup['units_on_hand'],
+                value=-rollup['stock_value'],
+                include_self=False,
+            )
+            return super().delete(*args, **kwargs)
+
 
 class Product(models.Model):
     name = models.CharField(max_length=200)
@@ -14,15 +171,109 @@ class Product(models.Model):
     brand = models.CharField(max_length=100)
     barcode = models.CharField(max_length=100, unique=True, help_text="Scan or enter the product's barcode")
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
-    quantity = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)  # total across all locations, maintained by inventory_app.stock
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image = models.ImageField(upload_to='product_images/', blank=True, null=True)  # <-- Optional image
+    updated_at = models.DateTimeField(auto_now=True)  # bumped on every write; the change-feed cursor
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='product_name_idx'),
+            # Line-item autocomplete on the sales forms matches a prefix of the upper-cased name
+            PrefixIndex(Upper('name'), name='product_name_upper_idx'),
+            models.Index(fields=['updated_at', 'id'], name='product_updated_idx'),
+        ]
 
     def __str__(self):
         if self.designation:
             return f"{self.name} ({self.designation})"
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Keep the category rollups in step with what this save actually writes
+        with transaction.atomic():
+            old = None
+            if self.pk:
+                old = Product.objects.filter(pk=self.pk).values('category_id', 'quantity', 'price').first()
+            if old:
+                # The quantity is kept by inventory_app.stock; the copy a form or the admin loaded may be stale
+                kwargs['update_fields'] = _fields_except(self, kwargs.get('update_fields'), ('quantity',))
+                self.quantity = old['quantity']
+            super().save(*args, **kwargs)
+
+            update_fields = kwargs.get('update_fields')
+
+            def written(field):
+                return update_fields is None or field in update_fields
+
+            new = {
+                'category_id': self.category_id if written('category') else old['category_id'],
+                'quantity': int(self.quantity),
+                'price': Decimal(str(self.price)) if written('price') else old['price'],
+            }
+            if old is None:
+                Category.adjust_rollups(new['category_id'], 1, new['quantity'], new['quantity'] * new['price'])
+            elif old['category_id'] != new['category_id']:
+                Category.adjust_rollups(old['category_id'], -1, -old['quantity'], -old['quantity'] * old['price'])
+                Category.adjust_rollups(new['category_id'], 1, new['quantity'], new['quantity'] * new['price'])
+            else:
+                Category.adjust_rollups(
+                    new['category_id'],
+                    units=new['quantity'] - old['quantity'],
+                    value=new['quantity'] * new['price'] - old['quantity'] * old['price'],
+                )
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            old = Product.objects.values('category_id', 'quantity', 'price').get(pk=self.pk)
+            Category.adjust_rollups(old['category_id'], -1, -old['quantity'], -old['quantity'] * old['price'])
+            return super().delete(*args, **kwargs)
+
+
+class Location(models.Model):
+    STORE = 'Store'
+    BRANCH = 'Branch'
+    TRUCK = 'Truck'
+
+    KIND_CHOICES = [
+        (STORE, 'Main Store'),
+        (BRANCH, 'Branch Store'),
+        (TRUCK, 'Truck'),
+    ]
+
+    name = models.CharField(max_length=100, unique=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=STORE)
+    is_default = models.BooleanField(default=False)  # receives stock when no location is given
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(fields=['is_default'], condition=models.Q(is_default=True), name='unique_default_location'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def get_default(cls):
+        return cls.objects.filter(is_default=True).first() or cls.objects.order_by('id').first()
+
+
+class StockLevel(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_levels')
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='stock_levels')
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['location__name']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'location'], name='unique_stock_level'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} @ {self.location.name}: {self.quantity}"
+
 
 class StockMovement(models.Model):
     STOCK_IN = 'IN'
@@ -33,6 +284,8 @@ class StockMovement(models.Model):
         ('Damaged', 'Damaged'),
         ('Used on Site', 'Used on Site'),
         ('Modified', 'Modified'),
+        ('Transfer', 'Transfer'),
+        ('Returned', 'Returned'),
     ]
     
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
@@ -41,9 +294,72 @@ class StockMovement(models.Model):
         choices=[(STOCK_IN, 'Stock In'), (STOCK_OUT, 'Stock Out')]
     )
     quantity = models.PositiveIntegerField()
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='stock_movements', null=True, blank=True)
     reason = models.CharField(max_length=20, choices=REASON_CHOICES, blank=True, null=True)
     date = models.DateTimeField(auto_now_add=True)
     performed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    client_uuid = models.UUIDField(unique=True, null=True, blank=True, editable=False)  # idempotency key from handheld devices
+
+    class Meta:
+        # History filters always narrow by one column and then range over date
+        indexes = [
+            models.Index(fields=['date'], name='movement_date_idx'),
+            models.Index(fields=['product', 'date'], name='movement_product_date_idx'),
+            models.Index(fields=['movement_type', 'date'], name='movement_type_date_idx'),
+            models.Index(fields=['reason', 'date'], name='movement_reason_date_idx'),
+            models.Index(fields=['performed_by', 'date'], name='movement_user_date_idx'),
+            models.Index(fields=['location', 'date'], name='movement_location_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.movement_type} - {self.product.name} ({self.quantity}) on {self.date.strftime('%Y-%m-%d')}"
+
+
+class AuditEvent(models.Model):
+    """
+    One create, update or delete of a tracked row, written in the same
+    transaction as the change by inventory_app.audit. Rows are never changed
+    or removed; delivery to the configured sinks is tracked in AuditCursor.
+    """
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+    occurred_at = models.DateTimeField(default=timezone.now)
+    action = models.CharField(max_length=6, choices=[(CREATE, 'Create'), (UPDATE, 'Update'), (DELETE, 'Delete')])
+    model = models.CharField(max_length=100)  # app label and model name, e.g. "sales.Invoice"
+    object_id = models.BigIntegerField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='audit_events')
+    data = models.JSONField(encoder=DjangoJSONEncoder, default=dict)  # the row's columns after the change
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'object_id', 'id'], name='audit_object_idx'),
+            models.Index(fields=['occurred_at'], name='audit_occurred_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.model} #{self.object_id}"
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError("Audit events are append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Audit events are append-only")
+
+
+class AuditCursor(models.Model):
+    """
+    How far each sink in settings.AUDIT_SINKS has got: the highest AuditEvent
+    id delivered, and the lower ids that had not been committed at the time.
+    """
+    sink = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    # Missing id -> time of the event above it, as a Unix timestamp
+    missing_ids = models.JSONField(default=dict, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.sink} @ {self.last_event_id}"
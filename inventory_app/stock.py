@@ -0,0 +1,248 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from . import audit
+from .models import AuditEvent, Category, Location, Product, StockLevel, StockMovement
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product, location, requested, available):
+        self.product = product
+        self.location = location
+        self.requested = requested
+        self.available = available
+        super().__init__(
+            f"Insufficient stock for {product.name} at {location.name}: "
+            f"requested {requested}, available {available}"
+        )
+
+
+def get_stock_level(product, location):
+    """Quantity of ``product`` held at ``location`` (single indexed lookup)."""
+    return (
+        StockLevel.objects
+        .filter(product=product, location=location)
+        .values_list('quantity', flat=True)
+        .first()
+    ) or 0
+
+
+def _lock(product):
+    # Same lock order as apply_movements: the product row first, then its levels
+    Product.objects.select_for_update().filter(pk=product.pk).values_list('pk').get()
+
+
+def _add(product, location, quantity):
+    level, _ = StockLevel.objects.get_or_create(product=product, location=location)
+    StockLevel.objects.filter(pk=level.pk).update(quantity=F('quantity') + quantity)
+
+
+def _remove(product, location, quantity):
+    # Conditional UPDATE so two concurrent stock-outs can never drive a level negative
+    updated = (
+        StockLevel.objects
+        .filter(product=product, location=location, quantity__gte=quantity)
+        .update(quantity=F('quantity') - quantity)
+    )
+    if not updated:
+        raise InsufficientStock(product, location, quantity, get_stock_level(product, location))
+
+
+def _adjust_category(product, units):
+    Category.adjust_rollups(product.category_id, units=units, value=units * Decimal(str(product.price)))
+
+
+# -------------------- Stock In / Out --------------------
+def stock_in(product, quantity, user=None, location=None, reason=None):
+    location = location or Location.get_default()
+    with transaction.atomic():
+        _lock(product)
+        _add(product, location, quantity)
+        Product.objects.filter(pk=product.pk).update(quantity=F('quantity') + quantity, updated_at=timezone.now())
+        audit.record_update(Product.objects.filter(pk=product.pk), ['quantity', 'updated_at'])
+        _adjust_category(product, quantity)
+        movement = StockMovement.objects.create(
+            product=product,
+            location=location,
+            movement_type=StockMovement.STOCK_IN,
+            quantity=quantity,
+            reason=reason,
+            performed_by=user,
+        )
+    product.refresh_from_db(fields=['quantity'])
+    return movement
+
+
+def stock_out(product, quantity, user=None, location=None, reason=None):
+    location = location or Location.get_default()
+    with transaction.atomic():
+        _lock(product)
+        _remove(product, location, quantity)
+        Product.objects.filter(pk=product.pk).update(quantity=F('quantity') - quantity, updated_at=timezone.now())
+        audit.record_update(Product.objects.filter(pk=product.pk), ['quantity', 'updated_at'])
+        _adjust_category(product, -quantity)
+        movement = StockMovement.objects.create(
+            product=product,
+            location=location,
+            movement_type=StockMovement.STOCK_OUT,
+            quantity=quantity,
+            reason=reason,
+            performed_by=user,
+        )
+    product.refresh_from_db(fields=['quantity'])
+    return movement
+
+
+# -------------------- Transfers --------------------
+def transfer(product, source, destination, quantity, user=None):
+    """Move stock between locations; the product total is unchanged."""
+    if source == destination:
+        raise ValueError("Source and destination must be different locations")
+    with transaction.atomic():
+        _lock(product)
+        _remove(product, source, quantity)
+        _add(product, destination, quantity)
+        movements = StockMovement.objects.bulk_create([
+            StockMovement(
+                product=product,
+                location=source,
+                movement_type=StockMovement.STOCK_OUT,
+                quantity=quantity,
+                reason='Transfer',
+                performed_by=user,
+            ),
+            StockMovement(
+                product=product,
+                location=destination,
+                movement_type=StockMovement.STOCK_IN,
+                quantity=quantity,
+                reason='Transfer',
+                performed_by=user,
+            ),
+        ])
+        # bulk_create sends no post_save, so the audit events are written here
+        audit.record_many(AuditEvent.CREATE, movements)
+    return movements
+
+
+def set_quantity(product, quantity, user=None, location=None):
+    """Adjust the stock at ``location`` so the product total becomes ``quantity``."""
+    product.refresh_from_db(fields=['quantity'])
+    delta = quantity - product.quantity
+    if delta > 0:
+        return stock_in(product, delta, user=user, location=location, reason='Modified')
+    if delta < 0:
+        return stock_out(product, -delta, user=user, location=location, reason='Modified')
+    return None
+
+
+# -------------------- Bulk Movements --------------------
+APPLIED = 'applied'
+DUPLICATE = 'duplicate'
+REJECTED = 'rejected'
+
+
+def _lock_levels(product_ids, location_ids):
+    return {
+        (level.product_id, level.location_id): level
+        for level in (
+            StockLevel.objects.select_for_update()
+            .filter(product_id__in=product_ids, location_id__in=location_ids)
+            .order_by('pk')
+        )
+    }
+
+
+def apply_movements(movements, user=None):
+    """
+    Apply a batch of unsaved StockMovement instances in one transaction.
+
+    Products and their stock levels are locked up front, creating any missing
+    levels, and quantities are worked out in memory and written back with
+    bulk_update. Movements whose client_uuid already exists are skipped, and
+    stock-outs that would go below zero are rejected individually. Returns
+    one (status, movement_or_error) tuple per input, in order.
+    """
+    results = [None] * len(movements)
+    if not movements:
+        return results
+
+    default_location = Location.get_default()
+    for movement in movements:
+        if movement.location_id is None:
+            movement.location = default_location
+        if user is not None and movement.performed_by_id is None:
+            movement.performed_by = user
+
+    product_ids = {m.product_id for m in movements}
+    location_ids = {m.location_id for m in movements}
+
+    with transaction.atomic():
+        # Lock order: products first, then levels, always by primary key
+        products = {
+            p.pk: p
+            for p in Product.objects.select_for_update().filter(pk__in=product_ids).order_by('pk')
+        }
+        levels = _lock_levels(product_ids, location_ids)
+        missing = {(m.product_id, m.location_id) for m in movements} - set(levels)
+        if missing:
+            # Another transaction may be creating the same levels; the insert waits for it
+            # and skips the rows it made, and they are read back and locked like the rest
+            StockLevel.objects.bulk_create(
+                [StockLevel(product_id=product_id, location_id=location_id) for product_id, location_id in missing],
+                ignore_conflicts=True,
+            )
+            levels.update(_lock_levels({key[0] for key in missing}, {key[1] for key in missing}))
+
+        uuids = [m.client_uuid for m in movements if m.client_uuid]
+        seen = set(
+            StockMovement.objects.filter(client_uuid__in=uuids).values_list('client_uuid', flat=True)
+        ) if uuids else set()
+
+        changed_levels = set()
+        changed_products = set()
+        category_deltas = defaultdict(lambda: [0, Decimal('0.00')])
+        to_create = []
+
+        for i, movement in enumerate(movements):
+            if movement.client_uuid:
+                if movement.client_uuid in seen:
+                    results[i] = (DUPLICATE, None)
+                    continue
+                seen.add(movement.client_uuid)
+
+            key = (movement.product_id, movement.location_id)
+            level = levels[key]
+            product = products[movement.product_id]
+
+            delta = movement.quantity
+            if movement.movement_type == StockMovement.STOCK_OUT:
+                if movement.quantity > level.quantity:
+                    results[i] = (REJECTED, InsufficientStock(product, movement.location, movement.quantity, level.quantity))
+                    continue
+                delta = -movement.quantity
+            level.quantity += delta
+            product.quantity += delta
+            category_deltas[product.category_id][0] += delta
+            category_deltas[product.category_id][1] += delta * product.price
+
+            changed_levels.add(key)
+            changed_products.add(product.pk)
+            to_create.append(movement)
+            results[i] = (APPLIED, movement)
+
+        StockLevel.objects.bulk_update([levels[key] for key in changed_levels], ['quantity'])
+        now = timezone.now()
+        for pk in changed_products:
+            products[pk].updated_at = now
+        changed = [products[pk] for pk in changed_products]
+        Product.objects.bulk_update(changed, ['quantity', 'updated_at'])
+        audit.record_many(AuditEvent.UPDATE, changed, fields=['quantity', 'updated_at'])
+        StockMovement.objects.bulk_create(to_create, batch_size=500)
+        audit.record_many(AuditEvent.CREATE, to_create)
+        for category_id, (units, value) in category_deltas.items():
+            Category.adjust_rollups(category_id, units=units, value=value)
+
+    return results
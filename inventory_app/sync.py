@@ -0,0 +1,186 @@
+import uuid
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from .models import Location, Product, StockMovement
+from . import stock
+
+MAX_BATCH_SIZE = 2000
+
+MOVEMENT_TYPES = {StockMovement.STOCK_IN, StockMovement.STOCK_OUT}
+REASONS = {code for code, _ in StockMovement.REASON_CHOICES}
+CURSOR_SALT = 'inventory_app.sync'
+# How long a cursor keeps asking for an id it skipped. Most are from transactions
+# still in flight; the rest were used up by a rollback or deleted and never appear.
+MISSING_SECONDS = getattr(settings, 'SYNC_MISSING_SECONDS', 3600)
+
+
+class SyncError(Exception):
+    pass
+
+
+def _parse_item(item, products, locations):
+    if not isinstance(item, dict):
+        raise SyncError("Item must be an object")
+    try:
+        client_uuid = uuid.UUID(str(item.get("uuid")))
+    except ValueError:
+        raise SyncError("Missing or invalid uuid")
+
+    product = products.get(item.get("barcode"))
+    if product is None:
+        raise SyncError("Product not found")
+
+    movement_type = item.get("movement_type")
+    if movement_type not in MOVEMENT_TYPES:
+        raise SyncError("movement_type must be IN or OUT")
+
+    try:
+        quantity = int(item.get("quantity"))
+    except (TypeError, ValueError):
+        raise SyncError("Invalid quantity")
+    if quantity <= 0:
+        raise SyncError("Quantity must be greater than 0")
+
+    reason = item.get("reason") or None
+    if reason is not None and reason not in REASONS:
+        raise SyncError("Invalid reason")
+
+    location = None
+    if item.get("location") is not None:
+        location = locations.get(str(item["location"]))
+        if location is None:
+            raise SyncError("Location not found")
+
+    return StockMovement(
+        client_uuid=client_uuid,
+        product=product,
+        location=location,
+        movement_type=movement_type,
+        quantity=quantity,
+        reason=reason,
+    )
+
+
+def sync_movements(items, user):
+    """
+    Apply a batch of scans queued on a handheld device.
+
+    Each item carries a client-generated ``uuid`` so replays of the same batch
+    are reported as duplicates instead of being counted twice. Products and
+    locations are resolved with one query each and the whole batch is applied
+    in a single transaction.
+    """
+    if len(items) > MAX_BATCH_SIZE:
+        raise SyncError(f"Batch too large (max {MAX_BATCH_SIZE} items)")
+
+    barcodes = {item.get("barcode") for item in items if isinstance(item, dict)}
+    products = {p.barcode: p for p in Product.objects.filter(barcode__in=barcodes)}
+    locations = {str(loc.pk): loc for loc in Location.objects.filter(is_active=True)}
+
+    results = [None] * len(items)
+    movements = []
+    positions = []
+    for i, item in enumerate(items):
+        try:
+            movements.append(_parse_item(item, products, locations))
+            positions.append(i)
+        except SyncError as e:
+            results[i] = {
+                "uuid": item.get("uuid") if isinstance(item, dict) else None,
+                "status": stock.REJECTED,
+                "error": str(e),
+            }
+
+    for i, movement, (status, detail) in zip(positions, movements, stock.apply_movements(movements, user=user)):
+        result = {"uuid": str(movement.client_uuid), "status": status}
+        if status == stock.APPLIED:
+            result["id"] = detail.pk
+        elif status == stock.REJECTED:
+            result["error"] = str(detail)
+        results[i] = result
+
+    return {
+        "results": results,
+        "cursor": current_cursor(),
+    }
+
+
+def _advance(after, missing, rows):
+    """
+    Move a cursor at ``after`` past ``rows`` of (id, date), oldest first.
+
+    Ids skipped below a recent movement are added to ``missing`` with its time,
+    and missing ids that turn up are taken out. Returns the new last id.
+    """
+    now = timezone.now().timestamp()
+    for pk, date in rows:
+        if pk > after:
+            # An id skipped below an older movement belongs to a transaction long since over
+            if now - date.timestamp() < MISSING_SECONDS:
+                missing.update(dict.fromkeys(range(after + 1, pk), date.timestamp()))
+            after = pk
+        else:
+            missing.pop(pk, None)
+    return after
+
+
+def _encode(after, missing):
+    return signing.dumps({'after': after, 'missing': missing}, salt=CURSOR_SALT)
+
+
+def _decode(cursor):
+    if not cursor:
+        return 0, {}
+    if cursor.isdigit():
+        return int(cursor), {}  # a plain id from a device that has not synced since cursors were tokens
+    try:
+        data = signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        raise SyncError("Invalid cursor")
+    now = timezone.now().timestamp()
+    return data['after'], {int(pk): missed_at for pk, missed_at in data['missing'].items() if now - missed_at < MISSING_SECONDS}
+
+
+def current_cursor():
+    """A cursor at the newest movement that still asks for the recent ids below it not yet committed."""
+    rows = list(StockMovement.objects.order_by("-id").values_list("id", "date")[:500])[::-1]
+    missing = {}
+    after = _advance(rows[0][0] if rows else 0, missing, rows)
+    return _encode(after, missing)
+
+
+def movements_since(cursor, limit=500):
+    """
+    Movements recorded after ``cursor``, so a device can catch up on other devices' scans.
+
+    Ids are handed out before commit, so a movement can commit below one
+    already returned. The cursor is an opaque token that carries the ids it
+    skipped, and they are returned on a later call if they turn up.
+    """
+    after, missing = _decode(cursor)
+    rows = list(
+        StockMovement.objects
+        .filter(Q(id__gt=after) | Q(id__in=missing))
+        .order_by("id")
+        .values("id", "client_uuid", "product__barcode", "location_id", "movement_type", "quantity", "reason", "date")[:limit]
+    )
+    after = _advance(after, missing, [(row["id"], row["date"]) for row in rows])
+    return {
+        "movements": [
+            {
+                "id": row["id"],
+                "uuid": str(row["client_uuid"]) if row["client_uuid"] else None,
+                "barcode": row["product__barcode"],
+                "location": row["location_id"],
+                "movement_type": row["movement_type"],
+                "quantity": row["quantity"],
+                "reason": row["reason"],
+                "date": row["date"].isoformat(),
+            }
+            for row in rows
+        ],
+        "cursor": _encode(after, missing),
+        "has_more": len(rows) == limit,
+    }
@@ -1,3 +1,103 @@
+import uuid
+from decimal import Decimal
+from django.contrib.auth.models import User
 from django.test import TestCase
+from . import stock
+from .models import Category, Location, Product, StockLevel, StockMovement
+from .sync import SyncError, movements_since, sync_movements
 
-# Create your tests here.
+
+class SyncMovementsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("clerk")
+        self.location = Location.get_default()
+        self.category = Category.objects.create(name="Fittings")
+        self.product = Product.objects.create(
+            name="Elbow", brand="Acme", barcode="111", category=self.category, price=Decimal("2.50"),
+        )
+
+    def scan(self, movement_type, quantity, client_uuid=None, barcode="111"):
+        return {
+            "uuid": str(client_uuid or uuid.uuid4()),
+            "barcode": barcode,
+            "movement_type": movement_type,
+            "quantity": quantity,
+        }
+
+    def assertStock(self, quantity):
+        self.product.refresh_from_db()
+        self.category.refresh_from_db()
+        self.assertEqual(self.product.quantity, quantity)
+        self.assertEqual(StockLevel.objects.get(product=self.product, location=self.location).quantity, quantity)
+        self.assertEqual(self.category.units_on_hand, quantity)
+        self.assertEqual(self.category.stock_value, quantity * self.product.price)
+
+    def statuses(self, response):
+        return [result["status"] for result in response["results"]]
+
+    def test_replayed_batch_is_not_counted_twice(self):
+        batch = [self.scan("IN", 10), self.scan("OUT", 4)]
+        first = sync_movements(batch, self.user)
+        replay = sync_movements(batch, self.user)
+
+        self.assertEqual(self.statuses(first), [stock.APPLIED, stock.APPLIED])
+        self.assertEqual(self.statuses(replay), [stock.DUPLICATE, stock.DUPLICATE])
+        self.assertEqual(StockMovement.objects.count(), 2)
+        self.assertStock(6)
+
+    def test_duplicate_uuid_within_a_batch_is_counted_once(self):
+        client_uuid = uuid.uuid4()
+        response = sync_movements([self.scan("IN", 5, client_uuid), self.scan("IN", 5, client_uuid)], self.user)
+
+        self.assertEqual(self.statuses(response), [stock.APPLIED, stock.DUPLICATE])
+        self.assertStock(5)
+
+    def test_duplicate_uuid_across_batches_is_counted_once(self):
+        repeated = self.scan("IN", 5)
+        sync_movements([repeated], self.user)
+        response = sync_movements([repeated, self.scan("IN", 3)], self.user)
+
+        self.assertEqual(self.statuses(response), [stock.DUPLICATE, stock.APPLIED])
+        self.assertEqual(StockMovement.objects.count(), 2)
+        self.assertStock(8)
+
+    def test_rejected_lines_change_nothing_and_can_be_sent_again(self):
+        too_many = self.scan("OUT", 3)
+        response = sync_movements(
+            [self.scan("IN", 2), too_many, self.scan("IN", 1, barcode="missing"), {"uuid": "not-a-uuid"}],
+            self.user,
+        )
+        self.assertEqual(
+            self.statuses(response), [stock.APPLIED, stock.REJECTED, stock.REJECTED, stock.REJECTED],
+        )
+        self.assertStock(2)
+
+        # A rejected line was not recorded, so it is applied once there is stock for it
+        sync_movements([self.scan("IN", 5)], self.user)
+        response = sync_movements([too_many, too_many], self.user)
+        self.assertEqual(self.statuses(response), [stock.APPLIED, stock.DUPLICATE])
+        self.assertStock(4)
+
+    def test_cursor_returns_movements_committed_below_it_later(self):
+        first = StockMovement.objects.create(product=self.product, movement_type="IN", quantity=1)
+        # A movement whose transaction is still open holds the ids in between
+        late_id = first.pk + 1
+        last = StockMovement.objects.create(pk=first.pk + 2, product=self.product, movement_type="IN", quantity=1)
+
+        page = movements_since(None)
+        self.assertEqual([row["id"] for row in page["movements"]], [first.pk, last.pk])
+        self.assertEqual(movements_since(page["cursor"])["movements"], [])
+
+        StockMovement.objects.create(pk=late_id, product=self.product, movement_type="IN", quantity=1)
+        page = movements_since(page["cursor"])
+        self.assertEqual([row["id"] for row in page["movements"]], [late_id])
+        self.assertEqual(movements_since(page["cursor"])["movements"], [])
+
+    def test_plain_id_cursor_is_accepted_and_a_tampered_one_rejected(self):
+        first = StockMovement.objects.create(product=self.product, movement_type="IN", quantity=1)
+        second = StockMovement.objects.create(product=self.product, movement_type="IN", quantity=1)
+
+        page = movements_since(str(first.pk))
+        self.assertEqual([row["id"] for row in page["movements"]], [second.pk])
+        with self.assertRaises(SyncError):
+            movements_since(page["cursor"] + "x")
@@ -20,6 +20,7 @@ urlpatterns = [
     # Stock Management URLs
     path('products/<int:pk>/stock_in/', views.stock_in, name='stock_in'),
     path('products/<int:pk>/stock_out/', views.stock_out, name='stock_out'),
+    path('products/<int:pk>/transfer/', views.stock_transfer, name='stock_transfer'),
 
     # Stock In/Out by Barcode
     path('stock_in_by_barcode/', views.stock_in_by_barcode, name='stock_in_by_barcode'),
@@ -35,4 +36,7 @@ urlpatterns = [
 
     # AJAX barcode lookup
     path('ajax/get_product/', views.get_product_by_barcode, name='get_product_by_barcode'),
+
+    # Handheld offline sync
+    path('api/sync/movements/', views.sync_stock_movements, name='sync_stock_movements'),
 ]
@@ -3,13 +3,20 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import update_session_auth_hash
 from django.contrib import messages
 from .decorators import group_required
-from .models import Category, Product, StockMovement
+from .models import Category, Product, StockMovement, Location
+from .stock import InsufficientStock
+from . import stock
 from django.contrib.auth.models import User
-from django.db.models import Sum, Q, F
+from django.db.models import Sum, Q, F, Count
 from django.db.models.functions import TruncMonth
 from django.contrib.auth.forms import PasswordChangeForm
-from django.utils.timezone import now
+from django.utils.timezone import now, make_aware
+from django.core.paginator import Paginator
+from datetime import datetime, time, timedelta
 from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+import json
+from .sync import SyncError, sync_movements, movements_since
 
 # -------------------- Dashboard --------------------
 @login_required
@@ -59,30 +66,46 @@ def dashboard(request):
 @login_required
 @group_required('Admin', 'Stock Clerk')
 def category_list(request):
+    # Counts, units and value are stored subtree rollups, so no aggregates run here
     categories = Category.objects.all()
     return render(request, 'inventory_app/categories_list.html', {'categories': categories})
 
+def _parent_choices(category=None):
+    parents = Category.objects.only('id', 'name', 'path')
+    if category is not None:
+        parents = parents.exclude(Category.subtree_filter(category.path))
+    return parents
+
+def _save_category(request, category):
+    name = request.POST.get("name")
+    if not name:
+        return False
+    parent_id = request.POST.get("parent")
+    category.name = name
+    category.parent = get_object_or_404(Category, pk=parent_id) if parent_id else None
+    try:
+        category.save()
+    except ValueError as e:
+        messages.error(request, str(e))
+        return False
+    return True
+
 @login_required
 @group_required('Admin', 'Stock Clerk')
 def category_create(request):
     if request.method == "POST":
-        name = request.POST.get("name")
-        if name:
-            Category.objects.create(name=name)
+        if _save_category(request, Category()):
             return redirect("category_list")
-    return render(request, 'inventory_app/category_form.html')
+    return render(request, 'inventory_app/category_form.html', {"parents": _parent_choices()})
 
 @login_required
 @group_required('Admin', 'Stock Clerk')
 def category_update(request, pk):
     category = get_object_or_404(Category, pk=pk)
     if request.method == "POST":
-        name = request.POST.get("name")
-        if name:
-            category.name = name
-            category.save()
+        if _save_category(request, category):
             return redirect("category_list")
-    return render(request, 'inventory_app/category_form.html', {"category": category})
+    return render(request, 'inventory_app/category_form.html', {"category": category, "parents": _parent_choices(category)})
 
 @login_required
 @group_required('Admin', 'Stock Clerk')
@@ -125,16 +148,18 @@ def product_create(request):
 
         if name and category_id:
             category = Category.objects.get(id=category_id)
-            Product.objects.create(
+            product = Product.objects.create(
                 name=name,
                 designation=designation,
                 brand=brand,
                 barcode=barcode,
                 category=category,
-                quantity=quantity,
                 price=price,
                 image=image
             )
+            # Opening stock goes into the default location
+            if quantity and int(quantity) > 0:
+                stock.stock_in(product, int(quantity), user=request.user, reason='Modified')
             return redirect("product_list")
     return render(request, "inventory_app/product_form.html", {"categories": categories})
 
@@ -149,14 +174,22 @@ def product_update(request, pk):
         product.brand = request.POST.get("brand")
         product.barcode = request.POST.get("barcode")
         category_id = request.POST.get("category")
-        product.quantity = request.POST.get("quantity")
+        quantity = request.POST.get("quantity")
         product.price = request.POST.get("price")
         image = request.FILES.get("image")
         if image:
             product.image = image
         if category_id:
             product.category = Category.objects.get(id=category_id)
-        product.save()
+        product.save(update_fields=["name", "designation", "brand", "barcode", "category", "price", "image", "updated_at"])
+
+        # Quantity edits are booked against the default location as a 'Modified' movement
+        if quantity not in (None, ""):
+            try:
+                stock.set_quantity(product, int(quantity), user=request.user)
+            except InsufficientStock as e:
+                messages.error(request, str(e))
+                return redirect("product_update", pk=pk)
         return redirect("product_list")
     return render(request, "inventory_app/product_form.html", {"product": product, "categories": categories})
 
@@ -170,6 +203,22 @@ def product_delete(request, pk):
     return render(request, "inventory_app/product_confirm_delete.html", {"product": product})
 
 # -------------------- Stock Management --------------------
+def _get_location(request):
+    location_id = request.POST.get("location")
+    if location_id:
+        return get_object_or_404(Location, pk=location_id, is_active=True)
+    return Location.get_default()
+
+def _stock_context(product, **extra):
+    context = {
+        "product": product,
+        "locations": Location.objects.filter(is_active=True),
+        "default_location": Location.get_default(),
+        "stock_levels": product.stock_levels.select_related("location"),
+    }
+    context.update(extra)
+    return context
+
 @login_required
 @group_required('Admin', 'Stock Clerk')
 def stock_in(request, pk=None):
@@ -186,21 +235,14 @@ def stock_in(request, pk=None):
             return redirect("stock_in", pk=pk)
 
         if quantity > 0:
-            product.quantity += quantity
-            product.save()
-            StockMovement.objects.create(
-                product=product,
-                movement_type=StockMovement.STOCK_IN,
-                quantity=quantity,
-                performed_by=request.user,
-                barcode=product.barcode
-            )
-            messages.success(request, f"Stock added for {product.name}")
+            location = _get_location(request)
+            stock.stock_in(product, quantity, user=request.user, location=location)
+            messages.success(request, f"Stock added for {product.name} at {location.name}")
             return redirect("dashboard")
         else:
             messages.error(request, "Quantity must be greater than 0")
 
-    return render(request, "inventory_app/stock_in.html", {"product": product})
+    return render(request, "inventory_app/stock_in.html", _stock_context(product))
 
 @login_required
 @group_required('Admin', 'Stock Clerk')
@@ -222,23 +264,48 @@ def stock_out(request, pk=None):
             messages.error(request, "Please select a reason")
             return redirect("stock_out", pk=pk)
 
-        if 0 < quantity <= product.quantity:
-            product.quantity -= quantity
-            product.save()
-            StockMovement.objects.create(
-                product=product,
-                movement_type=StockMovement.STOCK_OUT,
-                quantity=quantity,
-                reason=reason,
-                performed_by=request.user,
-                barcode=product.barcode
-            )
-            messages.success(request, f"Stock removed for {product.name}")
-            return redirect("dashboard")
+        if quantity > 0:
+            location = _get_location(request)
+            try:
+                stock.stock_out(product, quantity, user=request.user, location=location, reason=reason)
+            except InsufficientStock as e:
+                messages.error(request, f"Invalid quantity: {e}")
+            else:
+                messages.success(request, f"Stock removed for {product.name} at {location.name}")
+                return redirect("dashboard")
+        else:
+            messages.error(request, "Quantity must be greater than 0")
+
+    return render(request, "inventory_app/stock_out.html", _stock_context(product, reasons=StockMovement.REASON_CHOICES))
+
+@login_required
+@group_required('Admin', 'Stock Clerk')
+def stock_transfer(request, pk):
+    product = get_object_or_404(Product, pk=pk)
+
+    if request.method == "POST":
+        try:
+            quantity = int(request.POST.get("quantity"))
+        except (ValueError, TypeError):
+            messages.error(request, "Invalid quantity")
+            return redirect("stock_transfer", pk=pk)
+
+        source = get_object_or_404(Location, pk=request.POST.get("source"), is_active=True)
+        destination = get_object_or_404(Location, pk=request.POST.get("destination"), is_active=True)
+        if quantity <= 0:
+            messages.error(request, "Quantity must be greater than 0")
+        elif source == destination:
+            messages.error(request, "Source and destination must be different")
         else:
-            messages.error(request, "Invalid quantity: exceeds available stock")
+            try:
+                stock.transfer(product, source, destination, quantity, user=request.user)
+            except InsufficientStock as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(request, f"Moved {quantity} x {product.name} from {source.name} to {destination.name}")
+                return redirect("product_list")
 
-    return render(request, "inventory_app/stock_out.html", {"product": product, "reasons": StockMovement.REASON_CHOICES})
+    return render(request, "inventory_app/stock_transfer.html", _stock_context(product))
 
 # -------------------- Stock In/Out by Barcode --------------------
 @login_required
@@ -292,12 +359,116 @@ def get_product_by_barcode(request):
     except Product.DoesNotExist:
         return JsonResponse({"error": "Product not found"})
 
+# -------------------- Offline Sync API --------------------
+@login_required
+@group_required('Admin', 'Stock Clerk')
+@require_http_methods(["GET", "POST"])
+def sync_stock_movements(request):
+    if request.method == "GET":
+        try:
+            return JsonResponse(movements_since(request.GET.get("since")))
+        except SyncError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+    try:
+        payload = json.loads(request.body)
+        items = payload["movements"]
+        if not isinstance(items, list):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": "Expected a JSON object with a 'movements' list"}, status=400)
+
+    try:
+        return JsonResponse(sync_movements(items, request.user))
+    except SyncError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
 # -------------------- Stock Movements --------------------
+MOVEMENTS_PER_PAGE = 50
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+    except ValueError:
+        return None
+
+def _filter_movements(params):
+    movements = StockMovement.objects.all()
+    filters = {}
+
+    # Compare against aware datetimes rather than date__date so the date index is usable
+    date_from = _parse_date(params.get("date_from"))
+    date_to = _parse_date(params.get("date_to"))
+    if date_from:
+        movements = movements.filter(date__gte=make_aware(datetime.combine(date_from, time.min)))
+    if date_to:
+        movements = movements.filter(date__lt=make_aware(datetime.combine(date_to + timedelta(days=1), time.min)))
+
+    barcode = params.get("barcode", "").strip()
+    product_id = params.get("product")
+    if barcode:
+        filters["product"] = Product.objects.filter(barcode=barcode).first()
+        movements = movements.filter(product=filters["product"])
+    elif product_id and product_id.isdigit():
+        filters["product"] = Product.objects.filter(pk=product_id).first()
+        movements = movements.filter(product_id=product_id)
+
+    category_id = params.get("category")
+    if category_id and category_id.isdigit():
+        category = Category.objects.filter(pk=category_id).first()
+        if category:
+            movements = movements.filter(Category.subtree_filter(category.path, prefix="product__category__"))
+
+    for field in ("movement_type", "reason"):
+        value = params.get(field)
+        if value:
+            movements = movements.filter(**{field: value})
+    for field in ("location", "performed_by"):
+        value = params.get(field)
+        if value and value.isdigit():
+            movements = movements.filter(**{f"{field}_id": value})
+
+    return movements, filters
+
 @login_required
 @group_required('Admin', 'Stock Clerk', 'Viewer')
 def stock_movement_list(request):
-    stock_movements = StockMovement.objects.select_related('product').order_by('-date')
-    return render(request, 'inventory_app/stock_movement_list.html', {'stock_movements': stock_movements})
+    movements, filters = _filter_movements(request.GET)
+
+    # One pass over the filtered rows for every total; value uses the current product price
+    line_value = F('quantity') * F('product__price')
+    totals = movements.aggregate(
+        count=Count('id'),
+        units_in=Sum('quantity', filter=Q(movement_type=StockMovement.STOCK_IN)),
+        units_out=Sum('quantity', filter=Q(movement_type=StockMovement.STOCK_OUT)),
+        value_in=Sum(line_value, filter=Q(movement_type=StockMovement.STOCK_IN)),
+        value_out=Sum(line_value, filter=Q(movement_type=StockMovement.STOCK_OUT)),
+    )
+
+    paginator = Paginator(
+        movements.select_related('product', 'location', 'performed_by').order_by('-date', '-id'),
+        MOVEMENTS_PER_PAGE,
+    )
+    paginator.count = totals['count']  # reuse the aggregate instead of a second COUNT(*)
+    page = paginator.get_page(request.GET.get('page'))
+
+    query = request.GET.copy()
+    query.pop('page', None)
+
+    context = {
+        'stock_movements': page,
+        'page_obj': page,
+        'totals': totals,
+        'params': request.GET,
+        'query_string': query.urlencode(),
+        'selected_product': filters.get('product'),
+        'categories': Category.objects.only('id', 'name', 'path'),
+        'locations': Location.objects.all(),
+        'users': User.objects.filter(is_active=True).order_by('username'),
+        'movement_types': [(StockMovement.STOCK_IN, 'Stock In'), (StockMovement.STOCK_OUT, 'Stock Out')],
+        'reasons': StockMovement.REASON_CHOICES,
+    }
+    return render(request, 'inventory_app/stock_movement_list.html', context)
 
 # -------------------- User Profile & Password --------------------
 @login_required
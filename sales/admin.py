@@ -1,6 +1,7 @@
 from django.contrib import admin
-from decimal import Decimal
-from .models import Client, Quotation, QuotationItem, Invoice, InvoiceItem, DeliveryNote, DeliveryNoteItem, CreditNote, CreditNoteItem
+from django.db import transaction
+from django.db.models import Sum
+from .models import Client, Quotation, QuotationItem, Invoice, InvoiceItem, Payment, DeliveryNote, DeliveryNoteItem, CreditNote, CreditNoteItem, DocumentSequence
 
 
 # -------------------------
@@ -18,6 +19,13 @@ class InvoiceItemInline(admin.TabularInline):
     readonly_fields = ("amount",)
 
 
+class PaymentInline(admin.TabularInline):
+    model = Payment
+    extra = 0
+    readonly_fields = ("amount", "date", "method", "reference", "recorded_by")
+    can_delete = False
+
+
 class DeliveryNoteItemInline(admin.TabularInline):
     model = DeliveryNoteItem
     extra = 1
@@ -33,6 +41,11 @@ class CreditNoteItemInline(admin.TabularInline):
 # -------------------------
 # Main Admin Models
 # -------------------------
+@admin.register(DocumentSequence)
+class DocumentSequenceAdmin(admin.ModelAdmin):
+    list_display = ("document_type", "prefix", "last_number", "padding")
+
+
 @admin.register(Client)
 class ClientAdmin(admin.ModelAdmin):
     list_display = ("name", "email", "telephone", "pin")
@@ -41,87 +54,68 @@ class ClientAdmin(admin.ModelAdmin):
 
 @admin.register(Quotation)
 class QuotationAdmin(admin.ModelAdmin):
-    list_display = ("quotation_number", "client", "date", "subtotal_calc", "tax_calc", "total_calc", "validity_period")
-    list_filter = ("date",)
+    list_display = ("quotation_number", "client", "date", "subtotal", "tax", "total", "expires_at", "status")
+    list_filter = ("status", "date")
     search_fields = ("quotation_number", "client__name")
     inlines = [QuotationItemInline]
-    readonly_fields = ("subtotal", "tax", "total")
-
-    def subtotal_calc(self, obj):
-        return sum(item.amount for item in obj.items.all())
-    subtotal_calc.short_description = "Subtotal"
-
-    def tax_calc(self, obj):
-        return sum(item.amount for item in obj.items.all()) * Decimal('0.16')
-    tax_calc.short_description = "Tax"
-
-    def total_calc(self, obj):
-        subtotal = sum(item.amount for item in obj.items.all())
-        return subtotal + (subtotal * Decimal('0.16'))
-    total_calc.short_description = "Total"
+    list_select_related = ("client",)
+    autocomplete_fields = ("client",)
+    readonly_fields = ("subtotal", "tax", "total", "expires_at")
 
 
 @admin.register(Invoice)
 class InvoiceAdmin(admin.ModelAdmin):
-    list_display = ("invoice_number", "client", "date", "subtotal_calc", "tax_calc", "total_calc", "payment_status")
+    list_display = ("invoice_number", "client", "date", "total", "amount_paid", "balance_due", "payment_status")
     list_filter = ("payment_status", "date")
-    search_fields = ("invoice_number", "client__name")
-    inlines = [InvoiceItemInline]
-    readonly_fields = ("subtotal", "tax", "total")
-
-    def subtotal_calc(self, obj):
-        return sum(item.amount for item in obj.items.all())
-    subtotal_calc.short_description = "Subtotal"
-
-    def tax_calc(self, obj):
-        return sum(item.amount for item in obj.items.all()) * Decimal('0.16')
-    tax_calc.short_description = "Tax"
-
-    def total_calc(self, obj):
-        subtotal = sum(item.amount for item in obj.items.all())
-        return subtotal + (subtotal * Decimal('0.16'))
-    total_calc.short_description = "Total"
+    search_fields = ("invoice_number", "client__name", "order_number")
+    inlines = [InvoiceItemInline, PaymentInline]
+    list_select_related = ("client",)
+    autocomplete_fields = ("client",)
+    readonly_fields = ("subtotal", "tax", "total", "amount_paid", "balance_due", "payment_status")
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            # Only the form's columns: totals follow the items and the payment columns follow the payments,
+            # and the copies loaded with the form may already be stale
+            obj.save(update_fields=[*form.fields, 'updated_at'])
+        else:
+            super().save_model(request, obj, form, change)
+
+
+@admin.register(Payment)
+class PaymentAdmin(admin.ModelAdmin):
+    list_display = ("invoice", "date", "amount", "method", "reference", "recorded_by")
+    list_filter = ("method", "date")
+    search_fields = ("invoice__invoice_number", "reference")
+    list_select_related = ("invoice",)
+    autocomplete_fields = ("invoice",)
+
+    def delete_queryset(self, request, queryset):
+        # A bulk delete skips Payment.delete, so reverse the amounts on the invoices here
+        with transaction.atomic():
+            amounts = queryset.order_by().values('invoice').annotate(total=Sum('amount')).values_list('invoice', 'total')
+            reversed_amounts = {invoice_id: -total for invoice_id, total in amounts}
+            queryset.delete()
+            Invoice.apply_payments(reversed_amounts)
 
 
 @admin.register(DeliveryNote)
 class DeliveryNoteAdmin(admin.ModelAdmin):
-    list_display = ("delivery_note_number", "client", "date", "subtotal_calc", "tax_calc", "total_calc")
+    list_display = ("delivery_note_number", "client", "date", "subtotal", "tax", "total")
     list_filter = ("date",)
-    search_fields = ("delivery_note_number", "client__name")
+    search_fields = ("delivery_note_number", "client__name", "invoice__invoice_number", "order_number")
     inlines = [DeliveryNoteItemInline]
+    list_select_related = ("client",)
+    autocomplete_fields = ("client", "invoice")
     readonly_fields = ("subtotal", "tax", "total")
 
-    def subtotal_calc(self, obj):
-        return sum(item.amount for item in obj.items.all())
-    subtotal_calc.short_description = "Subtotal"
-
-    def tax_calc(self, obj):
-        return sum(item.amount for item in obj.items.all()) * Decimal('0.16')
-    tax_calc.short_description = "Tax"
-
-    def total_calc(self, obj):
-        subtotal = sum(item.amount for item in obj.items.all())
-        return subtotal + (subtotal * Decimal('0.16'))
-    total_calc.short_description = "Total"
-
 
 @admin.register(CreditNote)
 class CreditNoteAdmin(admin.ModelAdmin):
-    list_display = ("credit_note_number", "client", "date", "order_number", "subtotal_calc", "tax_calc", "total_calc", "prepared_by")
+    list_display = ("credit_note_number", "client", "date", "order_number", "subtotal", "tax", "total", "prepared_by")
     list_filter = ("date",)
-    search_fields = ("credit_note_number", "client__name", "invoice_number", "order_number")
+    search_fields = ("credit_note_number", "client__name", "invoice__invoice_number", "order_number")
     inlines = [CreditNoteItemInline]
+    list_select_related = ("client",)
+    autocomplete_fields = ("client", "invoice")
     readonly_fields = ("subtotal", "tax", "total")
-
-    def subtotal_calc(self, obj):
-        return sum(item.amount for item in obj.items.all())
-    subtotal_calc.short_description = "Subtotal"
-
-    def tax_calc(self, obj):
-        return sum(item.amount for item in obj.items.all()) * Decimal('0.16')
-    tax_calc.short_description = "Tax"
-
-    def total_calc(self, obj):
-        subtotal = sum(item.amount for item in obj.items.all())
-        return subtotal + (subtotal * Decimal('0.16'))
-    total_calc.short_description = "Total"
\ No newline at end of file
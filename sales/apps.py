@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class SalesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sales'
+
+    def ready(self):
+        # Keeps the sales rollups in step with invoice and credit note changes
+        from . import rollups  # noqa: F401
+        # Keeps the document search index in step with documents, lines and clients
+        from . import search  # noqa: F401
+        # Records tombstones for the change feed when synced rows are deleted
+        from . import changes  # noqa: F401
+        # Audit events for documents, payments and line changes
+        from . import audit  # noqa: F401
+        # Reopens a quotation when the invoice converted from it is deleted
+        from . import conversions  # noqa: F401
@@ -0,0 +1,16 @@
+from django.dispatch import receiver
+from inventory_app import audit
+from .models import CreditNote, DeliveryNote, Invoice, Payment, Quotation, totals_changed
+
+for _model in (Quotation, Invoice, Payment, DeliveryNote, CreditNote):
+    audit.track(_model)
+
+
+@receiver(totals_changed, sender=Quotation)
+@receiver(totals_changed, sender=Invoice)
+@receiver(totals_changed, sender=DeliveryNote)
+@receiver(totals_changed, sender=CreditNote)
+def _totals_changed(sender, document, **kwargs):
+    # Line edits reach the document through update_totals, which bypasses post_save. The invoice
+    # balance and status are worked out in the database, so the columns are read back.
+    audit.record_update(sender.objects.filter(pk=document.pk), [*document.totals_changes(), 'updated_at'])
@@ -0,0 +1,112 @@
+import csv
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+from inventory_app import audit
+from inventory_app.models import AuditEvent
+from . import rollups
+from .models import ZERO, Invoice, Payment
+
+# Columns written by the CSV export, per document kind
+EXPORT_COLUMNS = {
+    'quotation': ['quotation_number', 'client__name', 'date', 'validity_period', 'expires_at', 'status', 'subtotal', 'tax',
+                  'total'],
+    'invoice': ['invoice_number', 'client__name', 'date', 'due_date', 'order_number', 'subtotal', 'tax', 'total',
+                'amount_paid', 'balance_due', 'payment_status'],
+    'delivery_note': ['delivery_note_number', 'invoice__invoice_number', 'client__name', 'date', 'order_number',
+                      'subtotal', 'tax', 'total', 'stock_posted_at'],
+    'credit_note': ['credit_note_number', 'invoice__invoice_number', 'client__name', 'date', 'order_number',
+                    'subtotal', 'tax', 'total', 'stock_posted_at'],
+}
+
+
+def mark_paid(invoice_ids, recorded_by='', method='Bank Transfer', date=None):
+    """
+    Settle the outstanding balance of each invoice in ``invoice_ids``.
+
+    One Payment per invoice goes in with a single bulk_create, and one UPDATE
+    moves every balance into amount_paid. Invoices with nothing outstanding
+    are skipped. Returns the number of invoices settled.
+    """
+    date = date or timezone.localdate()
+    with transaction.atomic():
+        outstanding = list(
+            Invoice.objects.select_for_update()
+            .filter(pk__in=invoice_ids, balance_due__gt=0)
+            .values_list('pk', 'balance_due')
+        )
+        if not outstanding:
+            return 0
+        payments = Payment.objects.bulk_create(
+            [
+                Payment(invoice_id=pk, amount=balance, date=date, method=method,
+                        reference='Bulk settlement', recorded_by=recorded_by)
+                for pk, balance in outstanding
+            ],
+            batch_size=500,
+        )
+        audit.record_many(AuditEvent.CREATE, payments)
+        settled = Invoice.objects.filter(pk__in=[pk for pk, _ in outstanding])
+        settled.update(
+            amount_paid=F('amount_paid') + F('balance_due'),
+            balance_due=ZERO,
+            payment_status='Paid',
+            updated_at=timezone.now(),
+        )
+        audit.record_update(settled, ['amount_paid', 'balance_due', 'payment_status', 'updated_at'])
+    return len(outstanding)
+
+
+def mark_overdue(invoice_ids):
+    """Flag the selected invoices that still have a balance as Overdue in one UPDATE."""
+    now = timezone.now()
+    with transaction.atomic():
+        count = (
+            Invoice.objects
+            .filter(pk__in=invoice_ids, balance_due__gt=0)
+            .exclude(payment_status='Overdue')
+            .update(payment_status='Overdue', updated_at=now)
+        )
+        # The rows just flagged are the ones carrying this update's timestamp
+        flagged = Invoice.objects.filter(pk__in=invoice_ids, updated_at=now)
+        audit.record_update(flagged, ['payment_status', 'updated_at'])
+    return count
+
+
+def delete_documents(model, ids):
+    """
+    Delete the selected documents in one transaction.
+
+    Notes already posted to stock and invoices with payments recorded are
+    left alone, as in the single delete views. Returns ``(deleted, skipped)``.
+    """
+    documents = model.objects.filter(pk__in=ids)
+    skipped = 0
+    if hasattr(model, 'stock_posted_at'):
+        skipped = documents.filter(stock_posted_at__isnull=False).count()
+        documents = documents.filter(stock_posted_at__isnull=True)
+    if model is Invoice:
+        paid = Q(Exists(Payment.objects.filter(invoice=OuterRef('pk'))))
+        skipped = documents.filter(paid).count()
+        documents = documents.exclude(paid)
+    with transaction.atomic(), rollups.batched_refresh():
+        # QuerySet.delete still sends post_delete, which keeps the sales rollups current
+        _, per_model = documents.delete()
+    return per_model.get(model._meta.label, 0), skipped
+
+
+class Echo:
+    """A file-like sink for csv.writer that hands each formatted row straight back, for streaming."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv_rows(kind, model, ids):
+    """Yield CSV lines for the selected documents, reading them in one streamed query."""
+    columns = EXPORT_COLUMNS[kind]
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    rows = model.objects.filter(pk__in=ids).order_by('date', 'pk').values_list(*columns)
+    for row in rows.iterator(chunk_size=1000):
+        yield writer.writerow(row)
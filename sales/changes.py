@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+from django.db.models import Q
+from django.db.models.signals import post_delete
+from django.utils import timezone
+from inventory_app.models import Product
+from .models import (
+    Client, CreditNote, CreditNoteItem, DeliveryNote, DeliveryNoteItem, Invoice, InvoiceItem, Payment, Quotation,
+    QuotationItem, Tombstone,
+)
+
+FEEDS = {
+    'clients': Client,
+    'products': Product,
+    'quotations': Quotation,
+    'quotation_items': QuotationItem,
+    'invoices': Invoice,
+    'invoice_items': InvoiceItem,
+    'payments': Payment,
+    'delivery_notes': DeliveryNote,
+    'delivery_note_items': DeliveryNoteItem,
+    'credit_notes': CreditNote,
+    'credit_note_items': CreditNoteItem,
+}
+RESOURCES = {model: resource for resource, model in FEEDS.items()}
+
+FEED_LIMIT = 500
+MAX_FEED_LIMIT = 5000
+# Allowance for app servers' clocks and for rows stamped just before their transaction writes
+SETTLE_SECONDS = getattr(settings, 'CHANGE_FEED_SETTLE_SECONDS', 5)
+TOKEN_SALT = 'sales.changes'
+
+
+class ChangeFeedError(ValueError):
+    pass
+
+
+def _after(cursor, time_field):
+    """Rows strictly after ``(timestamp, id)`` in feed order."""
+    if cursor is None:
+        return Q()
+    moment, pk = datetime.fromisoformat(cursor[0]), cursor[1]
+    return Q(**{f'{time_field}__gt': moment}) | Q(**{time_field: moment, 'id__gt': pk})
+
+
+def _horizon():
+    """
+    The time before which every stamped row has been committed.
+
+    A transaction still in flight can commit a row stamped earlier than one
+    already returned. On PostgreSQL the horizon is held at the start of the
+    oldest transaction that has written anything; elsewhere only
+    SETTLE_SECONDS is held back.
+    """
+    horizon = timezone.now()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT min(xact_start) FROM pg_stat_activity"
+                " WHERE datname = current_database() AND backend_xid IS NOT NULL AND pid <> pg_backend_pid()"
+            )
+            oldest = cursor.fetchone()[0]
+        if oldest is not None:
+            horizon = min(horizon, oldest)
+    return horizon - timedelta(seconds=SETTLE_SECONDS)
+
+
+def _decode(resource, token):
+    if not token:
+        return None, None
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT)
+    except signing.BadSignature:
+        raise ChangeFeedError("Invalid sync token")
+    if data.get('resource') != resource:
+        raise ChangeFeedError(f"This sync token is for {data.get('resource')}, not {resource}")
+    return data.get('changed'), data.get('deleted')
+
+
+def changes_since(resource, token=None, limit=FEED_LIMIT):
+    """
+    Rows of ``resource`` written or deleted since ``token``, oldest first.
+
+    Each call returns at most ``limit`` changed rows and ``limit`` deletions,
+    read through the (updated_at, id) indexes, and a ``next`` token to pass on
+    the following call. Callers apply ``changed`` and then ``deleted``, and
+    keep calling while ``has_more`` is true. No token means from the start.
+    """
+    model = FEEDS[resource]
+    changed_cursor, deleted_cursor = _decode(resource, token)
+    limit = max(1, min(limit, MAX_FEED_LIMIT))
+    horizon = _horizon()
+
+    fields = [field.attname for field in model._meta.concrete_fields]
+    changed = list(
+        model.objects
+        .filter(_after(changed_cursor, 'updated_at'), updated_at__lt=horizon)
+        .order_by('updated_at', 'id')
+        .values(*fields)[:limit]
+    )
+    deleted = list(
+        Tombstone.objects
+        .filter(_after(deleted_cursor, 'deleted_at'), resource=resource, deleted_at__lt=horizon)
+        .order_by('deleted_at', 'id')
+        .values_list('deleted_at', 'id', 'object_id')[:limit]
+    )
+
+    if changed:
+        changed_cursor = [changed[-1]['updated_at'].isoformat(), changed[-1]['id']]
+    if deleted:
+        deleted_cursor = [deleted[-1][0].isoformat(), deleted[-1][1]]
+    return {
+        'resource': resource,
+        'changed': changed,
+        'deleted': [object_id for _, _, object_id in deleted],
+        'next': signing.dumps(
+            {'resource': resource, 'changed': changed_cursor, 'deleted': deleted_cursor}, salt=TOKEN_SALT,
+        ),
+        'has_more': len(changed) == limit or len(deleted) == limit,
+    }
+
+
+def _record_deletion(sender, instance, **kwargs):
+    Tombstone.objects.create(resource=RESOURCES[sender], object_id=instance.pk)
+
+
+for _model in FEEDS.values():
+    post_delete.connect(_record_deletion, sender=_model, dispatch_uid=f'changes.tombstone.{_model._meta.label}')
@@ -0,0 +1,146 @@
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, Value, When
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from inventory_app import audit
+from .line_items import ITEM_FIELDS
+from .models import CreditNote, DeliveryNote, Invoice, Quotation
+
+
+def _copy_items(source, target):
+    """Copy every line of ``source`` onto ``target`` with one SELECT and one bulk_create."""
+    related = target.items
+    item_model = related.model
+    rows = source.items.order_by('item_number').values('item_number', 'amount', *ITEM_FIELDS)
+    items = item_model.objects.bulk_create(
+        [item_model(**{related.field.name: target}, **row) for row in rows],
+        batch_size=500,
+    )
+    target.update_totals(sum((item.amount for item in items), Decimal('0.00')))
+    return items
+
+
+def quotation_to_invoice(quotation_id):
+    """
+    Turn an accepted quotation into an invoice.
+
+    The quotation row is locked first and the invoice link is one-to-one, so a
+    double-submitted conversion returns the invoice made by the first request
+    instead of creating a second one. Returns ``(invoice, created)``.
+    """
+    with transaction.atomic():
+        quotation = Quotation.objects.select_for_update().get(pk=quotation_id)
+        existing = Invoice.objects.filter(quotation=quotation).first()
+        if existing:
+            return existing, False
+        invoice = Invoice.objects.create(
+            client_id=quotation.client_id,
+            quotation=quotation,
+            prepared_by=quotation.prepared_by,
+        )
+        _copy_items(quotation, invoice)
+        Quotation.objects.filter(pk=quotation.pk).update(status=Quotation.CONVERTED, updated_at=timezone.now())
+        audit.record_update(Quotation.objects.filter(pk=quotation.pk), ['status', 'updated_at'])
+    return invoice, True
+
+
+def invoice_to_delivery_note(invoice_id):
+    """Deliver everything on an invoice. Returns ``(delivery_note, created)``."""
+    with transaction.atomic():
+        invoice = Invoice.objects.select_for_update().get(pk=invoice_id)
+        existing = invoice.delivery_notes.first()
+        if existing:
+            return existing, False
+        note = DeliveryNote.objects.create(
+            client_id=invoice.client_id,
+            invoice=invoice,
+            order_number=invoice.order_number,
+        )
+        _copy_items(invoice, note)
+    return note, True
+
+
+def delivery_note_to_credit_note(delivery_note_id, prepared_by):
+    """Credit back a delivery note in full. Returns ``(credit_note, created)``."""
+    with transaction.atomic():
+        note = DeliveryNote.objects.select_for_update().get(pk=delivery_note_id)
+        existing = note.credit_notes.first()
+        if existing:
+            return existing, False
+        credit_note = CreditNote.objects.create(
+            client_id=note.client_id,
+            invoice_id=note.invoice_id,
+            delivery_note=note,
+            order_number=note.order_number,
+            prepared_by=prepared_by,
+        )
+        _copy_items(note, credit_note)
+    return credit_note, True
+
+
+def document_chain(document):
+    """
+    The quotation, invoice, delivery notes and credit notes linked to ``document``.
+
+    The chain is anchored on the invoice when there is one, since every other
+    document type links to it.
+    """
+    quotation = invoice = None
+    delivery_notes = []
+    credit_notes = []
+
+    if isinstance(document, Quotation):
+        quotation = document
+        invoice = Invoice.objects.filter(quotation=document).first()
+    elif isinstance(document, Invoice):
+        invoice = document
+    elif isinstance(document, DeliveryNote):
+        invoice = document.invoice
+        if invoice is None:
+            delivery_notes = [document]
+    elif isinstance(document, CreditNote):
+        invoice = document.invoice
+        if invoice is None:
+            if document.delivery_note_id:
+                delivery_notes = [document.delivery_note]
+            else:
+                credit_notes = [document]
+
+    if invoice is not None:
+        quotation = quotation or invoice.quotation
+        delivery_notes = list(invoice.delivery_notes.select_related('client').order_by('date', 'pk'))
+        credit_notes = list(invoice.credit_notes.select_related('client').order_by('date', 'pk'))
+
+    if delivery_notes:
+        # Credit notes raised against a delivery note are listed under it
+        by_note = {note.pk: note for note in delivery_notes}
+        for note in delivery_notes:
+            note.chain_credit_notes = []
+        linked = CreditNote.objects.filter(delivery_note__in=delivery_notes).select_related('client')
+        for credit_note in linked.order_by('date', 'pk'):
+            by_note[credit_note.delivery_note_id].chain_credit_notes.append(credit_note)
+        credit_notes = [cn for cn in credit_notes if cn.delivery_note_id not in by_note]
+
+    return {
+        'quotation': quotation,
+        'invoice': invoice,
+        'delivery_notes': delivery_notes,
+        'credit_notes': credit_notes,
+    }
+
+
+@receiver(post_delete, sender=Invoice)
+def _invoice_deleted(sender, instance, **kwargs):
+    # Deleting the invoice puts its quotation back to open, or expired if it has run out
+    if instance.quotation_id:
+        reopened = Quotation.objects.filter(pk=instance.quotation_id, status=Quotation.CONVERTED).update(
+            status=Case(
+                When(expires_at__lte=timezone.localdate(), then=Value(Quotation.EXPIRED)),
+                default=Value(Quotation.OPEN),
+            ),
+            updated_at=timezone.now(),
+        )
+        if reopened:
+            audit.record_update(Quotation.objects.filter(pk=instance.quotation_id), ['status', 'updated_at'])
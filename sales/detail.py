@@ -0,0 +1,61 @@
+from calendar import timegm
+from django.core.cache import cache
+from django.db.models.functions import Greatest
+from django.http import Http404, HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
+from .pdf import DOCUMENTS, RENDER_VERSION, document_context
+
+DETAIL_CACHE_SECONDS = 24 * 60 * 60
+
+
+def document_version(kind, pk):
+    """
+    When the document's page last changed, or None if there is no such document.
+
+    The page shows the document, its lines and its client. Line edits bump the
+    document's updated_at through update_totals, so the later of the document
+    and client timestamps covers everything on it.
+    """
+    return (
+        DOCUMENTS[kind][0].objects
+        .filter(pk=pk)
+        .values_list(Greatest('updated_at', 'client__updated_at'), flat=True)
+        .first()
+    )
+
+
+def _render(kind, pk, version):
+    # Pages are the same for every user, so one cached copy per document version serves all of them
+    key = f"sales:detail:{kind}:{pk}:{RENDER_VERSION}:{version.timestamp()}"
+    html = cache.get(key)
+    if html is None:
+        document = DOCUMENTS[kind][0].objects.select_related('client').get(pk=pk)
+        html = render_to_string(DOCUMENTS[kind][2], document_context(kind, document))
+        cache.set(key, html, DETAIL_CACHE_SECONDS)
+    return html
+
+
+def document_page(request, kind, pk):
+    """
+    The detail page of a sales document, answering conditional GETs.
+
+    One query reads the document's version. A client whose ETag or
+    Last-Modified still matches gets 304 Not Modified; anyone else gets the
+    page from the cache for that version, rendered only on a miss.
+    """
+    version = document_version(kind, pk)
+    if version is None:
+        raise Http404
+    etag = quote_etag(f"{kind}-{pk}-{RENDER_VERSION}-{version.timestamp()}")
+    last_modified = timegm(version.utctimetuple())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(_render(kind, pk, version))
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    # Behind a login, and always revalidated so an edit shows up on the next view
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
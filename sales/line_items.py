@@ -0,0 +1,145 @@
+from decimal import Decimal, InvalidOperation
+from django.db.models import Max
+from django.utils import timezone
+from inventory_app.models import Product
+
+ITEM_FIELDS = ('product_id', 'designation', 'description', 'brand', 'quantity', 'unit_price')
+
+
+class LineItemError(ValueError):
+    pass
+
+
+def parse_line_items(data):
+    """
+    Validate the item rows posted by a document form.
+
+    Rows without a description are treated as blank and skipped. Returns a
+    list of dicts ready to become item instances; ``id`` is the stored item a
+    row was rendered from, or None for a new row. An optional ``barcode``
+    links the row to an inventory product, resolved with a single query.
+    """
+    descriptions = data.getlist('description')
+    item_ids = data.getlist('item_id')
+    if len(item_ids) != len(descriptions):
+        # Form without item ids: every row is new
+        item_ids = [''] * len(descriptions)
+    barcodes = [barcode.strip() for barcode in data.getlist('barcode')]
+    if len(barcodes) != len(descriptions):
+        barcodes = [''] * len(descriptions)
+    products = dict(
+        Product.objects.filter(barcode__in={b for b in barcodes if b}).values_list('barcode', 'id')
+    ) if any(barcodes) else {}
+
+    rows = zip(
+        item_ids,
+        barcodes,
+        data.getlist('designation'),
+        descriptions,
+        data.getlist('brand'),
+        data.getlist('quantity'),
+        data.getlist('unit_price'),
+    )
+    items = []
+    for row_number, (item_id, barcode, designation, description, brand, quantity, unit_price) in enumerate(rows, start=1):
+        if not description.strip():
+            continue
+        if barcode and barcode not in products:
+            raise LineItemError(f"Row {row_number}: no product with barcode {barcode}.")
+        try:
+            item_id = int(item_id) if item_id else None
+            quantity = int(quantity)
+            unit_price = Decimal(unit_price)
+        except (TypeError, ValueError, InvalidOperation):
+            raise LineItemError(f"Row {row_number}: quantity and unit price must be numbers.")
+        if quantity <= 0 or not unit_price.is_finite() or unit_price < 0:
+            raise LineItemError(f"Row {row_number}: quantity must be positive and unit price cannot be negative.")
+        items.append({
+            'id': item_id,
+            'product_id': products.get(barcode),
+            'designation': designation,
+            'description': description.strip(),
+            'brand': brand,
+            'quantity': quantity,
+            'unit_price': unit_price,
+        })
+    return items
+
+
+def write_line_items(document, rows):
+    """
+    Append ``rows`` to ``document`` with one bulk_create and store its totals.
+
+    Item numbers and amounts are assigned in memory, so the cost is one
+    INSERT for the items plus one UPDATE for the document however many lines
+    there are.
+    """
+    related = document.items
+    item_model = related.model
+    last_number = related.aggregate(last=Max('item_number'))['last'] or 0
+
+    items = [
+        item_model(
+            **{related.field.name: document},
+            item_number=last_number + position,
+            amount=row['quantity'] * row['unit_price'],
+            **{field: row[field] for field in ITEM_FIELDS},
+        )
+        for position, row in enumerate(rows, start=1)
+    ]
+    item_model.objects.bulk_create(items, batch_size=500)
+
+    if last_number:
+        # Appending to existing lines: let the database add them all up
+        document.update_totals()
+    else:
+        document.update_totals(sum((item.amount for item in items), Decimal('0.00')))
+    return items
+
+
+def sync_line_items(document, rows):
+    """
+    Bring the stored items of ``document`` in line with the submitted ``rows``.
+
+    Rows are matched to stored items by id. Only lines that actually differ
+    are written: new rows with one bulk_create, edited rows with one
+    bulk_update and removed rows with one DELETE. Kept lines keep their
+    primary key and item_number.
+    """
+    related = document.items
+    item_model = related.model
+    existing = {item.pk: item for item in related.all()}
+    last_number = max((item.item_number for item in existing.values()), default=0)
+
+    kept, changed, created = [], [], []
+    for row in rows:
+        item = existing.pop(row['id'], None)
+        if item is None:
+            last_number += 1
+            item = item_model(**{related.field.name: document}, item_number=last_number)
+            created.append(item)
+        elif any(getattr(item, field) != row[field] for field in ITEM_FIELDS):
+            changed.append(item)
+        else:
+            kept.append(item)
+            continue
+        for field in ITEM_FIELDS:
+            setattr(item, field, row[field])
+        item.amount = row['quantity'] * row['unit_price']
+
+    # Whatever was not matched by a submitted row has been removed
+    if existing:
+        item_model.objects.filter(pk__in=existing).delete()
+    if changed:
+        # bulk_update skips auto_now, so the change-feed timestamp is set here
+        now = timezone.now()
+        for item in changed:
+            item.updated_at = now
+        item_model.objects.bulk_update(changed, [*ITEM_FIELDS, 'amount', 'updated_at'], batch_size=500)
+    if created:
+        item_model.objects.bulk_create(created, batch_size=500)
+
+    items = kept + changed + created
+    document.update_totals(sum((item.amount for item in items), Decimal('0.00')))
+    return items
+
@@ -0,0 +1,140 @@
+import hashlib
+import re
+from django.core.cache import cache
+from django.db.models.functions import Upper
+from inventory_app.models import Product
+from .models import Client, Invoice
+
+LOOKUP_LIMIT = 20
+LOOKUP_CACHE_SECONDS = 30
+
+
+def _cached(kind, parts, build):
+    # Results are shared between users and only kept briefly, so edits show up within seconds
+    digest = hashlib.sha1("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+    return cache.get_or_set(f"sales:lookup:{kind}:{digest}", build, LOOKUP_CACHE_SECONDS)
+
+
+def search_clients(term, limit=LOOKUP_LIMIT):
+    """Clients whose name starts with ``term``, ignoring case, served by the UPPER(name) index."""
+    term = term.strip().upper()
+    if not term:
+        return []
+
+    def build():
+        clients = (
+            Client.objects
+            .annotate(name_upper=Upper('name'))
+            .filter(name_upper__startswith=term)
+            .order_by('name_upper', 'pk')
+            .values('id', 'name')[:limit]
+        )
+        return [{'id': client['id'], 'text': client['name']} for client in clients]
+
+    return _cached('clients', (term, limit), build)
+
+
+def search_invoices(term, client_id=None, limit=LOOKUP_LIMIT):
+    """
+    Invoices whose number starts with ``term``, optionally for one client.
+
+    With a client and no term the client's most recent invoices are returned,
+    which is what the note forms offer once a client has been picked.
+    """
+    term = term.strip().upper()
+    if not term and not client_id:
+        return []
+
+    def build():
+        invoices = Invoice.objects.all()
+        if client_id:
+            invoices = invoices.filter(client_id=client_id)
+        if term:
+            # Numbers are issued upper-case, so a plain prefix match can use the unique index
+            invoices = invoices.filter(invoice_number__startswith=term).order_by('invoice_number')
+        else:
+            invoices = invoices.order_by('-date', '-pk')
+        rows = invoices.values('id', 'invoice_number', 'order_number', 'client_id', 'client__name')[:limit]
+        return [
+            {
+                'id': row['id'],
+                'text': row['invoice_number'],
+                'label': f"{row['invoice_number']} - {row['client__name']}",
+                'order_number': row['order_number'] or '',
+                'client_id': row['client_id'],
+                'client_name': row['client__name'],
+            }
+            for row in rows
+        ]
+
+    return _cached('invoices', (term, client_id or '', limit), build)
+
+
+PRODUCT_FIELDS = ('id', 'barcode', 'name', 'designation', 'brand', 'price', 'quantity')
+
+
+def _product_result(product):
+    return {
+        'id': product['id'],
+        'barcode': product['barcode'],
+        'text': product['name'],
+        'label': f"{product['barcode']} - {product['name']} ({product['brand']}) - {product['quantity']} in stock",
+        'description': product['name'],
+        'designation': product['designation'] or '',
+        'brand': product['brand'],
+        'unit_price': str(product['price']),
+        'stock': product['quantity'],
+    }
+
+
+def search_products(term, limit=LOOKUP_LIMIT):
+    """
+    Products whose barcode or name starts with ``term``, for filling a line item.
+
+    Barcode matches come first. Each half is a LIMITed seek on its own index
+    (the unique barcode and UPPER(name)). Price and stock are read live and
+    not cached, because they change while a document is being typed.
+    """
+    term = term.strip()
+    if not term:
+        return []
+    by_barcode = list(
+        Product.objects.filter(barcode__startswith=term).order_by('barcode').values(*PRODUCT_FIELDS)[:limit]
+    )
+    by_name = list(
+        Product.objects
+        .annotate(name_upper=Upper('name'))
+        .filter(name_upper__startswith=term.upper())
+        .exclude(pk__in=[product['id'] for product in by_barcode])
+        .order_by('name_upper', 'pk')
+        .values(*PRODUCT_FIELDS)[:limit - len(by_barcode)]
+    ) if len(by_barcode) < limit else []
+    return [_product_result(product) for product in by_barcode + by_name]
+
+
+def products_for_barcodes(text):
+    """
+    Resolve pasted lines of ``barcode[ quantity]`` with one query.
+
+    Returns ``(results, missing)``. Results keep the pasted order, and a
+    barcode that appears more than once has its quantities added up.
+    """
+    counts = {}
+    for line in text.splitlines():
+        parts = re.split(r'[\s,;]+', line.strip())
+        if not parts[0]:
+            continue
+        quantity = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() and int(parts[1]) > 0 else 1
+        counts[parts[0]] = counts.get(parts[0], 0) + quantity
+    products = {
+        product['barcode']: product
+        for product in Product.objects.filter(barcode__in=list(counts)).values(*PRODUCT_FIELDS)
+    } if counts else {}
+
+    results = []
+    for barcode, quantity in counts.items():
+        if barcode in products:
+            result = _product_result(products[barcode])
+            result['quantity'] = quantity
+            results.append(result)
+    return results, [barcode for barcode in counts if barcode not in products]
@@ -0,0 +1,72 @@
+import os
+from datetime import date, timedelta
+from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from sales import statements
+from sales.models import Client, CreditNote, Invoice, Payment
+from sales.pdf import cache_dir, pdf_renderer, worker_pool
+
+
+def _write(client_id, start, end, output, directory):
+    statement = statements.Statement(Client.objects.get(pk=client_id), start, end)
+    return str(statements.write(statement, output, Path(directory) / statement.filename(output)))
+
+
+def _month(value):
+    try:
+        year, month = (int(part) for part in value.split('-'))
+        return date(year, month, 1)
+    except ValueError:
+        raise CommandError("Months must be given as YYYY-MM.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Write month-end statements for every active client: anyone with invoices, credit notes or "
+        "payments in the month, or an unpaid balance."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help="Statement month (YYYY-MM); defaults to last month.")
+        parser.add_argument('--format', choices=statements.FORMATS, default='pdf')
+        parser.add_argument('--output', help="Directory for the files; defaults to statements/YYYY-MM under the PDF cache.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        if options['month']:
+            month = _month(options['month'])
+        else:
+            month = (timezone.localdate().replace(day=1) - timedelta(days=1)).replace(day=1)
+        start, end = month, (month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        directory = Path(options['output'] or cache_dir() / 'statements' / f"{month:%Y-%m}")
+        if options['format'] == 'pdf':
+            try:
+                pdf_renderer()
+            except ImproperlyConfigured as e:
+                raise CommandError(str(e))
+
+        period = {'date__gte': start, 'date__lte': end}
+        active = [
+            Invoice.objects.filter(**period).values_list('client_id', flat=True),
+            CreditNote.objects.filter(**period).values_list('client_id', flat=True),
+            Payment.objects.filter(**period).values_list('invoice__client_id', flat=True),
+            Invoice.objects.filter(balance_due__gt=0).values_list('client_id', flat=True),
+        ]
+        client_ids = sorted(set().union(*(ids.order_by().distinct() for ids in active)))
+        if not client_ids:
+            self.stdout.write("No active clients in that month.")
+            return
+
+        count = len(client_ids)
+        with worker_pool(max(1, min(options['workers'], count))) as pool:
+            paths = pool.map(
+                _write, client_ids, [start] * count, [end] * count, [options['format']] * count,
+                [str(directory)] * count, chunksize=4,
+            )
+            for path in paths:
+                if options['verbosity'] > 1:
+                    self.stdout.write(path)
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} statements for {month:%B %Y} to {directory}."))
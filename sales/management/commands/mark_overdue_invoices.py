@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from sales.models import Invoice
+
+
+class Command(BaseCommand):
+    help = "Mark pending invoices whose due date has passed as Overdue. Safe to run daily."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', help="Treat this date (YYYY-MM-DD) as today.")
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['as_of']:
+            as_of = parse_date(options['as_of'])
+            if as_of is None:
+                raise CommandError("--as-of must be a date in YYYY-MM-DD format.")
+        count = Invoice.mark_overdue(as_of)
+        self.stdout.write(self.style.SUCCESS(f"Marked {count} invoices as overdue."))
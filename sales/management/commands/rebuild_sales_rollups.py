@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from sales import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales rollups (totals, per client, per brand) from the invoice and credit note lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help="First day to rebuild (YYYY-MM-DD); defaults to the first document.")
+        parser.add_argument('--to', dest='date_to', help="Last day to rebuild (YYYY-MM-DD); defaults to the last document.")
+
+    def handle(self, *args, **options):
+        dates = {}
+        for option in ('date_from', 'date_to'):
+            value = options[option]
+            dates[option] = parse_date(value) if value else None
+            if value and dates[option] is None:
+                raise CommandError("Dates must be given as YYYY-MM-DD.")
+
+        days = rollups.rebuild(dates['date_from'], dates['date_to'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sales rollups for {days} days with sales."))
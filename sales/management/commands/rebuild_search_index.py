@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from sales import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the document search index from every quotation, invoice, delivery note and credit note."
+
+    def handle(self, *args, **options):
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} documents."))
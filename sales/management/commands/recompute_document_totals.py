@@ -0,0 +1,85 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+from sales import rollups
+from sales.models import TAX_RATE, CreditNote, DeliveryNote, Invoice, Quotation, derived_payment_status, totals_changed
+
+DOCUMENTS = [Quotation, Invoice, DeliveryNote, CreditNote]
+BATCH_SIZE = 500
+
+
+def expected_totals(model):
+    """Subtotal, tax and total expressions computed from the items in SQL."""
+    items = model._meta.get_field('items').related_model
+    fk = model._meta.get_field('items').field.name
+    money = DecimalField(max_digits=12, decimal_places=2)
+    item_sum = Subquery(
+        items.objects.filter(**{fk: OuterRef('pk')})
+        .order_by()
+        .values(fk)
+        .annotate(subtotal=Sum('amount'))
+        .values('subtotal'),
+        output_field=money,
+    )
+    subtotal = Round(Coalesce(item_sum, Value(Decimal('0.00')), output_field=money), 2, output_field=money)
+    tax = Round(subtotal * Value(TAX_RATE), 2, output_field=money)
+    # SQLite adds decimals as floats, so the total is rounded as well
+    return {'subtotal': subtotal, 'tax': tax, 'total': Round(subtotal + tax, 2, output_field=money)}
+
+
+def repair(model, pks):
+    """
+    Rewrite the totals of the documents in ``pks`` from their items.
+
+    Invoices also get the balance and payment status derived from the new
+    total, as in Invoice.totals_changes. totals_changed then goes out for each
+    document so the sales rollups and search index pick up the new totals.
+    """
+    changes = expected_totals(model)
+    if model is Invoice:
+        balance = changes['total'] - F('amount_paid')
+        changes['balance_due'] = balance
+        changes['payment_status'] = derived_payment_status(balance, F('amount_paid'))
+    with rollups.batched_refresh():
+        for start in range(0, len(pks), BATCH_SIZE):
+            batch = pks[start:start + BATCH_SIZE]
+            model.objects.filter(pk__in=batch).update(updated_at=timezone.now(), **changes)
+            for document in model.objects.filter(pk__in=batch):
+                totals_changed.send(sender=model, document=document)
+
+
+class Command(BaseCommand):
+    help = "Verify stored sales document totals against their items and fix any that have drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only report mismatches; exit with an error if any are found.")
+
+    def handle(self, *args, **options):
+        mismatched_total = 0
+        with transaction.atomic():
+            for model in DOCUMENTS:
+                expected = expected_totals(model)
+                mismatched = (
+                    model.objects
+                    .annotate(**{f'expected_{name}': expr for name, expr in expected.items()})
+                    .filter(
+                        ~Q(subtotal=F('expected_subtotal'))
+                        | ~Q(tax=F('expected_tax'))
+                        | ~Q(total=F('expected_total'))
+                    )
+                    .values_list('pk', flat=True)
+                )
+                pks = list(mismatched)
+                if not options['check']:
+                    repair(model, pks)
+                count = len(pks)
+                mismatched_total += count
+                self.stdout.write(f"{model._meta.verbose_name_plural.capitalize()}: {count} mismatched")
+
+        if options['check'] and mismatched_total:
+            raise CommandError(f"{mismatched_total} documents have stale totals.")
+        verb = "found" if options['check'] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"Totals verified; {mismatched_total} {verb}."))
@@ -0,0 +1,58 @@
+import os
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from sales.pdf import DOCUMENTS, pdf_renderer, render_pdf, worker_pool
+
+
+def _render(kind, pk):
+    model = DOCUMENTS[kind][0]
+    document = model.objects.select_related('client').get(pk=pk)
+    path, cached = render_pdf(kind, document)
+    return str(path), cached
+
+
+class Command(BaseCommand):
+    help = "Render PDFs for sales documents issued in a date range, reusing cached files for unchanged documents."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(DOCUMENTS))
+        parser.add_argument('--from', dest='date_from', required=True, help="First document date (YYYY-MM-DD).")
+        parser.add_argument('--to', dest='date_to', required=True, help="Last document date (YYYY-MM-DD).")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        date_from = parse_date(options['date_from'])
+        date_to = parse_date(options['date_to'])
+        if not date_from or not date_to:
+            raise CommandError("Dates must be given as YYYY-MM-DD.")
+        try:
+            pdf_renderer()
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        model = DOCUMENTS[kind][0]
+        pks = list(
+            model.objects
+            .filter(date__gte=date_from, date__lte=date_to)
+            .order_by('date', 'pk')
+            .values_list('pk', flat=True)
+        )
+        if not pks:
+            self.stdout.write("No documents in that range.")
+            return
+
+        rendered = cached = 0
+        with worker_pool(max(1, min(options['workers'], len(pks)))) as pool:
+            for path, was_cached in pool.map(_render, [kind] * len(pks), pks, chunksize=8):
+                if was_cached:
+                    cached += 1
+                else:
+                    rendered += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(pks)} {model._meta.verbose_name_plural}: {rendered} rendered, {cached} already cached."
+        ))
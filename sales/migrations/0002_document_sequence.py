@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:45
+
+from django.db import migrations, models
+
+
+SEQUENCES = [
+    # document_type, model, number field, prefix, last number before the first document
+    ('quotation', 'Quotation', 'quotation_number', 'QTN', 3379),
+    ('invoice', 'Invoice', 'invoice_number', 'INV', 4394),
+    ('delivery_note', 'DeliveryNote', 'delivery_note_number', 'DN', 1555),
+    ('credit_note', 'CreditNote', 'credit_note_number', 'CN', 2211),
+]
+
+
+def seed_sequences(apps, schema_editor):
+    DocumentSequence = apps.get_model('sales', 'DocumentSequence')
+    for document_type, model_name, field, prefix, default in SEQUENCES:
+        Model = apps.get_model('sales', model_name)
+        last_number = default
+        for number in Model.objects.exclude(**{f'{field}__isnull': True}).values_list(field, flat=True).iterator():
+            try:
+                last_number = max(last_number, int(number.split('-')[-1]))
+            except ValueError:
+                continue
+        DocumentSequence.objects.create(document_type=document_type, prefix=prefix, last_number=last_number)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_type', models.CharField(choices=[('quotation', 'Quotation'), ('invoice', 'Invoice'), ('delivery_note', 'Delivery Note'), ('credit_note', 'Credit Note')], max_length=30, unique=True)),
+                ('prefix', models.CharField(max_length=10)),
+                ('last_number', models.PositiveIntegerField()),
+                ('padding', models.PositiveSmallIntegerField(default=4)),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
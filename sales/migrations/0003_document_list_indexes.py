@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0002_document_sequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='creditnote',
+            index=models.Index(fields=['date', 'created_at'], name='credit_note_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditnote',
+            index=models.Index(fields=['client', 'date'], name='credit_note_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliverynote',
+            index=models.Index(fields=['date', 'created_at'], name='delivery_note_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliverynote',
+            index=models.Index(fields=['client', 'date'], name='delivery_note_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['date', 'created_at'], name='invoice_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['client', 'date'], name='invoice_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['payment_status', 'date'], name='invoice_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quotation',
+            index=models.Index(fields=['date', 'created_at'], name='quotation_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quotation',
+            index=models.Index(fields=['client', 'date'], name='quotation_client_date_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0003_document_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='creditnote',
+            name='delivery_note',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='credit_notes', to='sales.deliverynote'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='quotation',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invoice', to='sales.quotation'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0007_returned_reason'),
+        ('sales', '0004_document_conversions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='creditnote',
+            name='stock_posted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='creditnoteitem',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='credit_note_items', to='inventory_app.product'),
+        ),
+        migrations.AddField(
+            model_name='deliverynote',
+            name='stock_posted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='deliverynoteitem',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='delivery_note_items', to='inventory_app.product'),
+        ),
+        migrations.AddField(
+            model_name='invoiceitem',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='invoice_items', to='inventory_app.product'),
+        ),
+        migrations.AddField(
+            model_name='quotationitem',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quotation_items', to='inventory_app.product'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:59
+
+from datetime import timedelta
+from django.db import migrations, models
+
+
+def set_due_dates(apps, schema_editor):
+    Invoice = apps.get_model('sales', 'Invoice')
+    invoices = list(Invoice.objects.filter(due_date__isnull=True).select_related('client').only('date', 'client__payment_terms_days'))
+    for invoice in invoices:
+        invoice.due_date = invoice.date + timedelta(days=invoice.client.payment_terms_days)
+    Invoice.objects.bulk_update(invoices, ['due_date'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0005_item_products'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='payment_terms_days',
+            field=models.PositiveIntegerField(default=30),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='due_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['payment_status', 'due_date'], name='invoice_status_due_idx'),
+        ),
+        migrations.RunPython(set_due_dates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F
+
+
+def open_balances(apps, schema_editor):
+    # Invoices already marked Paid get one payment for their total so the history matches the balance
+    Invoice = apps.get_model('sales', 'Invoice')
+    Payment = apps.get_model('sales', 'Payment')
+    paid = Invoice.objects.filter(payment_status='Paid', total__gt=0)
+    Payment.objects.bulk_create(
+        [
+            Payment(invoice_id=pk, amount=total, date=date, reference='Opening balance')
+            for pk, total, date in paid.values_list('pk', 'total', 'date').iterator()
+        ],
+        batch_size=500,
+    )
+    paid.update(amount_paid=F('total'))
+    Invoice.objects.update(balance_due=F('total') - F('amount_paid'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0006_invoice_due_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('date', models.DateField(default=django.utils.timezone.localdate)),
+                ('method', models.CharField(choices=[('Bank Transfer', 'Bank Transfer'), ('Cheque', 'Cheque'), ('Cash', 'Cash'), ('Mobile Money', 'Mobile Money')], default='Bank Transfer', max_length=20)),
+                ('reference', models.CharField(blank=True, max_length=100, null=True)),
+                ('recorded_by', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['date', 'pk'],
+            },
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='balance_due',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['client', 'balance_due'], name='invoice_client_balance_idx'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='invoice',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='sales.invoice'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['invoice', 'date'], name='payment_invoice_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['reference'], name='payment_reference_idx'),
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
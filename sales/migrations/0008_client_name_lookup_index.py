@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:05
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0007_invoice_payments'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(django.db.models.functions.text.Upper('name'), name='client_name_upper_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:11
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from sales import rollups
+
+
+def backfill(apps, schema_editor):
+    # Sales made before the rollups existed, built the way rebuild_sales_rollups does
+    rollups.rebuild(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0008_client_name_lookup_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BrandDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('invoiced', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('credited', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('quantity_sold', models.BigIntegerField(default=0)),
+                ('quantity_returned', models.BigIntegerField(default=0)),
+                ('brand', models.CharField(blank=True, max_length=255)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'brand'], name='brand_sales_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('brand', 'date'), name='unique_brand_daily_sales')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('invoiced', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('credited', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('quantity_sold', models.BigIntegerField(default=0)),
+                ('quantity_returned', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date',), name='unique_daily_sales')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ClientDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('invoiced', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('credited', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('quantity_sold', models.BigIntegerField(default=0)),
+                ('quantity_returned', models.BigIntegerField(default=0)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='sales.client')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'client'], name='client_sales_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('client', 'date'), name='unique_client_daily_sales')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
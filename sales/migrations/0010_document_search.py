@@ -0,0 +1,105 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:16
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from sales import search
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE sales_searchentry_fts USING fts5(
+        number, order_number, client_name, client_pin, items,
+        content='sales_searchentry', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER sales_searchentry_ai AFTER INSERT ON sales_searchentry BEGIN
+        INSERT INTO sales_searchentry_fts(rowid, number, order_number, client_name, client_pin, items)
+        VALUES (new.id, new.number, new.order_number, new.client_name, new.client_pin, new.items);
+    END
+    """,
+    """
+    CREATE TRIGGER sales_searchentry_ad AFTER DELETE ON sales_searchentry BEGIN
+        INSERT INTO sales_searchentry_fts(sales_searchentry_fts, rowid, number, order_number, client_name, client_pin, items)
+        VALUES ('delete', old.id, old.number, old.order_number, old.client_name, old.client_pin, old.items);
+    END
+    """,
+    """
+    CREATE TRIGGER sales_searchentry_au AFTER UPDATE ON sales_searchentry BEGIN
+        INSERT INTO sales_searchentry_fts(sales_searchentry_fts, rowid, number, order_number, client_name, client_pin, items)
+        VALUES ('delete', old.id, old.number, old.order_number, old.client_name, old.client_pin, old.items);
+        INSERT INTO sales_searchentry_fts(rowid, number, order_number, client_name, client_pin, items)
+        VALUES (new.id, new.number, new.order_number, new.client_name, new.client_pin, new.items);
+    END
+    """,
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS sales_searchentry_au",
+    "DROP TRIGGER IF EXISTS sales_searchentry_ad",
+    "DROP TRIGGER IF EXISTS sales_searchentry_ai",
+    "DROP TABLE IF EXISTS sales_searchentry_fts",
+]
+
+# Must match sales.search.POSTGRES_VECTOR for the planner to use the index
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX sales_searchentry_fts_idx ON sales_searchentry USING gin ((
+        setweight(to_tsvector('simple', regexp_replace(number || ' ' || order_number, '[[:punct:]]+', ' ', 'g')), 'A')
+        || setweight(to_tsvector('simple', regexp_replace(client_name || ' ' || client_pin, '[[:punct:]]+', ' ', 'g')), 'B')
+        || setweight(to_tsvector('simple', regexp_replace(items, '[[:punct:]]+', ' ', 'g')), 'C')
+    ))
+    """,
+]
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS sales_searchentry_fts_idx",
+]
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def backfill(apps, schema_editor):
+    # Documents made before the index existed, indexed the way rebuild_search_index does
+    search.rebuild(apps=apps)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0009_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('quotation', 'Quotation'), ('invoice', 'Invoice'), ('delivery_note', 'Delivery Note'), ('credit_note', 'Credit Note')], max_length=20)),
+                ('document_id', models.PositiveIntegerField()),
+                ('date', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('number', models.CharField(blank=True, max_length=50)),
+                ('order_number', models.CharField(blank=True, max_length=50)),
+                ('client_name', models.CharField(blank=True, max_length=255)),
+                ('client_pin', models.CharField(blank=True, max_length=50)),
+                ('items', models.TextField(blank=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='sales.client')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'document_id'), name='unique_search_entry')],
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
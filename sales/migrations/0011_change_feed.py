@@ -0,0 +1,118 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:23
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0009_product_updated_at'),
+        ('sales', '0010_document_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='creditnote',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='creditnoteitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='deliverynote',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='deliverynoteitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='invoiceitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='quotation',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='quotationitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['updated_at', 'id'], name='client_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditnote',
+            index=models.Index(fields=['updated_at', 'id'], name='credit_note_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditnoteitem',
+            index=models.Index(fields=['updated_at', 'id'], name='credit_note_item_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliverynote',
+            index=models.Index(fields=['updated_at', 'id'], name='delivery_note_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deliverynoteitem',
+            index=models.Index(fields=['updated_at', 'id'], name='delivery_note_item_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['updated_at', 'id'], name='invoice_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoiceitem',
+            index=models.Index(fields=['updated_at', 'id'], name='invoice_item_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['updated_at', 'id'], name='payment_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quotation',
+            index=models.Index(fields=['updated_at', 'id'], name='quotation_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quotationitem',
+            index=models.Index(fields=['updated_at', 'id'], name='quotation_item_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['resource', 'deleted_at', 'id'], name='tombstone_resource_idx'),
+        ),
+    ]
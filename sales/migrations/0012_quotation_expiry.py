@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:30
+
+from datetime import timedelta
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def set_expiry(apps, schema_editor):
+    Quotation = apps.get_model('sales', 'Quotation')
+    Invoice = apps.get_model('sales', 'Invoice')
+    converted = set(Invoice.objects.filter(quotation__isnull=False).values_list('quotation_id', flat=True))
+    today, now = timezone.localdate(), timezone.now()
+    quotations = list(Quotation.objects.only('date', 'validity_period'))
+    for quotation in quotations:
+        quotation.expires_at = quotation.date + timedelta(days=quotation.validity_period)
+        if quotation.pk in converted:
+            quotation.status = 'Converted'
+        elif quotation.expires_at <= today:
+            quotation.status = 'Expired'
+        # Changed rows go back out on the change feed with their new columns
+        quotation.updated_at = now
+    Quotation.objects.bulk_update(quotations, ['expires_at', 'status', 'updated_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0011_change_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quotation',
+            name='expires_at',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='quotation',
+            name='status',
+            field=models.CharField(choices=[('Open', 'Open'), ('Expired', 'Expired'), ('Converted', 'Converted')], default='Open', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='quotation',
+            index=models.Index(fields=['status', 'expires_at'], name='quotation_status_expiry_idx'),
+        ),
+        migrations.RunPython(set_expiry, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0012_quotation_expiry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='invoice',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payments', to='sales.invoice'),
+        ),
+    ]
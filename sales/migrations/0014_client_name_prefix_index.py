@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 19:43
+
+import django.db.models.functions.text
+import inventory_app.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0013_protect_payments'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='client',
+            name='client_name_upper_idx',
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=inventory_app.indexes.PrefixIndex(django.db.models.functions.text.Upper('name'), name='client_name_upper_idx'),
+        ),
+    ]
@@ -1,6 +1,106 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.dispatch import Signal
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Upper
+from django.db.models.lookups import GreaterThan, LessThanOrEqual
+from django.urls import reverse
+from django.utils import timezone
+from inventory_app import audit
+from inventory_app.indexes import PrefixIndex
+from datetime import timedelta
 from decimal import Decimal
 
+TAX_RATE = Decimal('0.16')
+CENTS = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+# Sent after a document's stored totals are rewritten, i.e. whenever its lines change
+totals_changed = Signal()
+
+
+def document_totals(subtotal):
+    """Return ``(subtotal, tax, total)`` for a sales document subtotal."""
+    subtotal = Decimal(subtotal or 0).quantize(CENTS)
+    tax = (subtotal * TAX_RATE).quantize(CENTS)
+    return subtotal, tax, subtotal + tax
+
+
+class DocumentTotalsMixin:
+    """
+    Stored subtotal/tax/total for a document with an ``items`` relation.
+
+    Totals are written by a direct UPDATE whenever the items change, so saving
+    the document itself never has to read its items.
+    """
+
+    def update_totals(self, subtotal=None):
+        if subtotal is None:
+            subtotal = self.items.aggregate(subtotal=Sum('amount'))['subtotal']
+        self.subtotal, self.tax, self.total = document_totals(subtotal)
+        # update() skips auto_now, so the change-feed timestamp is written explicitly
+        self.updated_at = timezone.now()
+        type(self).objects.filter(pk=self.pk).update(updated_at=self.updated_at, **self.totals_changes())
+        totals_changed.send(sender=type(self), document=self)
+
+    def totals_changes(self):
+        """Columns written by ``update_totals``; documents with derived columns extend this."""
+        return {'subtotal': self.subtotal, 'tax': self.tax, 'total': self.total}
+
+
+# -------------------------
+# Document Numbering
+# -------------------------
+class DocumentSequence(models.Model):
+    QUOTATION = "quotation"
+    INVOICE = "invoice"
+    DELIVERY_NOTE = "delivery_note"
+    CREDIT_NOTE = "credit_note"
+
+    DOCUMENT_TYPE_CHOICES = [
+        (QUOTATION, "Quotation"),
+        (INVOICE, "Invoice"),
+        (DELIVERY_NOTE, "Delivery Note"),
+        (CREDIT_NOTE, "Credit Note"),
+    ]
+
+    # prefix, last number issued before the first document (first numbers: QTN-3380, INV-4395, DN-1556, CN-2212)
+    DEFAULTS = {
+        QUOTATION: ("QTN", 3379),
+        INVOICE: ("INV", 4394),
+        DELIVERY_NOTE: ("DN", 1555),
+        CREDIT_NOTE: ("CN", 2211),
+    }
+
+    document_type = models.CharField(max_length=30, choices=DOCUMENT_TYPE_CHOICES, unique=True)
+    prefix = models.CharField(max_length=10)
+    last_number = models.PositiveIntegerField()
+    padding = models.PositiveSmallIntegerField(default=4)
+
+    def __str__(self):
+        return f"{self.get_document_type_display()} ({self.prefix}-{self.last_number:0{self.padding}d})"
+
+    @classmethod
+    def next_number(cls, document_type):
+        """
+        Allocate the next number for ``document_type``.
+
+        The UPDATE takes the row lock before the value is read, so concurrent
+        callers queue on it instead of reading the same number. Call this inside
+        the transaction that inserts the document: if the insert rolls back, so
+        does the increment, and no number is skipped.
+        """
+        with transaction.atomic():
+            if not cls.objects.filter(document_type=document_type).update(last_number=F("last_number") + 1):
+                prefix, last_number = cls.DEFAULTS[document_type]
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(document_type=document_type, prefix=prefix, last_number=last_number)
+                except IntegrityError:
+                    pass  # created concurrently
+                cls.objects.filter(document_type=document_type).update(last_number=F("last_number") + 1)
+            seq = cls.objects.get(document_type=document_type)
+        return f"{seq.prefix}-{seq.last_number:0{seq.padding}d}"
+
 
 # -------------------------
 # Client Model
@@ -12,6 +112,15 @@ class Client(models.Model):
     telephone = models.CharField(max_length=50, blank=True, null=True)
     email = models.EmailField(blank=True, null=True)
     pin = models.CharField(max_length=50, blank=True, null=True)  # KRA PIN
+    payment_terms_days = models.PositiveIntegerField(default=30)  # invoices fall due this many days after issue
+    updated_at = models.DateTimeField(auto_now=True)  # bumped on every write; the change-feed cursor
+
+    class Meta:
+        # Typeahead lookups match a prefix of the upper-cased name
+        indexes = [
+            PrefixIndex(Upper('name'), name='client_name_upper_idx'),
+            models.Index(fields=['updated_at', 'id'], name='client_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -20,51 +129,91 @@ class Client(models.Model):
 # -------------------------
 # Quotation + Items
 # -------------------------
-class Quotation(models.Model):
+class Quotation(DocumentTotalsMixin, models.Model):
+    OPEN = "Open"
+    EXPIRED = "Expired"
+    CONVERTED = "Converted"
+    STATUS_CHOICES = [
+        (OPEN, "Open"),
+        (EXPIRED, "Expired"),
+        (CONVERTED, "Converted"),
+    ]
+
     quotation_number = models.CharField(max_length=50, unique=True, blank=True)
     date = models.DateField(auto_now_add=True)
     created_at = models.DateTimeField(auto_now_add=True)
     client = models.ForeignKey('Client', on_delete=models.CASCADE)
     prepared_by = models.CharField(max_length=255)  # Text input
     validity_period = models.PositiveIntegerField(default=14)  # days
+    expires_at = models.DateField(blank=True, null=True)  # date + validity_period; valid through the day before
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=OPEN)
     subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
     tax = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
     total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-date', '-created_at']
+        # The client filter narrows by client and then ranges over date
+        indexes = [
+            models.Index(fields=['date', 'created_at'], name='quotation_date_idx'),
+            models.Index(fields=['client', 'date'], name='quotation_client_date_idx'),
+            models.Index(fields=['updated_at', 'id'], name='quotation_updated_idx'),
+            # Open/expired filters and the expiry sweep are one range over expires_at per status
+            models.Index(fields=['status', 'expires_at'], name='quotation_status_expiry_idx'),
+        ]
 
     def __str__(self):
         return self.quotation_number or "Draft Quotation"
 
+    @classmethod
+    def expire(cls, as_of=None):
+        """Flip open quotations whose validity has run out to Expired in one UPDATE; returns the count."""
+        as_of = as_of or timezone.localdate()
+        now = timezone.now()
+        with transaction.atomic():
+            count = (
+                cls.objects
+                .filter(status=cls.OPEN, expires_at__lte=as_of)
+                .update(status=cls.EXPIRED, updated_at=now)
+            )
+            # The rows just flipped are the ones carrying this update's timestamp
+            expired = cls.objects.filter(status=cls.EXPIRED, updated_at=now)
+            audit.record_update(expired, ['status', 'updated_at'])
+        return count
+
+    @classmethod
+    def with_status(cls, status, as_of=None):
+        """
+        Quotations in ``status`` as of today, whether or not the sweep has run yet.
+
+        An open quotation past its expiry counts as expired; each filter stays
+        a range on the (status, expires_at) index.
+        """
+        as_of = as_of or timezone.localdate()
+        if status == cls.OPEN:
+            return cls.objects.filter(status=cls.OPEN, expires_at__gt=as_of)
+        if status == cls.EXPIRED:
+            return cls.objects.filter(status__in=[cls.OPEN, cls.EXPIRED], expires_at__lte=as_of)
+        return cls.objects.filter(status=status)
+
     def save(self, *args, **kwargs):
-        # Auto-generate quotation number
-        if not self.quotation_number:
-            last_qtn = Quotation.objects.order_by("id").last()
-            if last_qtn and last_qtn.quotation_number:
-                last_number = int(last_qtn.quotation_number.split('-')[-1])
-                next_number = last_number + 1
-            else:
-                next_number = 3380  # start from 0500  
-            self.quotation_number = f"QTN-{next_number:04d}"      
-
-        # Calculate totals only if Quotation exists in DB and has items
-        if self.pk and self.items.exists():
-            subtotal = sum(item.amount for item in self.items.all())
-            self.subtotal = subtotal
-            self.tax = subtotal * Decimal('0.16')
-            self.total = self.subtotal + self.tax
-        else:
-            # Default totals for new quotation
-            self.subtotal = Decimal('0.00')
-            self.tax = Decimal('0.00')
-            self.total = Decimal('0.00')
+        with transaction.atomic():
+            # Auto-generate quotation number
+            if not self.quotation_number:
+                self.quotation_number = DocumentSequence.next_number(DocumentSequence.QUOTATION)
 
-        super().save(*args, **kwargs)
+            self.expires_at = (self.date or timezone.localdate()) + timedelta(days=self.validity_period or 0)
+            if self.status != self.CONVERTED:
+                # A longer validity period can reopen an expired quotation
+                self.status = self.EXPIRED if self.expires_at <= timezone.localdate() else self.OPEN
+
+            super().save(*args, **kwargs)
 
 
 class QuotationItem(models.Model):
     quotation = models.ForeignKey(Quotation, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey('inventory_app.Product', on_delete=models.SET_NULL, null=True, blank=True, related_name="quotation_items")
     item_number = models.PositiveIntegerField(editable=False)  # sequential index
     designation = models.CharField(max_length=255, blank=True, null=True)
     description = models.CharField(max_length=255)  # Item Name
@@ -72,9 +221,13 @@ class QuotationItem(models.Model):
     quantity = models.PositiveIntegerField()
     unit_price = models.DecimalField(max_digits=12, decimal_places=2)
     amount = models.DecimalField(max_digits=12, decimal_places=2, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['item_number']
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='quotation_item_updated_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # Assign item_number sequentially
@@ -87,6 +240,12 @@ class QuotationItem(models.Model):
         self.amount = Decimal(self.quantity) * self.unit_price
 
         super().save(*args, **kwargs)
+        self.quotation.update_totals()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.quotation.update_totals()
+        return result
 
     def __str__(self):
         return f"{self.description} ({self.item_number})"
@@ -95,7 +254,22 @@ class QuotationItem(models.Model):
 # -------------------------
 # Invoice + Items
 # -------------------------
-class Invoice(models.Model):
+def derived_payment_status(balance_due, amount_paid):
+    """
+    Payment status as an SQL expression, given the new balance and paid amount.
+
+    An invoice is Paid once something has been paid and nothing is left;
+    otherwise it is Overdue past its due date with a balance still owing, as
+    in ``mark_overdue``, and Pending before it.
+    """
+    return Case(
+        When(Q(GreaterThan(amount_paid, ZERO)) & Q(LessThanOrEqual(balance_due, ZERO)), then=Value("Paid")),
+        When(Q(due_date__lt=timezone.localdate()) & Q(GreaterThan(balance_due, ZERO)), then=Value("Overdue")),
+        default=Value("Pending"),
+    )
+
+
+class Invoice(DocumentTotalsMixin, models.Model):
     PAYMENT_STATUS_CHOICES = [
         ("Pending", "Pending"),
         ("Paid", "Paid"),
@@ -108,43 +282,105 @@ class Invoice(models.Model):
     order_number = models.CharField(max_length=50, blank=True, null=True)
     delivery_note_number = models.CharField(max_length=50, blank=True, null=True)
     client = models.ForeignKey(Client, on_delete=models.CASCADE)
+    quotation = models.OneToOneField(Quotation, on_delete=models.SET_NULL, null=True, blank=True, related_name="invoice")  # converted from
     prepared_by = models.CharField(max_length=255)  # Text input
     approved_by = models.CharField(max_length=255, blank=True, null=True)  # Text input
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default="Pending")
+    due_date = models.DateField(blank=True, null=True)
     subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
     tax = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
     total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    # Maintained from the payments; payment_status is derived from these
+    amount_paid = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
+    balance_due = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-date', '-created_at']
+        # List filters narrow by client or status and then range over date
+        indexes = [
+            models.Index(fields=['date', 'created_at'], name='invoice_date_idx'),
+            models.Index(fields=['client', 'date'], name='invoice_client_date_idx'),
+            models.Index(fields=['payment_status', 'date'], name='invoice_status_date_idx'),
+            models.Index(fields=['payment_status', 'due_date'], name='invoice_status_due_idx'),
+            models.Index(fields=['client', 'balance_due'], name='invoice_client_balance_idx'),
+            models.Index(fields=['updated_at', 'id'], name='invoice_updated_idx'),
+        ]
 
     def __str__(self):
         return self.invoice_number or "Draft Invoice"
 
+    @classmethod
+    def mark_overdue(cls, as_of=None):
+        """Flip pending invoices past their due date to Overdue in one UPDATE; returns the count."""
+        as_of = as_of or timezone.localdate()
+        now = timezone.now()
+        with transaction.atomic():
+            count = (
+                cls.objects
+                .filter(payment_status="Pending", due_date__lt=as_of, balance_due__gt=0)
+                .update(payment_status="Overdue", updated_at=now)
+            )
+            # The rows just flipped are the ones carrying this update's timestamp
+            overdue = cls.objects.filter(payment_status="Overdue", updated_at=now)
+            audit.record_update(overdue, ['payment_status', 'updated_at'])
+        return count
+
+    @classmethod
+    def apply_payments(cls, amounts):
+        """
+        Add ``{invoice_id: amount}`` to the paid amounts and balances of many invoices.
+
+        The change is applied with F() in one UPDATE per batch, so concurrent
+        receipts for the same invoice add up instead of overwriting each other.
+        Negative amounts reverse payments. The status is re-derived in the same
+        statement.
+        """
+        money = DecimalField(max_digits=12, decimal_places=2)
+        amounts = list(amounts.items())
+        now = timezone.now()
+        for start in range(0, len(amounts), 250):
+            batch = amounts[start:start + 250]
+            delta = Case(
+                *[When(pk=pk, then=Value(amount, output_field=money)) for pk, amount in batch],
+                default=Value(ZERO, output_field=money),
+                output_field=money,
+            )
+            cls.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+                amount_paid=F('amount_paid') + delta,
+                balance_due=F('balance_due') - delta,
+                payment_status=derived_payment_status(F('balance_due') - delta, F('amount_paid') + delta),
+                updated_at=now,
+            )
+            audit.record_update(
+                cls.objects.filter(pk__in=[pk for pk, _ in batch]),
+                ['amount_paid', 'balance_due', 'payment_status', 'updated_at'],
+            )
+
+    def totals_changes(self):
+        # The balance follows the total; the paid amount is left to the payments
+        changes = super().totals_changes()
+        balance = Value(self.total) - F('amount_paid')
+        changes['balance_due'] = balance
+        changes['payment_status'] = derived_payment_status(balance, F('amount_paid'))
+        return changes
+
     def save(self, *args, **kwargs):
-        # Auto-generate invoice number
-        if not self.invoice_number:
-            last_invoice = Invoice.objects.exclude(invoice_number__isnull=True).order_by("id").last()
-            try:
-                last_number = int(last_invoice.invoice_number.split('-')[-1])
-            except (ValueError, AttributeError):
-                last_number = 4394  # fallback starting number
-            except Exception:
-                last_number = 4394  # catch any unexpected error just in case
-            next_number = last_number + 1
-            self.invoice_number = f"INV-{next_number:04d}"
-
-        # Auto-calculate totals
-        subtotal = sum(item.amount for item in self.items.all()) if self.pk else Decimal('0.00')
-        self.subtotal = subtotal
-        self.tax = subtotal * Decimal('0.16')
-        self.total = self.subtotal + self.tax
+        with transaction.atomic():
+            # Auto-generate invoice number
+            if not self.invoice_number:
+                self.invoice_number = DocumentSequence.next_number(DocumentSequence.INVOICE)
 
-        super().save(*args, **kwargs)
+            if not self.due_date:
+                terms = Client.objects.filter(pk=self.client_id).values_list('payment_terms_days', flat=True).first()
+                self.due_date = (self.date or timezone.localdate()) + timedelta(days=terms or 0)
+
+            super().save(*args, **kwargs)
 
 
 class InvoiceItem(models.Model):
     invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey('inventory_app.Product', on_delete=models.SET_NULL, null=True, blank=True, related_name="invoice_items")
     item_number = models.PositiveIntegerField(editable=False)  # sequential index
     designation = models.CharField(max_length=255, blank=True, null=True)
     description = models.CharField(max_length=255)
@@ -152,6 +388,7 @@ class InvoiceItem(models.Model):
     quantity = models.PositiveIntegerField()
     unit_price = models.DecimalField(max_digits=12, decimal_places=2)
     amount = models.DecimalField(max_digits=12, decimal_places=2, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def save(self, *args, **kwargs):
         if not self.pk:
@@ -161,58 +398,106 @@ class InvoiceItem(models.Model):
 
         self.amount = self.quantity * self.unit_price
         super().save(*args, **kwargs)
+        self.invoice.update_totals()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.invoice.update_totals()
+        return result
 
     def __str__(self):
         return f"{self.description} ({self.item_number})"
     
     class Meta:
         ordering = ['item_number']
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='invoice_item_updated_idx'),
+        ]
+
+
+class Payment(models.Model):
+    METHOD_CHOICES = [
+        ("Bank Transfer", "Bank Transfer"),
+        ("Cheque", "Cheque"),
+        ("Cash", "Cash"),
+        ("Mobile Money", "Mobile Money"),
+    ]
+
+    invoice = models.ForeignKey(Invoice, on_delete=models.PROTECT, related_name="payments")  # invoices with payments cannot be deleted
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    date = models.DateField(default=timezone.localdate)
+    method = models.CharField(max_length=20, choices=METHOD_CHOICES, default="Bank Transfer")
+    reference = models.CharField(max_length=100, blank=True, null=True)  # bank or cheque reference
+    recorded_by = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date', 'pk']
+        indexes = [
+            models.Index(fields=['invoice', 'date'], name='payment_invoice_date_idx'),
+            models.Index(fields=['reference'], name='payment_reference_idx'),
+            models.Index(fields=['updated_at', 'id'], name='payment_updated_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = Payment.objects.filter(pk=self.pk).values_list('invoice_id', 'amount').first() if self.pk else None
+            super().save(*args, **kwargs)
+            amounts = {self.invoice_id: self.amount}
+            if previous:
+                amounts[previous[0]] = amounts.get(previous[0], ZERO) - previous[1]
+            Invoice.apply_payments(amounts)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Invoice.apply_payments({self.invoice_id: -self.amount})
+        return result
+
+    def __str__(self):
+        return f"{self.amount} on {self.invoice}"
 
 
 # -------------------------
 # Delivery Note + Items
 # -------------------------
-class DeliveryNote(models.Model):
+class DeliveryNote(DocumentTotalsMixin, models.Model):
     delivery_note_number = models.CharField(max_length=50, unique=True, blank=True)
     date = models.DateField(auto_now_add=True)
     created_at = models.DateTimeField(auto_now_add=True)
     order_number = models.CharField(max_length=50, blank=True, null=True)
     invoice = models.ForeignKey(Invoice, on_delete=models.SET_NULL, null=True, blank=True, related_name="delivery_notes")
+    stock_posted_at = models.DateTimeField(null=True, blank=True, editable=False)  # stock issued from inventory
     client = models.ForeignKey(Client, on_delete=models.CASCADE)
     subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
     tax = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
     total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['date', 'created_at'], name='delivery_note_date_idx'),
+            models.Index(fields=['client', 'date'], name='delivery_note_client_date_idx'),
+            models.Index(fields=['updated_at', 'id'], name='delivery_note_updated_idx'),
+        ]
 
     def __str__(self):
         return self.delivery_note_number or "Draft Delivery Note"
 
     def save(self, *args, **kwargs):
-        # Auto-generate delivery note number
-        if not self.delivery_note_number:
-            last_dn = DeliveryNote.objects.exclude(delivery_note_number__isnull=True).order_by("id").last()
-            try:
-                last_number = int(last_dn.delivery_note_number.split('-')[-1])
-            except (ValueError, AttributeError):
-                last_number = 1555  # fallback starting number (you can choose)
-            except Exception:
-                last_number = 1555
-            next_number = last_number + 1
-            self.delivery_note_number = f"DN-{next_number:04d}"
-
-        # Auto-calculate totals
-        subtotal = sum(item.amount for item in self.items.all()) if self.pk else Decimal('0.00')
-        self.subtotal = subtotal
-        self.tax = subtotal * Decimal('0.16')
-        self.total = self.subtotal + self.tax
+        with transaction.atomic():
+            # Auto-generate delivery note number
+            if not self.delivery_note_number:
+                self.delivery_note_number = DocumentSequence.next_number(DocumentSequence.DELIVERY_NOTE)
 
-        super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
 
 
 class DeliveryNoteItem(models.Model):
     delivery_note = models.ForeignKey(DeliveryNote, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey('inventory_app.Product', on_delete=models.SET_NULL, null=True, blank=True, related_name="delivery_note_items")
     item_number = models.PositiveIntegerField(editable=False)  # sequential index
     designation = models.CharField(max_length=255, blank=True, null=True)
     description = models.CharField(max_length=255)
@@ -220,6 +505,7 @@ class DeliveryNoteItem(models.Model):
     quantity = models.PositiveIntegerField()
     unit_price = models.DecimalField(max_digits=12, decimal_places=2)
     amount = models.DecimalField(max_digits=12, decimal_places=2, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def save(self, *args, **kwargs):
         if not self.pk:
@@ -229,57 +515,64 @@ class DeliveryNoteItem(models.Model):
 
         self.amount = self.quantity * self.unit_price
         super().save(*args, **kwargs)
+        self.delivery_note.update_totals()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.delivery_note.update_totals()
+        return result
 
     def __str__(self):
         return f"{self.description} ({self.item_number})"
     
     class Meta:
         ordering = ['item_number']
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='delivery_note_item_updated_idx'),
+        ]
 
 
 # -------------------------
 # Credit Note + Items
 # -------------------------
-class CreditNote(models.Model):
+class CreditNote(DocumentTotalsMixin, models.Model):
     credit_note_number = models.CharField(max_length=50, unique=True, blank=True, null=True)
     date = models.DateField(auto_now_add=True)
     created_at = models.DateTimeField(auto_now_add=True)
     invoice = models.ForeignKey(Invoice, on_delete=models.SET_NULL, null=True, blank=True, related_name="credit_notes")
+    delivery_note = models.ForeignKey(DeliveryNote, on_delete=models.SET_NULL, null=True, blank=True, related_name="credit_notes")
+    stock_posted_at = models.DateTimeField(null=True, blank=True, editable=False)  # returned stock booked back in
     order_number = models.CharField(max_length=50, blank=True, null=True)
     client = models.ForeignKey(Client, on_delete=models.CASCADE)
     prepared_by = models.CharField(max_length=255)  # stored but not displayed on printed note
     subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
     tax = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
     total = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['date', 'created_at'], name='credit_note_date_idx'),
+            models.Index(fields=['client', 'date'], name='credit_note_client_date_idx'),
+            models.Index(fields=['updated_at', 'id'], name='credit_note_updated_idx'),
+        ]
 
     def __str__(self):
         return self.credit_note_number or "Draft Credit Note"
 
     def save(self, *args, **kwargs):
-        # Auto-generate credit note number
-        if not self.credit_note_number:
-            last_cn = CreditNote.objects.exclude(credit_note_number__isnull=True).order_by("id").last()
-            try:
-                last_number = int(last_cn.credit_note_number.split('-')[-1])
-            except (ValueError, AttributeError):
-                last_number = 2211  # starting fallback (so first CN is CN-0800)
-            next_number = last_number + 1
-            self.credit_note_number = f"CN-{next_number:04d}"
-
-        # Auto-calc totals from items
-        subtotal = sum(item.amount for item in self.items.all()) if self.pk else Decimal('0.00')
-        self.subtotal = subtotal
-        self.tax = subtotal * Decimal('0.16')
-        self.total = self.subtotal + self.tax
+        with transaction.atomic():
+            # Auto-generate credit note number
+            if not self.credit_note_number:
+                self.credit_note_number = DocumentSequence.next_number(DocumentSequence.CREDIT_NOTE)
 
-        super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
 
 
 class CreditNoteItem(models.Model):
     credit_note = models.ForeignKey(CreditNote, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey('inventory_app.Product', on_delete=models.SET_NULL, null=True, blank=True, related_name="credit_note_items")
     item_number = models.PositiveIntegerField(editable=False)  # sequential index
     designation = models.CharField(max_length=255, blank=True, null=True)
     description = models.CharField(max_length=255)
@@ -287,6 +580,7 @@ class CreditNoteItem(models.Model):
     quantity = models.PositiveIntegerField()
     unit_price = models.DecimalField(max_digits=12, decimal_places=2)
     amount = models.DecimalField(max_digits=12, decimal_places=2, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def save(self, *args, **kwargs):
         if not self.pk:
@@ -295,10 +589,133 @@ class CreditNoteItem(models.Model):
 
         self.amount = self.quantity * self.unit_price
         super().save(*args, **kwargs)
+        self.credit_note.update_totals()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.credit_note.update_totals()
+        return result
 
     def __str__(self):
         return f"{self.description} ({self.item_number})"
 
     class Meta:
         ordering = ['item_number']
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='credit_note_item_updated_idx'),
+        ]
+
+
+# -------------------------
+# Sales Rollups
+# -------------------------
+class SalesRollup(models.Model):
+    """
+    Invoiced and credited line amounts (before tax) and quantities for one day.
+
+    Rows are derived from the invoice and credit note lines by sales.rollups
+    and are never edited by hand.
+    """
+    date = models.DateField()
+    invoiced = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    credited = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    quantity_sold = models.BigIntegerField(default=0)
+    quantity_returned = models.BigIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailySales(SalesRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date'], name='unique_daily_sales'),
+        ]
+
+
+class ClientDailySales(SalesRollup):
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name="daily_sales")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['client', 'date'], name='unique_client_daily_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'client'], name='client_sales_date_idx'),
+        ]
+
+
+class BrandDailySales(SalesRollup):
+    brand = models.CharField(max_length=255, blank=True)  # blank for lines without a brand
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['brand', 'date'], name='unique_brand_daily_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'brand'], name='brand_sales_date_idx'),
+        ]
 
+
+# -------------------------
+# Document Search
+# -------------------------
+class SearchEntry(models.Model):
+    """
+    The searchable text of one sales document.
+
+    Rows are kept current by sales.search as documents and their lines change.
+    The full-text index over them is database specific and is created by the
+    migration (FTS5 on SQLite, a tsvector GIN index on PostgreSQL).
+    """
+    KIND_CHOICES = [
+        ("quotation", "Quotation"),
+        ("invoice", "Invoice"),
+        ("delivery_note", "Delivery Note"),
+        ("credit_note", "Credit Note"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    document_id = models.PositiveIntegerField()
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name="search_entries")
+    date = models.DateField()
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    number = models.CharField(max_length=50, blank=True)
+    order_number = models.CharField(max_length=50, blank=True)
+    client_name = models.CharField(max_length=255, blank=True)
+    client_pin = models.CharField(max_length=50, blank=True)
+    items = models.TextField(blank=True)  # designation, description and brand of every line
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'document_id'], name='unique_search_entry'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.number}"
+
+    def get_absolute_url(self):
+        return reverse(f"sales:{self.kind}_detail", args=[self.document_id])
+
+
+# -------------------------
+# Change Feed
+# -------------------------
+class Tombstone(models.Model):
+    """
+    Marks a row deleted from one of the change-feed models.
+
+    Written by sales.changes when the row goes, so the change feed can tell
+    an integration to drop its copy; the row itself is gone by then.
+    """
+    resource = models.CharField(max_length=50)  # change-feed resource name, e.g. "invoices"
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['resource', 'deleted_at', 'id'], name='tombstone_resource_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.resource} #{self.object_id}"
@@ -0,0 +1,81 @@
+import csv
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from inventory_app import audit
+from inventory_app.models import AuditEvent
+from .models import ZERO, Invoice, Payment
+
+
+class ReceiptError(ValueError):
+    pass
+
+
+def parse_receipts(text, default_date):
+    """
+    Validate pasted bank-statement lines of ``invoice number, amount[, date][, reference]``.
+
+    Invoice numbers are resolved, and references checked against payments
+    already recorded, with one query each. Returns a list of dicts ready to
+    become Payment rows.
+    """
+    lines = [
+        (row_number, [cell.strip() for cell in cells])
+        for row_number, cells in enumerate(csv.reader(text.splitlines()), start=1)
+        if any(cell.strip() for cell in cells)
+    ]
+    numbers = {cells[0].upper() for _, cells in lines}
+    invoices = dict(Invoice.objects.filter(invoice_number__in=numbers).values_list('invoice_number', 'pk'))
+    references = {cells[3] for _, cells in lines if len(cells) > 3 and cells[3]}
+    recorded = set(
+        Payment.objects.filter(reference__in=references).values_list('reference', flat=True)
+    ) if references else set()
+
+    receipts = []
+    seen = set()
+    for row_number, cells in lines:
+        number, amount, date, reference = (cells + [''] * 4)[:4]
+        number = number.upper()
+        if number not in invoices:
+            raise ReceiptError(f"Line {row_number}: no invoice numbered {number}.")
+        try:
+            amount = Decimal(amount)
+        except InvalidOperation:
+            raise ReceiptError(f"Line {row_number}: amount must be a number.")
+        if not amount.is_finite() or amount <= 0:
+            raise ReceiptError(f"Line {row_number}: amount must be positive.")
+        payment_date = parse_date(date) if date else default_date
+        if payment_date is None:
+            raise ReceiptError(f"Line {row_number}: date must be YYYY-MM-DD.")
+        if reference and (reference in recorded or reference in seen):
+            raise ReceiptError(f"Line {row_number}: reference {reference} has already been recorded.")
+        seen.add(reference)
+        receipts.append({
+            'invoice_id': invoices[number],
+            'amount': amount.quantize(Decimal('0.01')),
+            'date': payment_date,
+            'reference': reference or None,
+        })
+    return receipts
+
+
+def record_payments(receipts, method, recorded_by=''):
+    """
+    Record a batch of receipts with one INSERT and one balance UPDATE per 250 invoices.
+
+    Several receipts for the same invoice are summed before the update, so a
+    statement of any length costs the same handful of queries.
+    """
+    totals = defaultdict(lambda: ZERO)
+    for receipt in receipts:
+        totals[receipt['invoice_id']] += receipt['amount']
+
+    with transaction.atomic():
+        payments = Payment.objects.bulk_create(
+            [Payment(method=method, recorded_by=recorded_by, **receipt) for receipt in receipts],
+            batch_size=500,
+        )
+        Invoice.apply_payments(totals)
+        audit.record_many(AuditEvent.CREATE, payments)
+    return payments
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.template.loader import render_to_string
+from .models import Client, CreditNote, DeliveryNote, Invoice, Quotation
+
+# Bump when the document templates change so cached PDFs are re-rendered
+RENDER_VERSION = 1
+
+
+# kind -> (model, number field, template, context builder)
+DOCUMENTS = {
+    'quotation': (Quotation, 'quotation_number', 'sales/quotation_detail.html',
+                  lambda doc: {'quotation': doc, 'items': doc.items.all()}),
+    'invoice': (Invoice, 'invoice_number', 'sales/invoice_detail.html',
+                lambda doc: {'invoice': doc, 'items': doc.items.all()}),
+    'delivery_note': (DeliveryNote, 'delivery_note_number', 'sales/delivery_note_detail.html',
+                      lambda doc: {'delivery_note': doc, 'items': doc.items.all()}),
+    'credit_note': (CreditNote, 'credit_note_number', 'sales/credit_note_detail.html',
+                    lambda doc: {'credit_note': doc, 'items': doc.items.all()}),
+}
+
+
+def document_context(kind, document):
+    return DOCUMENTS[kind][3](document)
+
+
+def document_filename(kind, document):
+    return f"{getattr(document, DOCUMENTS[kind][1])}.pdf"
+
+
+def content_hash(kind, document):
+    """
+    Hash of everything that appears on the printed document.
+
+    Covers the document row, its client and its items, so any edit to one of
+    them produces a new hash and therefore a new PDF.
+    """
+    model = DOCUMENTS[kind][0]
+    payload = {
+        'version': RENDER_VERSION,
+        'kind': kind,
+        'document': model.objects.filter(pk=document.pk).values().get(),
+        'client': Client.objects.filter(pk=document.client_id).values().get(),
+        'items': list(document.items.order_by('item_number', 'pk').values()),
+    }
+    data = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_dir():
+    return Path(settings.PDF_CACHE_DIR)
+
+
+def _link_callback(uri, rel):
+    """Resolve /static/ and /media/ URLs in the templates to files on disk."""
+    if uri.startswith(settings.STATIC_URL):
+        path = finders.find(uri[len(settings.STATIC_URL):])
+        if path:
+            return path
+        return os.path.join(settings.STATIC_ROOT, uri[len(settings.STATIC_URL):])
+    if uri.startswith(settings.MEDIA_URL):
+        return os.path.join(settings.MEDIA_ROOT, uri[len(settings.MEDIA_URL):])
+    return uri
+
+
+def pdf_renderer():
+    """The xhtml2pdf renderer; raises ImproperlyConfigured if the package is missing."""
+    try:
+        from xhtml2pdf import pisa
+    except ImportError:
+        raise ImproperlyConfigured("PDF rendering requires the xhtml2pdf package.")
+    return pisa
+
+
+def _init_worker():
+    # Each worker opens its own database connection instead of sharing the parent's
+    connections.close_all()
+
+
+def worker_pool(workers):
+    """
+    A process pool for rendering documents in parallel.
+
+    Workers are forked from the set-up parent; under spawn or forkserver they
+    would import the caller, and with it the models, before Django is
+    configured. The parent's connection is closed first so none inherit it.
+    """
+    connections.close_all()
+    return ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, mp_context=multiprocessing.get_context('fork'),
+    )
+
+
+def write_pdf(html, path):
+    pisa = pdf_renderer()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Render into a temporary file and rename, so readers never see a partial PDF
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            result = pisa.CreatePDF(html, dest=output, link_callback=_link_callback)
+        if result.err:
+            raise RuntimeError(f"Could not render {path.name}")
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def render_pdf(kind, document):
+    """
+    Return ``(path, cached)`` for the PDF of ``document``.
+
+    PDFs are stored under the content hash, so an unchanged document is served
+    from disk and only edited documents go through the template again.
+    """
+    digest = content_hash(kind, document)
+    path = cache_dir() / kind / digest[:2] / f"{digest}.pdf"
+    if path.exists():
+        return path, True
+
+    html = render_to_string(DOCUMENTS[kind][2], document_context(kind, document))
+    write_pdf(html, path)
+    return path, False
@@ -0,0 +1,86 @@
+import uuid
+from django.db import transaction
+from django.utils import timezone
+from inventory_app import audit, stock
+from inventory_app.models import AuditEvent, Location, StockMovement
+from .models import CreditNote, DeliveryNote
+
+
+class StockPostingError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(errors))
+
+
+def _movement_uuid(document, item):
+    # Stable per line, so a retried posting is reported as a duplicate rather than booked twice
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"sales:{document._meta.model_name}:{document.pk}:{item.pk}")
+
+
+def _post(model, document_id, movement_type, reason, user, location):
+    with transaction.atomic():
+        document = model.objects.select_for_update().get(pk=document_id)
+        if document.stock_posted_at:
+            return document, []
+
+        location = location or Location.get_default()
+        items = list(document.items.filter(product__isnull=False).select_related('product'))
+        movements = [
+            StockMovement(
+                client_uuid=_movement_uuid(document, item),
+                product=item.product,
+                location=location,
+                movement_type=movement_type,
+                quantity=item.quantity,
+                reason=reason,
+            )
+            for item in items
+        ]
+        results = stock.apply_movements(movements, user=user)
+
+        errors = [str(detail) for status, detail in results if status == stock.REJECTED]
+        if errors:
+            # Leaving the atomic block with an exception undoes every movement in the batch
+            raise StockPostingError(errors)
+
+        document.stock_posted_at = timezone.now()
+        model.objects.filter(pk=document.pk).update(
+            stock_posted_at=document.stock_posted_at,
+            updated_at=document.stock_posted_at,
+        )
+        audit.record(AuditEvent.UPDATE, document, {
+            'stock_posted_at': document.stock_posted_at,
+            'updated_at': document.stock_posted_at,
+        })
+    return document, [detail for status, detail in results if status == stock.APPLIED]
+
+
+def issue_delivery_note(delivery_note_id, user=None, location=None):
+    """
+    Take the goods on a delivery note out of stock.
+
+    Lines linked to a product become STOCK_OUT movements posted in one batch;
+    free-text lines are ignored. If any product is short, nothing is posted
+    and StockPostingError lists every shortfall. Returns
+    ``(delivery_note, movements)``; movements is empty if it was already issued.
+    """
+    return _post(DeliveryNote, delivery_note_id, StockMovement.STOCK_OUT, 'Sold', user, location)
+
+
+def receive_credit_note(credit_note_id, user=None, location=None):
+    """
+    Book the goods on a credit note back into stock. Returns ``(credit_note, movements)``.
+
+    Only goods that went out on an issued delivery note can come back, so a
+    credit note with no delivery note, or one never issued, raises
+    StockPostingError instead of creating stock.
+    """
+    credit_note = CreditNote.objects.select_related('delivery_note').get(pk=credit_note_id)
+    if credit_note.delivery_note is None:
+        raise StockPostingError([f"Credit note {credit_note.credit_note_number} is not linked to a delivery note."])
+    if not credit_note.delivery_note.stock_posted_at:
+        raise StockPostingError([
+            f"Delivery note {credit_note.delivery_note.delivery_note_number} has not been issued, "
+            f"so there is no stock to return."
+        ])
+    return _post(CreditNote, credit_note_id, StockMovement.STOCK_IN, 'Returned', user, location)
@@ -0,0 +1,64 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import CreditNote, Invoice
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+# key, label, fewest and most days past due (inclusive)
+AGING_BUCKETS = [
+    ('current', 'Current', None, 0),
+    ('days_30', '1-30 days', 1, 30),
+    ('days_60', '31-60 days', 31, 60),
+    ('days_90', '61-90 days', 61, 90),
+    ('days_90_plus', '90+ days', 91, None),
+]
+
+
+def _bucket_filter(as_of, min_days, max_days):
+    q = Q()
+    if min_days is not None:
+        q &= Q(due_date__lte=as_of - timedelta(days=min_days))
+    if max_days is not None:
+        q &= Q(due_date__gte=as_of - timedelta(days=max_days))
+    if min_days is None:
+        # No due date yet counts as current
+        q |= Q(due_date__isnull=True)
+    return q
+
+
+def aging_by_client(as_of=None):
+    """
+    Outstanding invoice amounts per client, bucketed by days past due.
+
+    Each invoice counts its unpaid balance less the credit notes raised against it.
+    The whole report is one grouped query over unpaid invoices.
+    """
+    as_of = as_of or timezone.localdate()
+    credited = Subquery(
+        CreditNote.objects.filter(invoice=OuterRef('pk'))
+        .order_by()
+        .values('invoice')
+        .annotate(credited=Sum('total'))
+        .values('credited'),
+        output_field=MONEY,
+    )
+    outstanding = F('balance_due') - Coalesce(credited, Value(Decimal('0.00')), output_field=MONEY)
+
+    buckets = {
+        key: Coalesce(
+            Sum(outstanding, filter=_bucket_filter(as_of, min_days, max_days), output_field=MONEY),
+            Value(Decimal('0.00')),
+            output_field=MONEY,
+        )
+        for key, _, min_days, max_days in AGING_BUCKETS
+    }
+    return list(
+        Invoice.objects
+        .filter(balance_due__gt=0)
+        .values('client_id', 'client__name')
+        .annotate(**buckets, outstanding=Sum(outstanding, output_field=MONEY))
+        .order_by('client__name')
+    )
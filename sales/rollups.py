@@ -0,0 +1,211 @@
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import F, Max, Min, Sum
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import (
+    ZERO, BrandDailySales, ClientDailySales, CreditNote, CreditNoteItem, DailySales, Invoice, InvoiceItem,
+    totals_changed,
+)
+
+# line model, document field, rollup amount field, rollup quantity field
+SOURCES = (
+    (InvoiceItem, 'invoice', 'invoiced', 'quantity_sold'),
+    (CreditNoteItem, 'credit_note', 'credited', 'quantity_returned'),
+)
+REBUILD_WINDOW_DAYS = 31
+
+
+def _rollup_models(apps):
+    return [apps.get_model(model._meta.label) for model in (DailySales, ClientDailySales, BrandDailySales)]
+
+
+def _build(start, end, apps=global_apps):
+    """
+    Rollup rows for every day from ``start`` to ``end``, computed from the lines.
+
+    One grouped query per source reads the lines in the range; the three
+    rollups are then summed up from those groups in memory. ``apps`` lets a
+    migration run this against its historical models.
+    """
+    daily_model, client_model, brand_model = _rollup_models(apps)
+    daily, clients, brands = {}, {}, {}
+
+    def rows(day, client_id, brand):
+        if day not in daily:
+            daily[day] = daily_model(date=day)
+        if (client_id, day) not in clients:
+            clients[client_id, day] = client_model(client_id=client_id, date=day)
+        if (brand, day) not in brands:
+            brands[brand, day] = brand_model(brand=brand, date=day)
+        return daily[day], clients[client_id, day], brands[brand, day]
+
+    for model, document, amount_field, quantity_field in SOURCES:
+        groups = (
+            apps.get_model(model._meta.label).objects
+            .filter(**{f'{document}__date__gte': start, f'{document}__date__lte': end})
+            .values_list(f'{document}__date', f'{document}__client_id', 'brand')
+            .annotate(amount=Sum('amount'), quantity=Sum('quantity'))
+            .order_by()
+        )
+        for day, client_id, brand, amount, quantity in groups.iterator():
+            for row in rows(day, client_id, (brand or '').strip()):
+                setattr(row, amount_field, getattr(row, amount_field) + (amount or ZERO))
+                setattr(row, quantity_field, getattr(row, quantity_field) + (quantity or 0))
+    return daily, list(clients.values()), list(brands.values())
+
+
+def refresh_day(day):
+    """
+    Recompute the rollups for one day from its invoice and credit note lines.
+
+    The day's DailySales row is locked first, so concurrent refreshes of the
+    same day queue up and the last one sees every committed change.
+    """
+    with transaction.atomic():
+        DailySales.objects.get_or_create(date=day)
+        DailySales.objects.select_for_update().get(date=day)
+        daily, clients, brands = _build(day, day)
+        totals = daily.get(day, DailySales(date=day))
+        DailySales.objects.filter(date=day).update(
+            invoiced=totals.invoiced,
+            credited=totals.credited,
+            quantity_sold=totals.quantity_sold,
+            quantity_returned=totals.quantity_returned,
+        )
+        ClientDailySales.objects.filter(date=day).delete()
+        BrandDailySales.objects.filter(date=day).delete()
+        ClientDailySales.objects.bulk_create(clients)
+        BrandDailySales.objects.bulk_create(brands)
+
+
+def rebuild(start=None, end=None, apps=global_apps):
+    """
+    Rebuild every rollup between ``start`` and ``end`` (default: all history).
+
+    Works through the range a month at a time, each window replaced in its own
+    transaction. Returns the number of days that had sales.
+    """
+    if start is None or end is None:
+        bounds = [
+            apps.get_model(model._meta.label).objects.aggregate(first=Min('date'), last=Max('date'))
+            for model in (Invoice, CreditNote)
+        ]
+        firsts = [b['first'] for b in bounds if b['first']]
+        lasts = [b['last'] for b in bounds if b['last']]
+        if not firsts:
+            return 0
+        start = start or min(firsts)
+        end = end or max(lasts)
+
+    daily_model, client_model, brand_model = _rollup_models(apps)
+    days = 0
+    window_start = start
+    while window_start <= end:
+        window_end = min(window_start + timedelta(days=REBUILD_WINDOW_DAYS - 1), end)
+        daily, clients, brands = _build(window_start, window_end, apps)
+        with transaction.atomic():
+            for model in (daily_model, client_model, brand_model):
+                model.objects.filter(date__gte=window_start, date__lte=window_end).delete()
+            daily_model.objects.bulk_create(daily.values(), batch_size=1000)
+            client_model.objects.bulk_create(clients, batch_size=1000)
+            brand_model.objects.bulk_create(brands, batch_size=1000)
+        days += len(daily)
+        window_start = window_end + timedelta(days=1)
+    return days
+
+
+_batch = threading.local()
+
+
+def schedule_refresh(day):
+    days = getattr(_batch, 'days', None)
+    if days is not None:
+        days.add(day)
+        return
+    # Runs after the surrounding transaction commits, so the rollup never sees uncommitted lines
+    transaction.on_commit(lambda: refresh_day(day))
+
+
+@contextmanager
+def batched_refresh():
+    """Refresh each day touched inside the block once, rather than once per document."""
+    if getattr(_batch, 'days', None) is not None:
+        yield
+        return
+    _batch.days = set()
+    try:
+        yield
+        days = _batch.days
+    finally:
+        _batch.days = None
+    for day in sorted(days):
+        schedule_refresh(day)
+
+
+@receiver(totals_changed, sender=Invoice)
+@receiver(totals_changed, sender=CreditNote)
+def _lines_changed(sender, document, **kwargs):
+    schedule_refresh(document.date)
+
+
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=CreditNote)
+def _document_deleted(sender, instance, **kwargs):
+    schedule_refresh(instance.date)
+
+
+# -------------------------
+# Reads (rollups only)
+# -------------------------
+def _net(queryset):
+    return queryset.annotate(
+        invoiced_total=Sum('invoiced'),
+        credited_total=Sum('credited'),
+        net=Sum('invoiced') - Sum('credited'),
+        quantity=Sum('quantity_sold') - Sum('quantity_returned'),
+    )
+
+
+def summary(start, end):
+    totals = DailySales.objects.filter(date__gte=start, date__lte=end).aggregate(
+        invoiced=Sum('invoiced'),
+        credited=Sum('credited'),
+        quantity_sold=Sum('quantity_sold'),
+        quantity_returned=Sum('quantity_returned'),
+    )
+    invoiced = totals['invoiced'] or ZERO
+    credited = totals['credited'] or ZERO
+    return {
+        'invoiced': invoiced,
+        'credited': credited,
+        'net': invoiced - credited,
+        'quantity': (totals['quantity_sold'] or 0) - (totals['quantity_returned'] or 0),
+    }
+
+
+def by_day(start, end):
+    return list(
+        DailySales.objects
+        .filter(date__gte=start, date__lte=end)
+        .order_by('date')
+        .values('date', invoiced_total=F('invoiced'), credited_total=F('credited'))
+        .annotate(net=F('invoiced') - F('credited'), quantity=F('quantity_sold') - F('quantity_returned'))
+    )
+
+
+def top_clients(start, end, limit=20):
+    return list(
+        _net(ClientDailySales.objects.filter(date__gte=start, date__lte=end).values('client_id', 'client__name'))
+        .order_by('-net', 'client__name')[:limit]
+    )
+
+
+def by_brand(start, end, limit=20):
+    return list(
+        _net(BrandDailySales.objects.filter(date__gte=start, date__lte=end).values('brand'))
+        .order_by('-net', 'brand')[:limit]
+    )
@@ -0,0 +1,197 @@
+import re
+import string
+from django.apps import apps as global_apps
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Client, CreditNote, DeliveryNote, Invoice, Quotation, SearchEntry, totals_changed
+
+SEARCH_LIMIT = 50
+
+# SearchEntry kind -> (document model, number field)
+DOCUMENTS = {
+    'quotation': (Quotation, 'quotation_number'),
+    'invoice': (Invoice, 'invoice_number'),
+    'delivery_note': (DeliveryNote, 'delivery_note_number'),
+    'credit_note': (CreditNote, 'credit_note_number'),
+}
+KINDS = {model: kind for kind, (model, _) in DOCUMENTS.items()}
+
+# Words are split on whitespace and ASCII punctuation alike, so "INV-0042" and
+# "2.5mm" tokenize the same way in the index and in the query on both databases
+TERM_SEPARATORS = re.compile(r'[\s' + re.escape(string.punctuation) + r']+')
+
+# Same expression as the index created in migration 0010_document_search
+POSTGRES_VECTOR = """
+    setweight(to_tsvector('simple', regexp_replace(number || ' ' || order_number, '[[:punct:]]+', ' ', 'g')), 'A')
+    || setweight(to_tsvector('simple', regexp_replace(client_name || ' ' || client_pin, '[[:punct:]]+', ' ', 'g')), 'B')
+    || setweight(to_tsvector('simple', regexp_replace(items, '[[:punct:]]+', ' ', 'g')), 'C')
+"""
+# Column weights for bm25: number, order number, client name, PIN, items
+SQLITE_WEIGHTS = '10.0, 8.0, 4.0, 4.0, 1.0'
+
+
+def _terms(text):
+    return [term.lower() for term in TERM_SEPARATORS.split(text or '') if term]
+
+
+def _line_text(document):
+    lines = document.items.values_list('designation', 'description', 'brand')
+    return ' '.join(value for line in lines for value in line if value)
+
+
+def index_document(document):
+    """Write the number, order and client columns of a document's search entry."""
+    kind = KINDS[type(document)]
+    name, pin = Client.objects.filter(pk=document.client_id).values_list('name', 'pin').get()
+    SearchEntry.objects.update_or_create(
+        kind=kind,
+        document_id=document.pk,
+        defaults={
+            'client_id': document.client_id,
+            'date': document.date,
+            'total': document.total,
+            'number': getattr(document, DOCUMENTS[kind][1]) or '',
+            'order_number': getattr(document, 'order_number', None) or '',
+            'client_name': name,
+            'client_pin': pin or '',
+        },
+    )
+
+
+def index_lines(document):
+    """Write the line text and total of a document's search entry."""
+    SearchEntry.objects.filter(kind=KINDS[type(document)], document_id=document.pk).update(
+        items=_line_text(document),
+        total=document.total,
+    )
+
+
+def rebuild(apps=global_apps):
+    """
+    Re-create every search entry from the documents. Returns the number indexed.
+
+    ``apps`` lets a migration run this against its historical models.
+    """
+    entry_model = apps.get_model(SearchEntry._meta.label)
+    count = 0
+    with transaction.atomic():
+        entry_model.objects.all().delete()
+        for kind, (model, number_field) in DOCUMENTS.items():
+            model = apps.get_model(model._meta.label)
+            line_model, document_field = model.items.rel.related_model, model.items.field.name
+            rows = (
+                line_model.objects
+                .values_list(document_field, 'designation', 'description', 'brand')
+                .order_by(document_field, 'item_number')
+            )
+            lines = {}
+            for document_id, *values in rows.iterator(chunk_size=2000):
+                lines.setdefault(document_id, []).extend(value for value in values if value)
+
+            documents = model.objects.select_related('client').order_by('pk')
+            batch = []
+            for document in documents.iterator(chunk_size=2000):
+                batch.append(entry_model(
+                    kind=kind,
+                    document_id=document.pk,
+                    client_id=document.client_id,
+                    date=document.date,
+                    total=document.total,
+                    number=getattr(document, number_field) or '',
+                    order_number=getattr(document, 'order_number', None) or '',
+                    client_name=document.client.name,
+                    client_pin=document.client.pin or '',
+                    items=' '.join(lines.get(document.pk, [])),
+                ))
+                if len(batch) == 1000:
+                    entry_model.objects.bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+            entry_model.objects.bulk_create(batch)
+            count += len(batch)
+    return count
+
+
+def search(text, limit=SEARCH_LIMIT):
+    """
+    Documents of every kind matching all the words in ``text``, best match first.
+
+    Each word matches as a prefix, so "32a brea" finds "32A breaker". Numbers
+    outrank order numbers, which outrank client names and then line text.
+    Runs as one query against the database's full-text index.
+    """
+    terms = _terms(text)
+    if not terms:
+        return []
+    table = SearchEntry._meta.db_table
+
+    if connection.vendor == 'postgresql':
+        query = ' & '.join(f"{term}:*" for term in terms)
+        return list(SearchEntry.objects.raw(
+            f"""
+            SELECT e.*, ts_rank({POSTGRES_VECTOR}, q) AS rank
+            FROM {table} e, to_tsquery('simple', %s) q
+            WHERE ({POSTGRES_VECTOR}) @@ q
+            ORDER BY rank DESC, e.date DESC, e.id DESC
+            LIMIT %s
+            """,
+            [query, limit],
+        ))
+
+    if connection.vendor == 'sqlite':
+        query = ' '.join(f'"{term}"*' for term in terms)
+        return list(SearchEntry.objects.raw(
+            f"""
+            SELECT e.*, -bm25({table}_fts, {SQLITE_WEIGHTS}) AS rank
+            FROM {table}_fts JOIN {table} e ON e.id = {table}_fts.rowid
+            WHERE {table}_fts MATCH %s
+            ORDER BY rank DESC, e.date DESC, e.id DESC
+            LIMIT %s
+            """,
+            [query, limit],
+        ))
+
+    # No full-text index on other databases: match every word somewhere, newest first
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(number__icontains=term) | Q(order_number__icontains=term) | Q(client_name__icontains=term)
+            | Q(client_pin__icontains=term) | Q(items__icontains=term)
+        )
+    return list(SearchEntry.objects.filter(condition).order_by('-date', '-id')[:limit])
+
+
+@receiver(post_save, sender=Quotation)
+@receiver(post_save, sender=Invoice)
+@receiver(post_save, sender=DeliveryNote)
+@receiver(post_save, sender=CreditNote)
+def _document_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_document(instance)
+
+
+@receiver(totals_changed, sender=Quotation)
+@receiver(totals_changed, sender=Invoice)
+@receiver(totals_changed, sender=DeliveryNote)
+@receiver(totals_changed, sender=CreditNote)
+def _lines_changed(sender, document, **kwargs):
+    index_lines(document)
+
+
+@receiver(post_delete, sender=Quotation)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=DeliveryNote)
+@receiver(post_delete, sender=CreditNote)
+def _document_deleted(sender, instance, **kwargs):
+    SearchEntry.objects.filter(kind=KINDS[sender], document_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Client)
+def _client_saved(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        SearchEntry.objects.filter(client_id=instance.pk).update(
+            client_name=instance.name,
+            client_pin=instance.pin or '',
+        )
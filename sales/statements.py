@@ -0,0 +1,134 @@
+import csv
+import heapq
+import tempfile
+from collections import namedtuple
+from django.db.models import Q, Sum
+from django.template.loader import render_to_string
+from . import pdf
+from .bulk import Echo
+from .models import CENTS, ZERO, CreditNote, Invoice, Payment
+
+FORMATS = ('html', 'csv', 'pdf')
+ROWS_MARKER = '<!-- statement rows -->'
+CHUNK_SIZE = 500
+
+StatementLine = namedtuple('StatementLine', 'date kind number details debit credit balance')
+
+
+class Statement:
+    """
+    A client's statement of account for ``start`` to ``end`` inclusive.
+
+    The opening and closing balances come from three aggregate queries up
+    front; ``lines()`` then streams invoices, credit notes and payments in date
+    order, merged from one ordered query each, with a running balance.
+    """
+
+    def __init__(self, client, start, end):
+        self.client = client
+        self.start = start
+        self.end = end
+        before, during = Q(date__lt=start), Q(date__gte=start, date__lte=end)
+
+        def totals(queryset, field):
+            sums = queryset.aggregate(before=Sum(field, filter=before), during=Sum(field, filter=during))
+            return (sums['before'] or ZERO).quantize(CENTS), (sums['during'] or ZERO).quantize(CENTS)
+
+        invoiced = totals(Invoice.objects.filter(client=client), 'total')
+        credited = totals(CreditNote.objects.filter(client=client), 'total')
+        paid = totals(Payment.objects.filter(invoice__client=client), 'amount')
+        self.opening = invoiced[0] - credited[0] - paid[0]
+        self.invoiced, self.credited, self.paid = invoiced[1], credited[1], paid[1]
+        self.closing = self.opening + self.invoiced - self.credited - self.paid
+
+    def _invoices(self):
+        rows = (
+            Invoice.objects
+            .filter(client=self.client, date__gte=self.start, date__lte=self.end)
+            .order_by('date', 'created_at', 'pk')
+            .values_list('date', 'created_at', 'invoice_number', 'order_number', 'total')
+        )
+        for date, created_at, number, order_number, total in rows.iterator(chunk_size=CHUNK_SIZE):
+            details = f"L.P.O {order_number}" if order_number else ''
+            yield (date, 0, created_at), ('Invoice', number, details, total, None)
+
+    def _credit_notes(self):
+        rows = (
+            CreditNote.objects
+            .filter(client=self.client, date__gte=self.start, date__lte=self.end)
+            .order_by('date', 'created_at', 'pk')
+            .values_list('date', 'created_at', 'credit_note_number', 'invoice__invoice_number', 'total')
+        )
+        for date, created_at, number, invoice_number, total in rows.iterator(chunk_size=CHUNK_SIZE):
+            details = f"Against {invoice_number}" if invoice_number else ''
+            yield (date, 1, created_at), ('Credit Note', number, details, None, total)
+
+    def _payments(self):
+        rows = (
+            Payment.objects
+            .filter(invoice__client=self.client, date__gte=self.start, date__lte=self.end)
+            .order_by('date', 'created_at', 'pk')
+            .values_list('date', 'created_at', 'reference', 'method', 'invoice__invoice_number', 'amount')
+        )
+        for date, created_at, reference, method, invoice_number, amount in rows.iterator(chunk_size=CHUNK_SIZE):
+            yield (date, 2, created_at), ('Payment', reference or '', f"{method} for {invoice_number}", None, amount)
+
+    def lines(self):
+        # On a given day invoices come first, then credit notes, then payments
+        balance = self.opening
+        merged = heapq.merge(self._invoices(), self._credit_notes(), self._payments(), key=lambda row: row[0])
+        for (date, *_), (kind, number, details, debit, credit) in merged:
+            balance += (debit or ZERO) - (credit or ZERO)
+            yield StatementLine(date, kind, number, details, debit, credit, balance)
+
+    def filename(self, extension):
+        return f"statement-{self.client.pk}-{self.start:%Y%m%d}-{self.end:%Y%m%d}.{extension}"
+
+
+def csv_rows(statement):
+    writer = csv.writer(Echo())
+    yield writer.writerow(['Date', 'Type', 'Number', 'Details', 'Debit', 'Credit', 'Balance'])
+    yield writer.writerow([statement.start, 'Opening balance', '', '', '', '', statement.opening])
+    for line in statement.lines():
+        yield writer.writerow(['' if value is None else value for value in line])
+    yield writer.writerow([statement.end, 'Closing balance', '', '', '', '', statement.closing])
+
+
+def html_chunks(statement):
+    """
+    The statement page in pieces: the page around the rows is rendered once
+    and the rows follow in chunks, so no more than CHUNK_SIZE lines are held.
+    """
+    page = render_to_string('sales/statement.html', {'statement': statement, 'rows_marker': ROWS_MARKER})
+    head, tail = page.split(ROWS_MARKER, 1)
+    yield head
+    chunk = []
+    for line in statement.lines():
+        chunk.append(line)
+        if len(chunk) == CHUNK_SIZE:
+            yield render_to_string('sales/statement_rows.html', {'lines': chunk})
+            chunk = []
+    if chunk:
+        yield render_to_string('sales/statement_rows.html', {'lines': chunk})
+    yield tail
+
+
+def write(statement, output, path):
+    """Write the statement to ``path`` as ``output`` (one of FORMATS). Returns the path."""
+    if output == 'pdf':
+        return write_pdf(statement, path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    chunks = csv_rows(statement) if output == 'csv' else html_chunks(statement)
+    with open(path, 'w', newline='', encoding='utf-8') as destination:
+        destination.writelines(chunks)
+    return path
+
+
+def write_pdf(statement, path):
+    # The HTML goes through a spooled file, which moves to disk once it grows past a few MB
+    with tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024, mode='w+') as html:
+        for chunk in html_chunks(statement):
+            html.write(chunk)
+        html.seek(0)
+        pdf.write_pdf(html, path)
+    return path
@@ -0,0 +1,111 @@
+// Typeahead for the client and invoice fields on the sales forms.
+// Markup comes from sales/lookup_field.html: a hidden input holding the id,
+// a text input the user types into and an empty dropdown for the results.
+(function () {
+  function debounce(fn, wait) {
+    let timer = null;
+    return function () {
+      clearTimeout(timer);
+      timer = setTimeout(fn, wait);
+    };
+  }
+
+  function initLookup(wrapper) {
+    const hidden = wrapper.querySelector('input[type="hidden"]');
+    const text = wrapper.querySelector('.lookup-text');
+    const menu = wrapper.querySelector('.lookup-menu');
+    const depends = wrapper.dataset.lookupDepends;
+    let controller = null;
+    let active = -1;
+
+    function close() {
+      menu.classList.remove('show');
+      menu.innerHTML = '';
+      active = -1;
+    }
+
+    function set(id, label) {
+      hidden.value = id || '';
+      text.value = label || '';
+      text.setCustomValidity('');
+    }
+
+    function choose(result) {
+      set(result.id, result.text);
+      close();
+      wrapper.dispatchEvent(new CustomEvent('lookup:select', { detail: result, bubbles: true }));
+    }
+
+    function highlight(index) {
+      const items = menu.querySelectorAll('.dropdown-item[data-index]');
+      if (!items.length) return;
+      active = (index + items.length) % items.length;
+      items.forEach((item, i) => item.classList.toggle('active', i === active));
+    }
+
+    function render(results) {
+      menu.innerHTML = '';
+      results.forEach((result, index) => {
+        const item = document.createElement('a');
+        item.href = '#';
+        item.className = 'dropdown-item';
+        item.dataset.index = index;
+        item.textContent = result.label || result.text;
+        // mousedown fires before the text input loses focus
+        item.addEventListener('mousedown', e => { e.preventDefault(); choose(result); });
+        menu.appendChild(item);
+      });
+      if (!results.length) {
+        const empty = document.createElement('span');
+        empty.className = 'dropdown-item-text text-muted';
+        empty.textContent = 'No matches';
+        menu.appendChild(empty);
+      }
+      menu.results = results;
+      menu.classList.add('show');
+    }
+
+    const search = debounce(function () {
+      const params = new URLSearchParams({ q: text.value.trim() });
+      const other = depends ? document.getElementById(depends) : null;
+      if (other && other.value) params.set(depends, other.value);
+      if (!params.get('q') && !params.get(depends)) { close(); return; }
+
+      if (controller) controller.abort();
+      controller = new AbortController();
+      fetch(wrapper.dataset.lookupUrl + '?' + params, {
+        signal: controller.signal,
+        headers: { 'Accept': 'application/json' },
+        credentials: 'same-origin',
+      })
+        .then(response => response.json())
+        .then(data => { if (document.activeElement === text) render(data.results); })
+        .catch(err => { if (err.name !== 'AbortError') console.error('Lookup failed', err); });
+    }, 200);
+
+    text.addEventListener('input', function () {
+      hidden.value = '';
+      // A typed name that was not picked from the list must not be submitted
+      text.setCustomValidity(text.value ? 'Choose an entry from the list.' : '');
+      search();
+    });
+    text.addEventListener('focus', search);
+    text.addEventListener('blur', close);
+    text.addEventListener('keydown', function (e) {
+      if (!menu.classList.contains('show')) return;
+      if (e.key === 'ArrowDown') { e.preventDefault(); highlight(active + 1); }
+      else if (e.key === 'ArrowUp') { e.preventDefault(); highlight(active - 1); }
+      else if (e.key === 'Escape') { close(); }
+      else if (e.key === 'Enter' && menu.results && menu.results.length) {
+        e.preventDefault();
+        choose(menu.results[Math.max(active, 0)]);
+      }
+    });
+
+    wrapper.lookupSet = set;
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('[data-lookup-url]').forEach(initLookup);
+  });
+})();
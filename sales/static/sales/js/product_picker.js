@@ -0,0 +1,164 @@
+// Product autocomplete for the line items on the sales forms, plus
+// "paste barcodes" to add many lines at once. Markup comes from
+// sales/product_picker.html, which names the items table and its add button.
+(function () {
+  function initPicker(picker) {
+    const tbody = document.getElementById(picker.dataset.table).querySelector('tbody');
+    const addButton = document.getElementById(picker.dataset.addButton);
+    const form = picker.closest('form');
+    const menu = document.createElement('div');
+    menu.className = 'dropdown-menu';
+    menu.style.position = 'absolute';
+    document.body.appendChild(menu);
+
+    let target = null;
+    let results = [];
+    let active = -1;
+    let timer = null;
+    let controller = null;
+
+    function setValue(row, name, value) {
+      const input = row.querySelector(`[name="${name}"]`);
+      if (input) input.value = value;
+    }
+
+    function showStock(row, product) {
+      let hint = row.querySelector('.stock-hint');
+      if (!hint) {
+        hint = document.createElement('small');
+        hint.className = 'form-text stock-hint';
+        row.querySelector('[name="description"]').after(hint);
+      }
+      hint.textContent = `${product.stock} in stock`;
+      hint.classList.toggle('text-danger', product.stock <= 0);
+      hint.classList.toggle('text-muted', product.stock > 0);
+    }
+
+    function fill(row, product, quantity) {
+      ['barcode', 'designation', 'description', 'brand', 'unit_price'].forEach(name => setValue(row, name, product[name]));
+      const qty = row.querySelector('[name="quantity"]');
+      if (quantity) qty.value = quantity;
+      else if (!qty.value) qty.value = 1;
+      // Let the form's own listeners recalculate the amount
+      qty.dispatchEvent(new Event('input', { bubbles: true }));
+      showStock(row, product);
+    }
+
+    function emptyRow() {
+      const blank = Array.from(tbody.querySelectorAll('tr')).find(row => {
+        const description = row.querySelector('[name="description"]');
+        return description && !description.value.trim();
+      });
+      if (blank) return blank;
+      addButton.click();
+      return tbody.lastElementChild;
+    }
+
+    function close() {
+      menu.classList.remove('show');
+      menu.innerHTML = '';
+      results = [];
+      active = -1;
+    }
+
+    function choose(product) {
+      if (target) fill(target.closest('tr'), product);
+      close();
+    }
+
+    function highlight(index) {
+      const items = menu.querySelectorAll('.dropdown-item');
+      if (!items.length) return;
+      active = (index + items.length) % items.length;
+      items.forEach((item, i) => item.classList.toggle('active', i === active));
+    }
+
+    function render(input, found) {
+      close();
+      if (!found.length) return;
+      results = found;
+      found.forEach(product => {
+        const item = document.createElement('a');
+        item.href = '#';
+        item.className = 'dropdown-item';
+        item.textContent = product.label;
+        item.addEventListener('mousedown', e => { e.preventDefault(); choose(product); });
+        menu.appendChild(item);
+      });
+      const rect = input.getBoundingClientRect();
+      menu.style.left = `${rect.left + window.scrollX}px`;
+      menu.style.top = `${rect.bottom + window.scrollY}px`;
+      menu.style.minWidth = `${rect.width}px`;
+      menu.classList.add('show');
+    }
+
+    function search(input) {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        const q = input.value.trim();
+        if (!q) { close(); return; }
+        if (controller) controller.abort();
+        controller = new AbortController();
+        fetch(`${picker.dataset.productUrl}?${new URLSearchParams({ q })}`, {
+          signal: controller.signal,
+          headers: { 'Accept': 'application/json' },
+          credentials: 'same-origin',
+        })
+          .then(response => response.json())
+          .then(data => { if (document.activeElement === input) render(input, data.results); })
+          .catch(err => { if (err.name !== 'AbortError') console.error('Product lookup failed', err); });
+      }, 150);
+    }
+
+    function lookupBarcodes(text) {
+      const body = new FormData();
+      body.append('barcodes', text);
+      body.append('csrfmiddlewaretoken', form.querySelector('[name="csrfmiddlewaretoken"]').value);
+      return fetch(picker.dataset.barcodesUrl, { method: 'POST', body, credentials: 'same-origin' })
+        .then(response => response.json());
+    }
+
+    tbody.addEventListener('input', function (e) {
+      if (e.target.name === 'description' || e.target.name === 'barcode') {
+        target = e.target;
+        search(e.target);
+      }
+    });
+
+    tbody.addEventListener('keydown', function (e) {
+      if (e.target !== target && e.target.name !== 'barcode') return;
+      if (menu.classList.contains('show')) {
+        if (e.key === 'ArrowDown') { e.preventDefault(); highlight(active + 1); return; }
+        if (e.key === 'ArrowUp') { e.preventDefault(); highlight(active - 1); return; }
+        if (e.key === 'Escape') { close(); return; }
+      }
+      if (e.key !== 'Enter') return;
+      // Scanners finish with Enter: resolve the exact barcode instead of submitting the form
+      e.preventDefault();
+      if (results.length && active >= 0) { choose(results[active]); return; }
+      if (e.target.name === 'barcode' && e.target.value.trim()) {
+        const input = e.target;
+        close();
+        lookupBarcodes(input.value.trim()).then(data => {
+          if (data.results.length) fill(input.closest('tr'), data.results[0], null);
+        });
+      }
+    });
+
+    tbody.addEventListener('focusout', close);
+
+    picker.querySelector('.add-barcodes').addEventListener('click', function () {
+      const textarea = picker.querySelector('.paste-barcodes');
+      const missing = picker.querySelector('.paste-missing');
+      lookupBarcodes(textarea.value).then(data => {
+        data.results.forEach(product => fill(emptyRow(), product, product.quantity));
+        missing.textContent = data.missing.length ? `Not found: ${data.missing.join(', ')}` : '';
+        textarea.value = data.missing.join('\n');
+      });
+    });
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('.product-picker').forEach(initPicker);
+  });
+})();
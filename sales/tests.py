@@ -1,3 +1,136 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from .models import Client, DocumentSequence, Invoice, Payment, Quotation
+from .payments import ReceiptError, parse_receipts, record_payments
 
-# Create your tests here.
+
+class DocumentSequenceTests(TestCase):
+    def setUp(self):
+        self.client_obj = Client.objects.create(name="Acme")
+
+    def test_numbers_continue_from_seeded_start(self):
+        first = Quotation.objects.create(client=self.client_obj, prepared_by="Tester")
+        second = Quotation.objects.create(client=self.client_obj, prepared_by="Tester")
+        self.assertEqual(first.quotation_number, "QTN-3380")
+        self.assertEqual(second.quotation_number, "QTN-3381")
+
+    def test_prefix_and_start_come_from_the_sequence_row(self):
+        DocumentSequence.objects.filter(document_type=DocumentSequence.INVOICE).update(prefix="TI", last_number=99)
+        invoice = Invoice.objects.create(client=self.client_obj, prepared_by="Tester")
+        self.assertEqual(invoice.invoice_number, "TI-0100")
+
+    def test_missing_sequence_row_is_recreated_with_defaults(self):
+        DocumentSequence.objects.filter(document_type=DocumentSequence.INVOICE).delete()
+        self.assertEqual(DocumentSequence.next_number(DocumentSequence.INVOICE), "INV-4395")
+
+
+class DocumentSequenceConcurrencyTests(TransactionTestCase):
+    # Each thread has its own connection: on PostgreSQL they queue on the sequence row,
+    # on SQLite on the database lock (see the SQLite options in settings)
+    creators = 8
+    per_creator = 10
+
+    def test_parallel_creators_get_unique_gap_free_numbers(self):
+        client = Client.objects.create(name="Acme")
+        start = DocumentSequence.objects.get(document_type=DocumentSequence.INVOICE).last_number
+        barrier = threading.Barrier(self.creators)
+        errors = []
+
+        def create_invoices():
+            try:
+                barrier.wait()
+                for _ in range(self.per_creator):
+                    Invoice.objects.create(client=client, prepared_by="Tester")
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=create_invoices) for _ in range(self.creators)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        total = self.creators * self.per_creator
+        numbers = sorted(int(n.split("-")[-1]) for n in Invoice.objects.values_list("invoice_number", flat=True))
+        self.assertEqual(numbers, list(range(start + 1, start + total + 1)))
+
+
+class PaymentBalanceTests(TestCase):
+    def setUp(self):
+        self.client_obj = Client.objects.create(name="Acme")
+        self.invoice = self.create_invoice()
+
+    def create_invoice(self, **kwargs):
+        invoice = Invoice.objects.create(client=self.client_obj, prepared_by="Tester", **kwargs)
+        invoice.update_totals(subtotal=Decimal("100.00"))  # 116.00 with tax
+        return invoice
+
+    def assertInvoice(self, invoice, amount_paid, balance_due, payment_status):
+        invoice.refresh_from_db()
+        self.assertEqual(
+            (invoice.amount_paid, invoice.balance_due, invoice.payment_status),
+            (Decimal(amount_paid), Decimal(balance_due), payment_status),
+        )
+
+    def test_new_invoice_owes_its_total(self):
+        self.assertInvoice(self.invoice, "0.00", "116.00", "Pending")
+
+    def test_adding_payments_reduces_the_balance_until_paid(self):
+        Payment.objects.create(invoice=self.invoice, amount=Decimal("16.00"))
+        self.assertInvoice(self.invoice, "16.00", "100.00", "Pending")
+        Payment.objects.create(invoice=self.invoice, amount=Decimal("100.00"))
+        self.assertInvoice(self.invoice, "116.00", "0.00", "Paid")
+
+    def test_editing_a_payment_applies_the_difference(self):
+        payment = Payment.objects.create(invoice=self.invoice, amount=Decimal("50.00"))
+        payment.amount = Decimal("116.00")
+        payment.save()
+        self.assertInvoice(self.invoice, "116.00", "0.00", "Paid")
+        payment.amount = Decimal("20.00")
+        payment.save()
+        self.assertInvoice(self.invoice, "20.00", "96.00", "Pending")
+
+    def test_moving_a_payment_to_another_invoice(self):
+        other = self.create_invoice()
+        payment = Payment.objects.create(invoice=self.invoice, amount=Decimal("116.00"))
+        payment.invoice = other
+        payment.save()
+        self.assertInvoice(self.invoice, "0.00", "116.00", "Pending")
+        self.assertInvoice(other, "116.00", "0.00", "Paid")
+
+    def test_deleting_a_payment_restores_the_balance(self):
+        payment = Payment.objects.create(invoice=self.invoice, amount=Decimal("116.00"))
+        payment.delete()
+        self.assertInvoice(self.invoice, "0.00", "116.00", "Pending")
+
+    def test_deleting_a_payment_past_the_due_date_makes_the_invoice_overdue(self):
+        invoice = self.create_invoice(due_date=timezone.localdate() - timedelta(days=1))
+        payment = Payment.objects.create(invoice=invoice, amount=Decimal("116.00"))
+        self.assertInvoice(invoice, "116.00", "0.00", "Paid")
+        payment.delete()
+        self.assertInvoice(invoice, "0.00", "116.00", "Overdue")
+
+    def test_recorded_receipts_for_the_same_invoice_add_up(self):
+        receipts = parse_receipts(
+            f"{self.invoice.invoice_number}, 16.00, , R1\n{self.invoice.invoice_number.lower()}, 100, , R2",
+            timezone.localdate(),
+        )
+        record_payments(receipts, "Bank Transfer")
+        self.assertEqual(self.invoice.payments.count(), 2)
+        self.assertInvoice(self.invoice, "116.00", "0.00", "Paid")
+
+    def test_duplicate_receipt_references_are_rejected(self):
+        Payment.objects.create(invoice=self.invoice, amount=Decimal("10.00"), reference="R1")
+        number = self.invoice.invoice_number
+        with self.assertRaisesMessage(ReceiptError, "Line 1: reference R1 has already been recorded."):
+            parse_receipts(f"{number}, 5, , R1", timezone.localdate())
+        with self.assertRaisesMessage(ReceiptError, "Line 2: reference R2 has already been recorded."):
+            parse_receipts(f"{number}, 5, , R2\n{number}, 5, , R2", timezone.localdate())
+        self.assertInvoice(self.invoice, "10.00", "106.00", "Pending")
@@ -7,13 +7,23 @@ urlpatterns = [
     # ---------------- Clients ----------------
     path('clients/', views.client_list, name='client_list'),
     path('clients/create/', views.client_create, name='client_create'),
+    path('clients/lookup/', views.client_lookup, name='client_lookup'),
     path('clients/<int:pk>/edit/', views.client_edit, name='client_edit'),
     path('clients/<int:pk>/delete/', views.client_delete, name='client_delete'),
+    path('clients/<int:pk>/statement/', views.client_statement, name='client_statement'),
+
+    # ---------------- Products (line items) ----------------
+    path('products/lookup/', views.product_lookup, name='product_lookup'),
+    path('products/barcodes/', views.product_barcodes, name='product_barcodes'),
 
     # ---------------- Quotations ----------------
     path('quotations/', views.quotation_list, name='quotation_list'),
     path('quotations/create/', views.quotation_create, name='quotation_create'),
+    path('quotations/bulk/', views.document_bulk_action, {'kind': 'quotation'}, name='quotation_bulk'),
     path('quotations/<int:pk>/', views.quotation_detail, name='quotation_detail'),  # DETAIL
+    path('quotations/<int:pk>/pdf/', views.document_pdf, {'kind': 'quotation'}, name='quotation_pdf'),
+    path('quotations/<int:pk>/chain/', views.document_chain, {'kind': 'quotation'}, name='quotation_chain'),
+    path('quotations/<int:pk>/convert/', views.quotation_convert, name='quotation_convert'),
     path('quotations/<int:pk>/edit/', views.quotation_edit, name='quotation_edit'),
     path('quotations/<int:pk>/delete/', views.quotation_delete, name='quotation_delete'),
     path('quotations/<int:pk>/delete-item/<int:item_id>/', views.quotation_item_delete, name='quotation_item_delete'),
@@ -21,15 +31,33 @@ urlpatterns = [
     # ---------------- Invoices ----------------
     path('invoices/', views.invoice_list, name='invoice_list'),
     path('invoices/create/', views.invoice_create, name='invoice_create'),
+    path('invoices/bulk/', views.document_bulk_action, {'kind': 'invoice'}, name='invoice_bulk'),
+    path('invoices/lookup/', views.invoice_lookup, name='invoice_lookup'),
+    path('invoices/<int:pk>/items/', views.invoice_items, name='invoice_items'),
     path('invoices/<int:pk>/', views.invoice_detail, name='invoice_detail'),  # DETAIL
+    path('invoices/<int:pk>/pdf/', views.document_pdf, {'kind': 'invoice'}, name='invoice_pdf'),
+    path('invoices/<int:pk>/chain/', views.document_chain, {'kind': 'invoice'}, name='invoice_chain'),
+    path('invoices/<int:pk>/convert/', views.invoice_convert, name='invoice_convert'),
     path('invoices/<int:pk>/edit/', views.invoice_edit, name='invoice_edit'),
     path('invoices/<int:pk>/delete/', views.invoice_delete, name='invoice_delete'),
     path('invoices/<int:pk>/delete-item/<int:item_id>/', views.invoice_item_delete, name='invoice_item_delete'),
 
+    path('invoices/<int:pk>/payments/', views.invoice_payments, name='invoice_payments'),
+    path('invoices/<int:pk>/payments/add/', views.payment_create, name='payment_create'),
+
+    # ---------------- Payments ----------------
+    path('payments/import/', views.payment_import, name='payment_import'),
+    path('payments/<int:pk>/delete/', views.payment_delete, name='payment_delete'),
+
     # ---------------- Delivery Notes ----------------
     path('delivery-notes/', views.delivery_note_list, name='delivery_note_list'),
     path('delivery-notes/create/', views.delivery_note_create, name='delivery_note_create'),
+    path('delivery-notes/bulk/', views.document_bulk_action, {'kind': 'delivery_note'}, name='delivery_note_bulk'),
     path('delivery-notes/<int:pk>/', views.delivery_note_detail, name='delivery_note_detail'),  # DETAIL
+    path('delivery-notes/<int:pk>/pdf/', views.document_pdf, {'kind': 'delivery_note'}, name='delivery_note_pdf'),
+    path('delivery-notes/<int:pk>/chain/', views.document_chain, {'kind': 'delivery_note'}, name='delivery_note_chain'),
+    path('delivery-notes/<int:pk>/issue/', views.delivery_note_issue, name='delivery_note_issue'),
+    path('delivery-notes/<int:pk>/convert/', views.delivery_note_convert, name='delivery_note_convert'),
     path('delivery-notes/<int:pk>/edit/', views.delivery_note_edit, name='delivery_note_edit'),
     path('delivery-notes/<int:pk>/delete/', views.delivery_note_delete, name='delivery_note_delete'),
     path('delivery-notes/<int:pk>/delete-item/<int:item_id>/', views.delivery_note_item_delete, name='delivery_note_item_delete'),
@@ -37,8 +65,23 @@ urlpatterns = [
     # ---------------- Credit Notes ----------------
     path('credit-notes/', views.credit_note_list, name='credit_note_list'),
     path('credit-notes/create/', views.credit_note_create, name='credit_note_create'),
+    path('credit-notes/bulk/', views.document_bulk_action, {'kind': 'credit_note'}, name='credit_note_bulk'),
     path('credit-notes/<int:pk>/', views.credit_note_detail, name='credit_note_detail'),  # DETAIL
+    path('credit-notes/<int:pk>/pdf/', views.document_pdf, {'kind': 'credit_note'}, name='credit_note_pdf'),
+    path('credit-notes/<int:pk>/chain/', views.document_chain, {'kind': 'credit_note'}, name='credit_note_chain'),
+    path('credit-notes/<int:pk>/receive/', views.credit_note_receive, name='credit_note_receive'),
     path('credit-notes/<int:pk>/edit/', views.credit_note_edit, name='credit_note_edit'),
     path('credit-notes/<int:pk>/delete/', views.credit_note_delete, name='credit_note_delete'),
     path('credit-notes/<int:pk>/delete-item/<int:item_id>/', views.credit_note_item_delete, name='credit_note_item_delete'),
+
+    # ---------------- Change feed ----------------
+    path('api/changes/<slug:resource>/', views.change_feed, name='change_feed'),
+
+    # ---------------- Search ----------------
+    path('search/', views.document_search, name='document_search'),
+
+    # ---------------- Reports ----------------
+    path('reports/aging/', views.aging_report, name='aging_report'),
+    path('reports/analytics/', views.sales_analytics, name='sales_analytics'),
+    path('reports/analytics/data/', views.sales_analytics_data, name='sales_analytics_data'),
 ]
@@ -1,9 +1,101 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from .decorators import group_required
 from django.contrib import messages
+from django.core.exceptions import ImproperlyConfigured
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import F, ProtectedError, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.utils.dateparse import parse_date
 from decimal import Decimal
-from .models import Client, Quotation, QuotationItem, Invoice, InvoiceItem, DeliveryNote, DeliveryNoteItem, CreditNote, CreditNoteItem
+from . import bulk, changes, conversions, detail, lookups, reports, rollups, search, statements
+from .payments import ReceiptError, parse_receipts, record_payments
+from .posting import StockPostingError, issue_delivery_note, receive_credit_note
+from .pdf import DOCUMENTS, cache_dir, document_filename, render_pdf
+from .line_items import LineItemError, parse_line_items, write_line_items, sync_line_items
+from .models import Client, Quotation, QuotationItem, Invoice, InvoiceItem, Payment, DeliveryNote, DeliveryNoteItem, CreditNote, CreditNoteItem
+
+# -----------------------------
+# DOCUMENT LIST HELPERS
+# -----------------------------
+DOCUMENTS_PER_PAGE = 50
+
+
+def _parse_date(value):
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+def _document_list(request, queryset, number_field):
+    """
+    Filter, sort and paginate a sales document list from the query string.
+
+    Filters map onto the indexed columns: date range, client, payment status
+    and a number prefix. Returns the context shared by the list templates.
+    """
+    params = request.GET
+    sort_fields = {'number': number_field, 'client': 'client__name', 'date': 'date', 'total': 'total'}
+    documents = queryset.select_related('client')
+
+    date_from = _parse_date(params.get('date_from'))
+    date_to = _parse_date(params.get('date_to'))
+    if date_from:
+        documents = documents.filter(date__gte=date_from)
+    if date_to:
+        documents = documents.filter(date__lte=date_to)
+
+    client_id = params.get('client', '')
+    if client_id.isdigit():
+        documents = documents.filter(client_id=client_id)
+
+    payment_status = params.get('payment_status')
+    if payment_status and payment_status in dict(Invoice.PAYMENT_STATUS_CHOICES) and queryset.model is Invoice:
+        documents = documents.filter(payment_status=payment_status)
+
+    number = params.get('number', '').strip().upper()
+    if number:
+        # Numbers are issued upper-case, so a plain prefix match can use the unique index
+        documents = documents.filter(**{f'{number_field}__startswith': number})
+
+    sort = params.get('sort', '')
+    if sort.lstrip('-') in sort_fields:
+        field = sort_fields[sort.lstrip('-')]
+        documents = documents.order_by(f'-{field}' if sort.startswith('-') else field, '-pk')
+    else:
+        sort = ''
+        documents = documents.order_by('-date', '-created_at', '-pk')
+
+    page = Paginator(documents, DOCUMENTS_PER_PAGE).get_page(params.get('page'))
+
+    query = params.copy()
+    query.pop('page', None)
+    query.pop('sort', None)
+    sort_links = {}
+    for key in sort_fields:
+        query['sort'] = f'-{key}' if sort == key else key
+        sort_links[key] = query.urlencode()
+    query.pop('sort')
+    if sort:
+        query['sort'] = sort
+
+    return {
+        'page_obj': page,
+        'query_string': query.urlencode(),
+        'params': params,
+        'sort': sort,
+        'sort_links': sort_links,
+        # The client filter is a typeahead; only the selected client's name is needed
+        'client_filter': Client.objects.filter(pk=client_id).first() if client_id.isdigit() else None,
+    }
+
 
 # -----------------------------
 # CLIENT VIEWS
@@ -11,7 +103,10 @@ from .models import Client, Quotation, QuotationItem, Invoice, InvoiceItem, Deli
 @login_required
 @group_required('Admin', 'Stock Clerk', 'Viewer')
 def client_list(request):
-    clients = Client.objects.all()
+    # Outstanding balances come from the stored invoice balances, not the payment history
+    clients = Client.objects.annotate(
+        balance=Coalesce(Sum('invoice__balance_due', filter=Q(invoice__balance_due__gt=0)), Value(Decimal('0.00')))
+    ).order_by('name')
     return render(request, 'sales/client_list.html', {'clients': clients})
 
 from .models import Client
@@ -24,6 +119,7 @@ def client_create(request):
         location = request.POST.get('location', '').strip()
         po_box = request.POST.get('po_box', '').strip()
         pin = request.POST.get('pin', '').strip()
+        payment_terms = request.POST.get('payment_terms_days', '').strip()
 
         Client.objects.create(
             name=name,
@@ -31,7 +127,8 @@ def client_create(request):
             telephone=telephone,
             location=location,
             po_box=po_box,
-            pin=pin
+            pin=pin,
+            payment_terms_days=int(payment_terms) if payment_terms.isdigit() else 30,
         )
         messages.success(request, "Client created successfully.")
         return redirect('sales:client_list')
@@ -52,6 +149,9 @@ def client_edit(request, pk):
         client.location = request.POST.get('location', '').strip()
         client.po_box = request.POST.get('po_box', '').strip()
         client.pin = request.POST.get('pin', '').strip()
+        payment_terms = request.POST.get('payment_terms_days', '').strip()
+        if payment_terms.isdigit():
+            client.payment_terms_days = int(payment_terms)
         client.save()
         messages.success(request, "Client updated successfully.")
         return redirect('sales:client_list')
@@ -62,7 +162,11 @@ def client_edit(request, pk):
 def client_delete(request, pk):
     client = get_object_or_404(Client, pk=pk)
     if request.method == 'POST':  # Only delete on POST
-        client.delete()
+        try:
+            client.delete()
+        except ProtectedError:
+            messages.error(request, "This client has invoices with payments recorded and cannot be deleted.")
+            return redirect('sales:client_list')
         messages.success(request, "Client deleted successfully.")
         return redirect('sales:client_list')
     
@@ -71,20 +175,52 @@ def client_delete(request, pk):
 
 
 
+@login_required
+@group_required('Admin', 'Stock Clerk', 'Viewer')
+def client_statement(request, pk):
+    """Statement of account for ?from=&to= (default: this year so far) as ?format=html, csv or pdf."""
+    client = get_object_or_404(Client, pk=pk)
+    today = timezone.localdate()
+    start = _parse_date(request.GET.get('from')) or today.replace(month=1, day=1)
+    end = _parse_date(request.GET.get('to')) or today
+    output = request.GET.get('format')
+    statement = statements.Statement(client, start, end)
+
+    if output == 'csv':
+        response = StreamingHttpResponse(statements.csv_rows(statement), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{statement.filename("csv")}"'
+        return response
+    if output == 'pdf':
+        path = cache_dir() / 'statements' / statement.filename('pdf')
+        try:
+            statements.write_pdf(statement, path)
+        except ImproperlyConfigured as e:
+            messages.error(request, str(e))
+            return redirect('sales:client_list')
+        return FileResponse(open(path, 'rb'), content_type='application/pdf', filename=path.name)
+    return StreamingHttpResponse(statements.html_chunks(statement))
+
+
 # -----------------------------
 # QUOTATION VIEWS
 # -----------------------------
 @login_required
 @group_required('Admin', 'Stock Clerk', 'Viewer')
 def quotation_list(request):
-    quotations = Quotation.objects.all()
-    return render(request, 'sales/quotation_list.html', {'quotations': quotations})
+    status = request.GET.get('status')
+    if status in dict(Quotation.STATUS_CHOICES):
+        quotations = Quotation.with_status(status)
+    else:
+        quotations = Quotation.objects.all()
+    context = _document_list(request, quotations, 'quotation_number')
+    context['quotations'] = context['page_obj']
+    context['quotation_statuses'] = Quotation.STATUS_CHOICES
+    context['today'] = timezone.localdate()
+    return render(request, 'sales/quotation_list.html', context)
 
 @login_required
 @group_required('Admin', 'Stock Clerk')
 def quotation_create(request):
-    clients = Client.objects.all()
-
     if request.method == 'POST':
         client_id = request.POST.get('client')
         prepared_by = request.POST.get('prepared_by', '').strip()
@@ -92,92 +228,53 @@ def quotation_create(request):
 
         if not client_id:
             messages.error(request, "Please select a client.")
-            return render(request, 'sales/quotation_form.html', {'clients': clients})
+            return render(request, 'sales/quotation_form.html', {})
 
         client = get_object_or_404(Client, id=client_id)
 
-        quotation = Quotation.objects.create(
-            client=client,
-            prepared_by=prepared_by,
-            validity_period=int(validity_period) if validity_period else 14
-        )
-
-        designations = request.POST.getlist('designation')
-        descriptions = request.POST.getlist('description')
-        quantities = request.POST.getlist('quantity')
-        unit_prices = request.POST.getlist('unit_price')
-        brands = request.POST.getlist('brand')  # NEW
-
-        total_subtotal = Decimal('0.00')
-
-        for desig, desc, qty, price, brand in zip(designations, descriptions, quantities, unit_prices, brands):
-            if desc.strip() == "":
-                continue
-            qty_int = int(qty)
-            price_dec = Decimal(price)
-            QuotationItem.objects.create(
-                quotation=quotation,
-                designation=desig,
-                description=desc,
-                quantity=qty_int,
-                unit_price=price_dec,
-                brand=brand  # NEW
+        try:
+            rows = parse_line_items(request.POST)
+        except LineItemError as e:
+            messages.error(request, str(e))
+            return render(request, 'sales/quotation_form.html', {})
+
+        with transaction.atomic():
+            quotation = Quotation.objects.create(
+                client=client,
+                prepared_by=prepared_by,
+                validity_period=int(validity_period) if validity_period else 14
             )
-            total_subtotal += qty_int * price_dec
-
-        quotation.subtotal = total_subtotal
-        quotation.tax = total_subtotal * Decimal('0.16')
-        quotation.total = quotation.subtotal + quotation.tax
-        quotation.save()
+            write_line_items(quotation, rows)
 
         messages.success(request, "Quotation created successfully.")
         return redirect('sales:quotation_list')
 
-    return render(request, 'sales/quotation_form.html', {'clients': clients})
+    return render(request, 'sales/quotation_form.html', {})
 
 
 @login_required
 @group_required('Admin', 'Stock Clerk')
 def quotation_edit(request, pk):
-    quotation = get_object_or_404(Quotation, pk=pk)
-    clients = Client.objects.all()
+    quotation = get_object_or_404(Quotation.objects.select_related('client'), pk=pk)
 
     if request.method == 'POST':
         quotation.client = get_object_or_404(Client, pk=request.POST.get('client'))
         quotation.prepared_by = request.POST.get('prepared_by', '').strip()
-        quotation.items.all().delete()
-
-        designations = request.POST.getlist('designation')
-        descriptions = request.POST.getlist('description')
-        quantities = request.POST.getlist('quantity')
-        unit_prices = request.POST.getlist('unit_price')
-        brands = request.POST.getlist('brand')  # NEW
-
-        total_subtotal = Decimal('0.00')
-
-        for desig, desc, qty, price, brand in zip(designations, descriptions, quantities, unit_prices, brands):
-            if desc.strip():
-                qty_int = int(qty)
-                price_dec = Decimal(price)
-                QuotationItem.objects.create(
-                    quotation=quotation,
-                    designation=desig,
-                    description=desc,
-                    quantity=qty_int,
-                    unit_price=price_dec,
-                    brand=brand  # NEW
-                )
-                total_subtotal += qty_int * price_dec
-
-        quotation.subtotal = total_subtotal
-        quotation.tax = total_subtotal * Decimal('0.16')
-        quotation.total = quotation.subtotal + quotation.tax
-        quotation.save()
+
+        try:
+            rows = parse_line_items(request.POST)
+        except LineItemError as e:
+            messages.error(request, str(e))
+            return render(request, 'sales/quotation_form.html', {'quotation': quotation, 'items': quotation.items.select_related('product')})
+
+        with transaction.atomic():
+            quotation.save()
+            sync_line_items(quotation, rows)
 
         messages.success(request, "Quotation updated successfully.")
         return redirect('sales:quotation_list')
 
-    return render(request, 'sales/quotation_form.html', {'quotation': quotation, 'clients': clients})
+    return render(request, 'sales/quotation_form.html', {'quotation': quotation, 'items': quotation.items.select_related('product')})
 
 
 @login_required
@@ -204,34 +301,7 @@ def quotation_item_delete(request, pk, item_id):
 @login_required
 @group_required('Admin', 'Stock Clerk', 'Viewer')
 def quotation_detail(request, pk):
-    quotation = get_object_or_404(Quotation, pk=pk)
-    items = quotation.items.all()
-
-    # Calculate amounts for each item and include brand
-    item_amounts = []
-    for item in items:
-        item_amounts.append({
-            'designation': item.designation,
-            'description': item.description,
-            'brand': item.brand,  # <--- Add this
-            'quantity': item.quantity,
-            'unit_price': item.unit_price,
-            'amount': item.quantity * item.unit_price
-        })
-
-    # Totals
-    subtotal = sum(i['amount'] for i in item_amounts)
-    tax = quotation.tax if quotation.tax else 0
-    total = subtotal + tax
-
-    context = {
-        'quotation': quotation,
-        'item_amounts': item_amounts,
-        'subtotal': subtotal,
-        'tax': tax,
-        'total': total
-    }
-    return render(request, 'sales/quotation_detail.html', context)
+    return detail.document_page(request, 'quotation', pk)
 
 # -----------------------------
 # INVOICE VIEWS
@@ -239,78 +309,59 @@ def quotation_detail(request, pk):
 @login_required
 @group_required('Admin', 'Stock Clerk', 'Viewer')
 def invoice_list(request):
-    invoices = Invoice.objects.all()
-    return render(request, 'sales/invoice_list.html', {'invoices': invoices})
+    context = _document_list(request, Invoice.objects.all(), 'invoice_number')
+    context['invoices'] = context['page_obj']
+    context['payment_statuses'] = Invoice.PAYMENT_STATUS_CHOICES
+    return render(request, 'sales/invoice_list.html', context)
 
 @login_required
 @group_required('Admin', 'Stock Clerk')
 def invoice_create(request):
-    clients = Client.objects.all()
     if request.method == 'POST':
         client = get_object_or_404(Client, pk=request.POST.get('client'))
         order_number = request.POST.get('order_number', '').strip()  # NEW
 
-        invoice = Invoice.objects.create(
-            client=client,
-            prepared_by=request.POST.get('prepared_by', '').strip(),
-            order_number=order_number  # NEW
-        )
+        try:
+            rows = parse_line_items(request.POST)
+        except LineItemError as e:
+            messages.error(request, str(e))
+            return render(request, 'sales/invoice_form.html', {})
+
+        with transaction.atomic():
+            invoice = Invoice.objects.create(
+                client=client,
+                prepared_by=request.POST.get('prepared_by', '').strip(),
+                order_number=order_number  # NEW
+            )
+            write_line_items(invoice, rows)
 
-        descriptions = request.POST.getlist('description')
-        quantities = request.POST.getlist('quantity')
-        unit_prices = request.POST.getlist('unit_price')
-        designations = request.POST.getlist('designation')
-        brands = request.POST.getlist('brand')  # NEW
-
-        for desc, qty, price, desig, brand in zip(descriptions, quantities, unit_prices, designations, brands):
-            if desc.strip():
-                InvoiceItem.objects.create(
-                    invoice=invoice,
-                    description=desc,
-                    quantity=int(qty),
-                    unit_price=float(price),
-                    designation=desig,
-                    brand=brand  # NEW
-                )
-
-        invoice.save()
         messages.success(request, "Invoice created successfully.")
         return redirect('sales:invoice_list')
 
-    return render(request, 'sales/invoice_form.html', {'clients': clients})
-
+    return render(request, 'sales/invoice_form.html', {})
 @login_required
 @group_required('Admin', 'Stock Clerk')
 def invoice_edit(request, pk):
-    invoice = get_object_or_404(Invoice, pk=pk)
-    clients = Client.objects.all()
+    invoice = get_object_or_404(Invoice.objects.select_related('client'), pk=pk)
     if request.method == 'POST':
         invoice.client = get_object_or_404(Client, pk=request.POST.get('client'))
         invoice.order_number = request.POST.get('order_number', '').strip()  # NEW
-        invoice.items.all().delete()
-
-        descriptions = request.POST.getlist('description')
-        quantities = request.POST.getlist('quantity')
-        unit_prices = request.POST.getlist('unit_price')
-        designations = request.POST.getlist('designation')
-        brands = request.POST.getlist('brand')  # NEW
-
-        for desc, qty, price, desig, brand in zip(descriptions, quantities, unit_prices, designations, brands):
-            if desc.strip():
-                InvoiceItem.objects.create(
-                    invoice=invoice,
-                    description=desc,
-                    quantity=int(qty),
-                    unit_price=float(price),
-                    designation=desig,
-                    brand=brand  # NEW
-                )
-
-        invoice.save()
+
+        try:
+            rows = parse_line_items(request.POST)
+        except LineItemError as e:
+            messages.error(request, str(e))
+            return render(request, 'sales/invoice_form.html', {'invoice': invoice, 'items': invoice.items.select_related('product')})
+
+        with transaction.atomic():
+            # Only the edited columns: the paid amount and balance are maintained by the payments
+            invoice.save(update_fields=['client', 'order_number', 'updated_at'])
+            sync_line_items(invoice, rows)
+
         messages.success(request, "Invoice updated successfully.")
         return redirect('sales:invoice_list')
 
-    return render(request, 'sales/invoice_form.html', {'invoice': invoice, 'clients': clients})
+    return render(request, 'sales/invoice_form.html', {'invoice': invoice, 'items': invoice.items.select_related('product')})
 
 
 
@@ -318,6 +369,9 @@ def invoice_edit(request, pk):
 @group_required('Admin', 'Stock Clerk')
 def invoice_delete(request, pk):
     invoice = get_object_or_404(Invoice, pk=pk)
+    if invoice.payments.exists():
+        messages.error(request, "This invoice has payments recorded against it and can no longer be deleted.")
+        return redirect('sales:invoice_list')
     if request.method == 'POST':
         invoice.delete()
         messages.success(request, "Invoice deleted successfully.")
@@ -337,9 +391,131 @@ def invoice_item_delete(request, pk, item_id):
 @login_required
 @group_required('Admin', 'Stock Clerk', 'Viewer')
 def invoice_detail(request, pk):
+    return detail.document_page(request, 'invoice', pk)
+
+# -----------------------------
+# LOOKUPS
+# -----------------------------
+@login_required
+@group_required('Admin', 'Stock Clerk', 'Viewer')
+@cache_control(private=True, max_age=lookups.LOOKUP_CACHE_SECONDS)
+def client_lookup(request):
+    return JsonResponse({'results': lookups.search_clients(request.GET.get('q', ''))})
+
+
+@login_required
+@group_required('Admin', 'Stock Clerk', 'Viewer')
+@cache_control(private=True, max_age=lookups.LOOKUP_CACHE_SECONDS)
+def invoice_lookup(request):
+    client_id = request.GET.get('client', '')
+    results = lookups.search_invoices(request.GET.get('q', ''), int(client_id) if client_id.isdigit() else None)
+    return JsonResponse({'results': results})
+
+
+@login_required
+@group_required('Admin', 'Stock Clerk', 'Viewer')
+def invoice_items(request, pk):
+    """Lines of one invoice, fetched by the credit note form when an invoice is picked."""
     invoice = get_object_or_404(Invoice, pk=pk)
-    items = invoice.items.all()
-    return render(request, 'sales/invoice_detail.html', {'invoice': invoice, 'items': items})
+    items = invoice.items.order_by('item_number').values(
+        'designation', 'description', 'brand', 'quantity', 'unit_price', barcode=F('product__barcode'),
+    )
+    return JsonResponse({'items': list(items)})
+
+
+@login_required
+@group_required('Admin', 'Stock Clerk', 'Viewer')
+def product_lookup(request):
+    return JsonResponse({'results': lookups.search_products(request.GET.get('q', ''))})
+
+
+@login_required
+@group_required('Admin', 'Stock Clerk')
+@require_POST
+def product_barcodes(request):
+    """Line items for a pasted list of barcodes."""
+    results, missing = lookups.products_for_barcodes(request.POST.get('barcodes', ''))
+    return JsonResponse({'results': results, 'missing': missing})
+
+
+# -----------------------------
+# PAYMENT VIEWS
+# -----------------------------
+@login_required
+@group_required('Admin', 'Stock Clerk', 'Viewer')
+def invoice_payments(request, pk):
+    invoice = get_object_or_404(Invoice.objects.select_related('client'), pk=pk)
+    return render(request, 'sales/invoice_payments.html', {
+        'invoice': invoice,
+        'payments': invoice.payments.all(),
+        'methods': Payment.METHOD_CHOICES,
+        'today': timezone.localdate(),
+    })
+
+
+@login_required
+@group_required('Admin', 'Stock Clerk')
+@require_POST
+def payment_create(request, pk):
+    invoice = get_object_or_404(Invoice, pk=pk)
+    try:
+        amount = Decimal(request.POST.get('amount', ''))
+    except ArithmeticError:
+        amount = None
+    if amount is None or not amount.is_finite() or amount <= 0:
+        messages.error(request, "Enter a positive payment amount.")
+        return redirect('sales:invoice_payments', pk=pk)
+
+    method = request.POST.get('method')
+    Payment.objects.create(
+        invoice=invoice,
+        amount=amount.quantize(Decimal('0.01')),
+        date=_parse_date(request.POST.get('date')) or timezone.localdate(),
+        method=method if method in dict(Payment.METHOD_CHOICES) else 'Bank Transfer',
+        reference=request.POST.get('reference', '').strip() or None,
+        recorded_by=request.user.get_username(),
+    )
+    messages.success(request, "Payment recorded.")
+    return redirect('sales:invoice_payments', pk=pk)
+
+
+@login_required
+@group_required('Admin', 'Stock Clerk')
+@require_POST
+def payment_delete(request, pk):
+    payment = get_object_or_404(Payment, pk=pk)
+    payment.delete()
+    messages.success(request, "Payment removed.")
+    return redirect('sales:invoice_payments', pk=payment.invoice_id)
+
+
+@login_required
+@group_required('Admin', 'Stock Clerk')
+def payment_import(request):
+    """Record a pasted batch of bank-statement lines in one go."""
+    context = {'methods': Payment.METHOD_CHOICES, 'today': timezone.localdate()}
+    if request.method == 'POST':
+        text = request.POST.get('receipts', '')
+        method = request.POST.get('method')
+        context.update(text=text, method=method)
+        try:
+            receipts = parse_receipts(text, _parse_date(request.POST.get('date')) or timezone.localdate())
+        except ReceiptError as e:
+            messages.error(request, str(e))
+            return render(request, 'sales/payment_import.html', context)
+        if not receipts:
+            messages.error(request, "Paste at least one receipt line.")
+            return render(request, 'sales/payment_import.html', context)
+
+        payments = record_payments(
+            receipts,
+            method if method in dict(Payment.METHOD_CHOICES) else 'Bank Transfer',
+            request.user.get_username(),
+        )
+        messages.success(request, f"Recorded {len(payments)} payments.")
+        return redirect('sales:invoice_list')
+
+    return render(request, 'sales/payment_import.html', context)
 
 # -----------------------------
 # DELIVERY NOTE VIEWS
@@ -347,69 +523,44 @@ def invoice_detail(request, pk):
 @login_required
 @group_required('Admin', 'Stock Clerk', 'Viewer')
 def delivery_note_list(request):
-    notes = DeliveryNote.objects.all()
-    return render(request, 'sales/delivery_note_list.html', {'notes': notes})
+    context = _document_list(request, DeliveryNote.objects.select_related('invoice'), 'delivery_note_number')
+    context['notes'] = context['page_obj']
+    return render(request, 'sales/delivery_note_list.html', context)
 
 @login_required
 @group_required('Admin', 'Stock Clerk')
 def delivery_note_create(request):
-    clients = Client.objects.all()
-    invoices = Invoice.objects.all()
 
     if request.method == 'POST':
         client = get_object_or_404(Client, pk=request.POST.get('client'))
         invoice_id = request.POST.get('invoice')
         invoice = get_object_or_404(Invoice, pk=invoice_id) if invoice_id else None
 
-        note = DeliveryNote.objects.create(
-            client=client,
-            invoice=invoice,
-            order_number=invoice.order_number if invoice else request.POST.get('order_number', '')
-        )
-
-        items = zip(
-            request.POST.getlist('designation'),
-            request.POST.getlist('description'),
-            request.POST.getlist('quantity'),
-            request.POST.getlist('unit_price'),
-            request.POST.getlist('brand')
-        )
-
-        total_subtotal = 0
-        for desig, desc, qty, price, brand in items:
-            if desc.strip():
-                qty_int = int(qty) if qty else 0
-                price_float = float(price) if price else 0
-                DeliveryNoteItem.objects.create(
-                    delivery_note=note,
-                    designation=desig,
-                    description=desc,
-                    quantity=qty_int,
-                    unit_price=price_float,
-                    brand=brand
-                )
-                total_subtotal += qty_int * price_float
-
-        # Save totals
-        note.subtotal = total_subtotal
-        note.tax = total_subtotal * 0.16  # 16% tax
-        note.total = note.subtotal + note.tax
-        note.save()
+        try:
+            rows = parse_line_items(request.POST)
+        except LineItemError as e:
+            messages.error(request, str(e))
+            return render(request, 'sales/delivery_note_form.html', {})
+
+        with transaction.atomic():
+            note = DeliveryNote.objects.create(
+                client=client,
+                invoice=invoice,
+                order_number=invoice.order_number if invoice else request.POST.get('order_number', '')
+            )
+            write_line_items(note, rows)
 
         messages.success(request, "Delivery Note created successfully.")
         return redirect('sales:delivery_note_list')
 
-    return render(request, 'sales/delivery_note_form.html', {
-        'clients': clients,
-        'invoices': invoices
-    })
-
+    return render(request, 'sales/delivery_note_form.html', {})
 @login_required
 @group_required('Admin', 'Stock Clerk')
 def delivery_note_edit(request, pk):
-    note = get_object_or_404(DeliveryNote, pk=pk)
-    clients = Client.objects.all()
-    invoices = Invoice.objects.all()
+    note = get_object_or_404(DeliveryNote.objects.select_related('client', 'invoice'), pk=pk)
+    if note.stock_posted_at:
+        messages.error(request, "This delivery note has been issued from stock and can no longer be changed.")
+        return redirect('sales:delivery_note_list')
 
     if request.method == 'POST':
         note.client = get_object_or_404(Client, pk=request.POST.get('client'))
@@ -422,44 +573,22 @@ def delivery_note_edit(request, pk):
         else:
             note.order_number = request.POST.get('order_number', '')
 
-        note.items.all().delete()
+        try:
+            rows = parse_line_items(request.POST)
+        except LineItemError as e:
+            messages.error(request, str(e))
+            return render(request, 'sales/delivery_note_form.html', {'note': note, 'items': note.items.select_related('product')})
 
-        items = zip(
-            request.POST.getlist('designation'),
-            request.POST.getlist('description'),
-            request.POST.getlist('quantity'),
-            request.POST.getlist('unit_price'),
-            request.POST.getlist('brand')
-        )
-
-        total_subtotal = 0
-        for desig, desc, qty, price, brand in items:
-            if desc.strip():
-                qty_int = int(qty) if qty else 0
-                price_float = float(price) if price else 0
-                DeliveryNoteItem.objects.create(
-                    delivery_note=note,
-                    designation=desig,
-                    description=desc,
-                    quantity=qty_int,
-                    unit_price=price_float,
-                    brand=brand
-                )
-                total_subtotal += qty_int * price_float
-
-        # Save totals
-        note.subtotal = total_subtotal
-        note.tax = total_subtotal * 0.16
-        note.total = note.subtotal + note.tax
-        note.save()
+        with transaction.atomic():
+            note.save()
+            sync_line_items(note, rows)
 
         messages.success(request, "Delivery Note updated successfully.")
         return redirect('sales:delivery_note_list')
 
     return render(request, 'sales/delivery_note_form.html', {
         'note': note,
-        'clients': clients,
-        'invoices': invoices
+        'items': note.items.select_related('product')
     })
 
 
@@ -467,6 +596,9 @@ def delivery_note_edit(request, pk):
 @group_required('Admin', 'Stock Clerk')
 def delivery_note_delete(request, pk):
     note = get_object_or_404(DeliveryNote, pk=pk)
+    if note.stock_posted_at:
+        messages.error(request, "This delivery note has been issued from stock and can no longer be changed.")
+        return redirect('sales:delivery_note_list')
     if request.method == 'POST':
         note.delete()
         messages.success(request, "Delivery Note deleted successfully.")
@@ -477,6 +609,9 @@ def delivery_note_delete(request, pk):
 @group_required('Admin', 'Stock Clerk')
 def delivery_note_item_delete(request, pk, item_id):
     note = get_object_or_404(DeliveryNote, pk=pk)
+    if note.stock_posted_at:
+        messages.error(request, "This delivery note has been issued from stock and can no longer be changed.")
+        return redirect('sales:delivery_note_list')
     item = get_object_or_404(DeliveryNoteItem, pk=item_id, delivery_note=note)
     item.delete()
     messages.success(request, "Delivery Note item deleted successfully.")
@@ -486,9 +621,7 @@ def delivery_note_item_delete(request, pk, item_id):
 @login_required
 @group_required('Admin', 'Stock Clerk', 'Viewer')
 def delivery_note_detail(request, pk):
-    delivery_note = get_object_or_404(DeliveryNote, pk=pk)
-    items = delivery_note.items.all()
-    return render(request, 'sales/delivery_note_detail.html', {'delivery_note': delivery_note, 'items': items})
+    return detail.document_page(request, 'delivery_note', pk)
 
 
 # -----------------------------
@@ -497,70 +630,49 @@ def delivery_note_detail(request, pk):
 @login_required
 @group_required('Admin', 'Stock Clerk', 'Viewer')
 def credit_note_list(request):
-    credit_notes = CreditNote.objects.all()
-    return render(request, 'sales/credit_note_list.html', {'credit_notes': credit_notes})
+    context = _document_list(request, CreditNote.objects.select_related('invoice'), 'credit_note_number')
+    context['credit_notes'] = context['page_obj']
+    return render(request, 'sales/credit_note_list.html', context)
 
 
 @login_required
 @group_required('Admin', 'Stock Clerk')
 def credit_note_create(request):
-    clients = Client.objects.all()
-    invoices = Invoice.objects.all()  # Pass all invoices for dropdown
 
     if request.method == 'POST':
         client = get_object_or_404(Client, pk=request.POST.get('client'))
         invoice_id = request.POST.get('invoice')
         invoice = Invoice.objects.filter(pk=invoice_id).first() if invoice_id else None
 
-        # Step 1: Create CreditNote (empty totals at first)
-        credit_note = CreditNote.objects.create(
-            client=client,
-            prepared_by=request.POST.get('prepared_by', '').strip(),
-            order_number=invoice.order_number if invoice else request.POST.get('order_number', '').strip(),
-            invoice=invoice
-        )
-
-        # Step 2: Create items
-        descriptions = request.POST.getlist('description')
-        quantities = request.POST.getlist('quantity')
-        unit_prices = request.POST.getlist('unit_price')
-        designations = request.POST.getlist('designation')
-        brands = request.POST.getlist('brand')
-
-        for desc, qty, price, desig, brand in zip(descriptions, quantities, unit_prices, designations, brands):
-            if desc.strip():
-                CreditNoteItem.objects.create(
-                    credit_note=credit_note,
-                    description=desc,
-                    quantity=int(qty),
-                    unit_price=float(price),
-                    designation=desig,
-                    brand=brand
-                )
-
-        # Step 3: Recalculate totals now that items exist
-        subtotal = sum(item.amount for item in credit_note.items.all())
-        credit_note.subtotal = subtotal
-        credit_note.tax = subtotal * Decimal('0.16')
-        credit_note.total = credit_note.subtotal + credit_note.tax
-        credit_note.save()
+        try:
+            rows = parse_line_items(request.POST)
+        except LineItemError as e:
+            messages.error(request, str(e))
+            return render(request, 'sales/credit_note_form.html', {})
+
+        with transaction.atomic():
+            credit_note = CreditNote.objects.create(
+                client=client,
+                prepared_by=request.POST.get('prepared_by', '').strip(),
+                order_number=invoice.order_number if invoice else request.POST.get('order_number', '').strip(),
+                invoice=invoice
+            )
+            write_line_items(credit_note, rows)
 
         messages.success(request, "Credit Note created successfully.")
         return redirect('sales:credit_note_list')
 
-    return render(request, 'sales/credit_note_form.html', {
-        'clients': clients,
-        'invoices': invoices
-    })
+    return render(request, 'sales/credit_note_form.html', {})
 
 
 
 @login_required
 @group_required('Admin', 'Stock Clerk')
 def credit_note_edit(request, pk):
-    credit_note = get_object_or_404(CreditNote, pk=pk)
-    clients = Client.objects.all()
-    invoices = Invoice.objects.all()  # Pass invoices for dropdown
+    credit_note = get_object_or_404(CreditNote.objects.select_related('client', 'invoice'), pk=pk)
+    if credit_note.stock_posted_at:
+        messages.error(request, "This credit note has been booked back into stock and can no longer be changed.")
+        return redirect('sales:credit_note_list')
 
     if request.method == 'POST':
         credit_note.client = get_object_or_404(Client, pk=request.POST.get('client'))
@@ -570,33 +682,22 @@ def credit_note_edit(request, pk):
         credit_note.order_number = invoice.order_number if invoice else request.POST.get('order_number', '').strip()
         credit_note.invoice = invoice  # Update ForeignKey properly
 
-        # Delete old items and recreate
-        credit_note.items.all().delete()
-        descriptions = request.POST.getlist('description')
-        quantities = request.POST.getlist('quantity')
-        unit_prices = request.POST.getlist('unit_price')
-        designations = request.POST.getlist('designation')
-        brands = request.POST.getlist('brand')
-
-        for desc, qty, price, desig, brand in zip(descriptions, quantities, unit_prices, designations, brands):
-            if desc.strip():
-                CreditNoteItem.objects.create(
-                    credit_note=credit_note,
-                    description=desc,
-                    quantity=int(qty),
-                    unit_price=float(price),
-                    designation=desig,
-                    brand=brand
-                )
-
-        credit_note.save()
+        try:
+            rows = parse_line_items(request.POST)
+        except LineItemError as e:
+            messages.error(request, str(e))
+            return render(request, 'sales/credit_note_form.html', {'credit_note': credit_note, 'items': credit_note.items.select_related('product')})
+
+        with transaction.atomic():
+            credit_note.save()
+            sync_line_items(credit_note, rows)
+
         messages.success(request, "Credit Note updated successfully.")
         return redirect('sales:credit_note_list')
 
     return render(request, 'sales/credit_note_form.html', {
         'credit_note': credit_note,
-        'clients': clients,
-        'invoices': invoices
+        'items': credit_note.items.select_related('product')
     })
 
 
@@ -605,6 +706,9 @@ def credit_note_edit(request, pk):
 @group_required('Admin', 'Stock Clerk')
 def credit_note_delete(request, pk):
     credit_note = get_object_or_404(CreditNote, pk=pk)
+    if credit_note.stock_posted_at:
+        messages.error(request, "This credit note has been booked back into stock and can no longer be changed.")
+        return redirect('sales:credit_note_list')
     if request.method == 'POST':
         credit_note.delete()
         messages.success(request, "Credit Note deleted successfully.")
@@ -616,6 +720,9 @@ def credit_note_delete(request, pk):
 @group_required('Admin', 'Stock Clerk')
 def credit_note_item_delete(request, pk, item_id):
     credit_note = get_object_or_404(CreditNote, pk=pk)
+    if credit_note.stock_posted_at:
+        messages.error(request, "This credit note has been booked back into stock and can no longer be changed.")
+        return redirect('sales:credit_note_list')
     item = get_object_or_404(CreditNoteItem, pk=item_id, credit_note=credit_note)
     item.delete()
     messages.success(request, "Credit Note item deleted successfully.")
@@ -625,8 +732,261 @@ def credit_note_item_delete(request, pk, item_id):
 @login_required
 @group_required('Admin', 'Stock Clerk', 'Viewer')
 def credit_note_detail(request, pk):
+    return detail.document_page(request, 'credit_note', pk)
+
+
+# -----------------------------
+# PDF DOWNLOADS
+# -----------------------------
+@login_required
+@group_required('Admin', 'Stock Clerk', 'Viewer')
+def document_pdf(request, kind, pk):
+    document = get_object_or_404(DOCUMENTS[kind][0].objects.select_related('client'), pk=pk)
+    try:
+        path, _ = render_pdf(kind, document)
+    except ImproperlyConfigured as e:
+        messages.error(request, str(e))
+        return redirect(f'sales:{kind}_list')
+    return FileResponse(open(path, 'rb'), content_type='application/pdf', filename=document_filename(kind, document))
+
+
+# -----------------------------
+# BULK ACTIONS
+# -----------------------------
+BULK_ACTIONS = {
+    'quotation': ('export', 'delete'),
+    'invoice': ('mark_paid', 'mark_overdue', 'export', 'delete'),
+    'delivery_note': ('export', 'delete'),
+    'credit_note': ('export', 'delete'),
+}
+
+
+@login_required
+@group_required('Admin', 'Stock Clerk')
+@require_POST
+def document_bulk_action(request, kind):
+    """Apply one action to every document ticked on a list page."""
+    model = DOCUMENTS[kind][0]
+    action = request.POST.get('action')
+    if action not in BULK_ACTIONS[kind]:
+        raise Http404("Unknown bulk action.")
+
+    next_url = request.POST.get('next')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = f'sales:{kind}_list'
+    ids = [value for value in request.POST.getlist('selected') if value.isdigit()]
+    if not ids:
+        messages.error(request, "Select at least one document first.")
+        return redirect(next_url)
+
+    if action == 'export':
+        response = StreamingHttpResponse(bulk.export_csv_rows(kind, model, ids), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{kind}s-{timezone.localdate():%Y%m%d}.csv"'
+        return response
+
+    label = model._meta.verbose_name
+    if action == 'mark_paid':
+        count = bulk.mark_paid(ids, recorded_by=request.user.get_username())
+        messages.success(request, f"Marked {count} of {len(ids)} selected invoices as paid.")
+    elif action == 'mark_overdue':
+        count = bulk.mark_overdue(ids)
+        messages.success(request, f"Marked {count} of {len(ids)} selected invoices as overdue.")
+    else:
+        count, skipped = bulk.delete_documents(model, ids)
+        messages.success(request, f"Deleted {count} {label}s.")
+        if skipped:
+            reason = "with payments recorded" if model is Invoice else "already posted to stock"
+            messages.warning(request, f"Skipped {skipped} {reason}.")
+    return redirect(next_url)
+
+
+# -----------------------------
+# DOCUMENT CONVERSIONS
+# -----------------------------
+@login_required
+@group_required('Admin', 'Stock Clerk')
+@require_POST
+def quotation_convert(request, pk):
+    get_object_or_404(Quotation, pk=pk)
+    invoice, created = conversions.quotation_to_invoice(pk)
+    if created:
+        messages.success(request, f"Invoice {invoice.invoice_number} created from the quotation.")
+    else:
+        messages.info(request, f"This quotation was already converted to invoice {invoice.invoice_number}.")
+    return redirect('sales:invoice_edit', pk=invoice.pk)
+
+
+@login_required
+@group_required('Admin', 'Stock Clerk')
+@require_POST
+def invoice_convert(request, pk):
+    get_object_or_404(Invoice, pk=pk)
+    note, created = conversions.invoice_to_delivery_note(pk)
+    if created:
+        messages.success(request, f"Delivery note {note.delivery_note_number} created from the invoice.")
+    else:
+        messages.info(request, f"This invoice is already on delivery note {note.delivery_note_number}.")
+    return redirect('sales:delivery_note_edit', pk=note.pk)
+
+
+@login_required
+@group_required('Admin', 'Stock Clerk')
+@require_POST
+def delivery_note_convert(request, pk):
+    get_object_or_404(DeliveryNote, pk=pk)
+    prepared_by = request.user.get_full_name() or request.user.username
+    credit_note, created = conversions.delivery_note_to_credit_note(pk, prepared_by)
+    if created:
+        messages.success(request, f"Credit note {credit_note.credit_note_number} created from the delivery note.")
+    else:
+        messages.info(request, f"This delivery note was already credited on {credit_note.credit_note_number}.")
+    return redirect('sales:credit_note_edit', pk=credit_note.pk)
+
+
+@login_required
+@group_required('Admin', 'Stock Clerk', 'Viewer')
+def document_chain(request, kind, pk):
+    document = get_object_or_404(DOCUMENTS[kind][0], pk=pk)
+    context = conversions.document_chain(document)
+    context.update({'kind': kind, 'document': document})
+    return render(request, 'sales/document_chain.html', context)
+
+
+# -----------------------------
+# STOCK POSTING
+# -----------------------------
+@login_required
+@group_required('Admin', 'Stock Clerk')
+@require_POST
+def delivery_note_issue(request, pk):
+    note = get_object_or_404(DeliveryNote, pk=pk)
+    if note.stock_posted_at:
+        messages.info(request, f"Delivery note {note.delivery_note_number} has already been issued.")
+        return redirect('sales:delivery_note_list')
+    try:
+        note, movements = issue_delivery_note(pk, user=request.user)
+    except StockPostingError as e:
+        for error in e.errors:
+            messages.error(request, error)
+        return redirect('sales:delivery_note_list')
+    messages.success(request, f"Delivery note {note.delivery_note_number} issued: {len(movements)} stock lines posted.")
+    return redirect('sales:delivery_note_list')
+
+
+@login_required
+@group_required('Admin', 'Stock Clerk')
+@require_POST
+def credit_note_receive(request, pk):
     credit_note = get_object_or_404(CreditNote, pk=pk)
-    items = credit_note.items.all()
-    return render(request, 'sales/credit_note_detail.html', {'credit_note': credit_note, 'items': items})
+    if credit_note.stock_posted_at:
+        messages.info(request, f"Credit note {credit_note.credit_note_number} has already been received.")
+        return redirect('sales:credit_note_list')
+    try:
+        credit_note, movements = receive_credit_note(pk, user=request.user)
+    except StockPostingError as e:
+        for error in e.errors:
+            messages.error(request, error)
+        return redirect('sales:credit_note_list')
+    messages.success(request, f"Credit note {credit_note.credit_note_number} received: {len(movements)} stock lines posted.")
+    return redirect('sales:credit_note_list')
 
 
+# -----------------------------
+# SEARCH
+# -----------------------------
+@login_required
+@group_required('Admin', 'Stock Clerk', 'Viewer')
+def document_search(request):
+    query = request.GET.get('q', '').strip()
+    return render(request, 'sales/document_search.html', {
+        'query': query,
+        'results': search.search(query) if query else [],
+        'limit': search.SEARCH_LIMIT,
+    })
+
+
+# -----------------------------
+# CHANGE FEED
+# -----------------------------
+@login_required
+@group_required('Admin', 'Stock Clerk', 'Viewer')
+def change_feed(request, resource):
+    """Rows of one resource changed since ?since=<token>, for incremental syncs."""
+    if resource not in changes.FEEDS:
+        return JsonResponse({"error": f"Unknown resource; expected one of {', '.join(changes.FEEDS)}"}, status=404)
+    try:
+        limit = int(request.GET.get('limit', changes.FEED_LIMIT))
+    except ValueError:
+        return JsonResponse({"error": "Invalid limit"}, status=400)
+    try:
+        return JsonResponse(changes.changes_since(resource, request.GET.get('since'), limit))
+    except changes.ChangeFeedError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+
+# -----------------------------
+# REPORTS
+# -----------------------------
+@login_required
+@group_required('Admin', 'Stock Clerk', 'Viewer')
+def aging_report(request):
+    as_of = _parse_date(request.GET.get('as_of')) or timezone.localdate()
+    rows = reports.aging_by_client(as_of)
+    keys = [key for key, *_ in reports.AGING_BUCKETS] + ['outstanding']
+    totals = {key: sum((row[key] for row in rows), Decimal('0.00')) for key in keys}
+    for row in rows:
+        row['amounts'] = [row[key] for key in keys]
+    return render(request, 'sales/aging_report.html', {
+        'rows': rows,
+        'buckets': [label for _, label, *_ in reports.AGING_BUCKETS],
+        'totals': [totals[key] for key in keys],
+        'as_of': as_of,
+    })
+
+
+def _analytics_range(request):
+    """Date range from ?from=&to=, defaulting to the current quarter."""
+    today = timezone.localdate()
+    quarter_start = today.replace(month=3 * ((today.month - 1) // 3) + 1, day=1)
+    start = _parse_date(request.GET.get('from')) or quarter_start
+    end = _parse_date(request.GET.get('to')) or today
+    return start, end
+
+
+@login_required
+@group_required('Admin', 'Stock Clerk', 'Viewer')
+def sales_analytics(request):
+    start, end = _analytics_range(request)
+    return render(request, 'sales/sales_analytics.html', {
+        'start': start,
+        'end': end,
+        'summary': rollups.summary(start, end),
+        'clients': rollups.top_clients(start, end),
+        'brands': rollups.by_brand(start, end),
+        'days': rollups.by_day(start, end),
+    })
+
+
+@login_required
+@group_required('Admin', 'Stock Clerk', 'Viewer')
+def sales_analytics_data(request):
+    """JSON over the rollups: ?group=day|client|brand&from=&to=&limit=."""
+    start, end = _analytics_range(request)
+    group = request.GET.get('group', 'day')
+    limit = request.GET.get('limit', '')
+    limit = min(int(limit), 1000) if limit.isdigit() else 20
+    if group == 'client':
+        rows = rollups.top_clients(start, end, limit)
+    elif group == 'brand':
+        rows = rollups.by_brand(start, end, limit)
+    elif group == 'day':
+        rows = rollups.by_day(start, end)
+    else:
+        return JsonResponse({'error': "group must be day, client or brand."}, status=400)
+    return JsonResponse({
+        'from': start,
+        'to': end,
+        'group': group,
+        'summary': rollups.summary(start, end),
+        'results': rows,
+    })